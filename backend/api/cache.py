@@ -0,0 +1,150 @@
+import functools
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from rest_framework.response import Response
+
+KEY_PREFIX = 'response-cache'
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _version_key(model):
+    return f'{KEY_PREFIX}:version:{model._meta.label_lower}'
+
+
+def get_versions(models) -> list:
+    """
+    Returns the current data version of each model. A version that isn't in
+    the cache (never bumped, or evicted) is started from the clock, so it
+    can't come back as a number an older cached response was stored under.
+    """
+    cache = _cache()
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns())
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model):
+    """
+    Invalidates every cached response built from the model. The version is
+    bumped right away, and again once the transaction commits, so a response
+    cached from the old data in between is dropped as well.
+    """
+    def bump():
+        cache = _cache()
+        key = _version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns())
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def _count(view_name, outcome):
+    cache = _cache()
+    key = f'{KEY_PREFIX}:stats:{view_name}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_stats(view_names) -> dict:
+    """ Returns {view_name: (hits, misses)} counted since the cache was last cleared. """
+    keys = {
+        name: (f'{KEY_PREFIX}:stats:{name}:hit', f'{KEY_PREFIX}:stats:{name}:miss')
+        for name in view_names
+    }
+    counts = _cache().get_many([key for pair in keys.values() for key in pair])
+    return {name: (counts.get(hit, 0), counts.get(miss, 0)) for name, (hit, miss) in keys.items()}
+
+
+# Names of the views using cache_response, for the stats
+cached_views = set()
+
+
+def cache_response(*models, timeout=None):
+    """
+    Caches the data of successful GET responses of a view method. The key is
+    built from the full URL, today's date (for date-relative filters) and the
+    current version of each model in `models`, the ones the response is built
+    from; saving or deleting any of them bumps its version (see api.signals),
+    so stale entries are never read again and simply expire.
+
+    Sets an X-Cache: HIT/MISS header and counts both per view.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            view_name = type(view).__name__
+            versions = get_versions(models)
+            raw_key = f'{request.build_absolute_uri()}|{timezone.localdate()}|{versions}'
+            key = f'{KEY_PREFIX}:{view_name}:{hashlib.md5(raw_key.encode()).hexdigest()}'
+
+            cache = _cache()
+            data = cache.get(key)
+            if data is not None:
+                _count(view_name, 'hit')
+                return Response(data, headers={'X-Cache': 'HIT'})
+
+            _count(view_name, 'miss')
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT if timeout is None else timeout)
+            response['X-Cache'] = 'MISS'
+            return response
+
+        cached_views.add(method.__qualname__.split('.')[0])
+        return wrapper
+
+    return decorator
+
+
+def conditional_response(state):
+    """
+    Answers conditional GETs of a view method with a 304 before the view
+    runs. `state(**kwargs)` is handed the URL kwargs and does one cheap
+    lookup returning (etag, last_modified), either of which may be None, or
+    None if the object doesn't exist; it's called once per request.
+
+    Responses are marked with DETAIL_CACHE_CONTROL so shared caches (a CDN)
+    may keep them and come back with the validators.
+    """
+    def get_state(request, **kwargs):
+        if not hasattr(request, '_conditional_state'):
+            request._conditional_state = state(**kwargs) or (None, None)
+        return request._conditional_state
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            @condition(
+                etag_func=lambda request, *args, **kwargs: get_state(request, **kwargs)[0],
+                last_modified_func=lambda request, *args, **kwargs: get_state(request, **kwargs)[1],
+            )
+            def conditional(request, *args, **kwargs):
+                return method(view, request, *args, **kwargs)
+
+            response = conditional(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                patch_cache_control(response, **settings.DETAIL_CACHE_CONTROL)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,103 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedCounter:
+    """
+    Counts hits in memory and hands them to `write` in one batch every
+    `interval` seconds, from a daemon thread started on the first hit, so
+    the counted rows aren't written on every request. What is left is
+    written when the process exits; a worker that is killed loses at most
+    the hits of the interval in progress. A failed write is put back and
+    retried with the next batch.
+
+    :param write: Called with a Counter mapping each key to its hits
+    :param interval: Name of the setting holding the interval in seconds
+    """
+
+    def __init__(self, write, interval):
+        self.write = write
+        self.interval = interval
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, key, hits=1):
+        with self._lock:
+            self._counts[key] += hits
+            # Also covers a worker forked off a process the thread ran in
+            if self._thread is None:
+                atexit.register(self.flush)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="buffered-counter", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """ Writes out the hits counted so far. """
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return
+        try:
+            self.write(counts)
+        except Exception as e:
+            logger.warning(f"Writing {sum(counts.values())} counted hit(s) failed, will retry: {str(e)}")
+            with self._lock:
+                self._counts.update(counts)
+
+    def _run(self):
+        while True:
+            time.sleep(getattr(settings, self.interval))
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+
+MOST_READ_KEY = 'blog-most-read'
+
+
+def _write_blog_views(counts):
+    from api.models import BlogStats
+    BlogStats.objects.add_views(counts)
+    # The views are in; failing to rank them must not count them again
+    try:
+        rank_blog_views()
+    except Exception as e:
+        logger.warning(f"Ranking the most read posts failed: {str(e)}")
+
+
+blog_views = BufferedCounter(_write_blog_views, "BLOG_VIEW_FLUSH_INTERVAL")
+
+
+def record_blog_view(blog_id):
+    blog_views.add((blog_id, timezone.localdate()))
+
+
+def rank_blog_views():
+    """
+    Stores the most read posts of the week, as [(blog_id, views)], for
+    get_most_read. Runs after every batch of views is written, and from the
+    rank_blog_views command.
+    """
+    from api.models import BlogStats
+    ranking = [(row['blog'], row['views']) for row in BlogStats.objects.most_read()]
+    caches[settings.RESPONSE_CACHE_ALIAS].set(MOST_READ_KEY, ranking, timeout=None)
+    return ranking
+
+
+def get_most_read():
+    """ Returns the ranking rank_blog_views stored, ranking once if the cache has none. """
+    ranking = caches[settings.RESPONSE_CACHE_ALIAS].get(MOST_READ_KEY)
+    if ranking is None:
+        ranking = rank_blog_views()
+    return ranking
@@ -0,0 +1,109 @@
+import hashlib
+import mimetypes
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.feedgenerator import Atom1Feed, Enclosure, Rss201rev2Feed
+from api.cache import get_versions
+from api.models import Blog, BlogImage, StoredObject, User
+from api.utils import get_bucket_public_url
+
+# What a rendered feed is built from; a change to any bumps its version
+FEED_MODELS = (Blog, BlogImage, User)
+
+
+class BlogFeed(Feed):
+    """ The latest BLOG_FEED_SIZE posts, newest first, with their first image as the enclosure. """
+    feed_type = Rss201rev2Feed
+    description = "Posts from the ACM CUI Wah blog."
+
+    def title(self):
+        return settings.BLOG_FEED_TITLE
+
+    def link(self):
+        return f"{settings.SITE_URL}/blogs"
+
+    def items(self):
+        posts = list(
+            Blog.objects
+            .select_related('createdBy')
+            .prefetch_related('images')
+            .defer('content', 'search_vector')
+            .order_by('-createdAt', 'id')[:settings.BLOG_FEED_SIZE]
+        )
+        for post in posts:
+            images = sorted((image for image in post.images.all() if image.image), key=lambda image: image.id)
+            post.enclosure_path = images[0].image if images else None
+
+        # Enclosures need the file size, which the bucket's records keep
+        paths = [post.enclosure_path for post in posts if post.enclosure_path]
+        sizes = dict(StoredObject.objects.filter(path__in=paths).values_list('path', 'size')) if paths else {}
+        for post in posts:
+            post.enclosure_size = sizes.get(post.enclosure_path, 0)
+        return posts
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.excerpt
+
+    def item_link(self, item):
+        return f"{settings.SITE_URL}/blog/{item.pk}"
+
+    def item_author_name(self, item):
+        return item.createdBy.username
+
+    def item_pubdate(self, item):
+        return item.createdAt
+
+    def item_updateddate(self, item):
+        return item.updatedAt
+
+    def item_enclosures(self, item):
+        if not item.enclosure_path:
+            return []
+        mime_type = mimetypes.guess_type(item.enclosure_path)[0] or "application/octet-stream"
+        return [Enclosure(get_bucket_public_url(item.enclosure_path), str(item.enclosure_size), mime_type)]
+
+
+class BlogAtomFeed(BlogFeed):
+    feed_type = Atom1Feed
+    subtitle = BlogFeed.description
+
+
+FEEDS = {'rss': BlogFeed, 'atom': BlogAtomFeed}
+
+
+def get_feed_etag(kind) -> str:
+    """ Changes whenever a post, its images or its author change, without touching the database. """
+    return hashlib.md5(f"{kind}:{get_versions(FEED_MODELS)}".encode()).hexdigest()
+
+
+def _cache_key(request, kind):
+    # Links are made absolute with the host the feed was asked for on
+    return f"blog-feed:{request.get_host()}:{get_feed_etag(kind)}"
+
+
+def get_cached_feed(request, kind):
+    """ The rendered feed if it's in the cache, else None. """
+    return caches[settings.RESPONSE_CACHE_ALIAS].get(_cache_key(request, kind))
+
+
+def get_feed(request, kind) -> dict:
+    """
+    Returns the rendered feed as {'content', 'content_type', 'last_modified'},
+    from the cache while no post has changed since it was rendered.
+    """
+    feed = get_cached_feed(request, kind)
+    if feed is None:
+        response = FEEDS[kind]()(request)
+        feed = {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            # The render time, as a deleted post leaves no newer updatedAt behind
+            'last_modified': timezone.now().replace(microsecond=0),
+        }
+        caches[settings.RESPONSE_CACHE_ALIAS].set(_cache_key(request, kind), feed, settings.BLOG_FEED_CACHE_TIMEOUT)
+    return feed
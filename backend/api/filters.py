@@ -0,0 +1,44 @@
+from django.utils import timezone
+from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
+from api.models import Event
+
+
+class ArrayFilter(filters.BaseCSVFilter, filters.CharFilter):
+    """
+    Filters an ArrayField by a comma separated list of values. With
+    lookup_expr='overlap' rows having any of them match, with 'contains'
+    only rows having all of them. Both can use a GIN index on the field.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        values = [item.strip() for item in value if item.strip()]
+        if not values:
+            return qs
+        return super().filter(qs, values)
+
+
+class EventFilter(filters.FilterSet):
+    """
+    Filters for the events list. Each one is a condition on an indexed
+    column (date, event_type, or the GIN-indexed tags and hosts).
+    """
+    date_after = filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_before = filters.DateFilter(field_name='date', lookup_expr='lte')
+    tags = ArrayFilter(field_name='tags', lookup_expr='overlap', label='Events with any of these tags')
+    tags_all = ArrayFilter(field_name='tags', lookup_expr='contains', label='Events with all of these tags')
+    hosts = ArrayFilter(field_name='hosts', lookup_expr='overlap', label='Events by any of these hosts')
+    hosts_all = ArrayFilter(field_name='hosts', lookup_expr='contains', label='Events by all of these hosts')
+    upcoming = filters.BooleanFilter(method='filter_upcoming', label='Upcoming (true) or past (false) events')
+
+    class Meta:
+        model = Event
+        fields = ['date', 'event_type']
+
+    def filter_upcoming(self, queryset, name, value):
+        today = timezone.localdate()
+        if value:
+            return queryset.filter(date__gte=today)
+        return queryset.filter(date__lt=today)
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.core.cache import caches
+from api.models import Event
+
+CRLF = "\r\n"
+# Columns a VEVENT is rendered from
+EVENT_FIELDS = ('id', 'title', 'description', 'date', 'time_from', 'time_to', 'location', 'updated_at')
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _escape(text):
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """
+    Splits a content line into 75-octet pieces, continued with a leading
+    space (RFC 5545, 3.1), without cutting a UTF-8 character in two.
+    """
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    pieces = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74  # The leading space counts
+    return (CRLF + " ").join(pieces)
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_vevent(event) -> str:
+    """
+    Renders one event as a VEVENT block. Event dates and times are local
+    to EVENT_TIME_ZONE; an end time before the start means the event runs
+    past midnight.
+    """
+    zone = ZoneInfo(settings.EVENT_TIME_ZONE)
+    start = datetime.combine(event.date, event.time_from, tzinfo=zone)
+    end = datetime.combine(event.date, event.time_to, tzinfo=zone)
+    if end <= start:
+        end += timedelta(days=1)
+
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:event-{event.id}@{settings.CALENDAR_UID_DOMAIN}",
+        f"DTSTAMP:{_utc(event.updated_at)}",
+        f"LAST-MODIFIED:{_utc(event.updated_at)}",
+        f"DTSTART:{_utc(start)}",
+        f"DTEND:{_utc(end)}",
+        f"SUMMARY:{_escape(event.title)}",
+    ]
+    if event.description:
+        lines.append(f"DESCRIPTION:{_escape(event.description)}")
+    if event.location:
+        lines.append(f"LOCATION:{_escape(event.location)}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) + CRLF for line in lines)
+
+
+def _block_key(pk, updated_at):
+    return f"ical:vevent:{pk}:{updated_at.timestamp()}"
+
+
+def get_vevents(events) -> list:
+    """
+    Returns the VEVENT block of each event. Blocks are cached under the
+    event's id and updated_at, so after an edit only that event is rendered
+    again; blocks of edited or deleted events simply expire.
+
+    :param events: Iterable of (pk, updated_at) pairs
+    """
+    events = list(events)
+    keys = [_block_key(pk, updated_at) for pk, updated_at in events]
+    cache = _cache()
+    blocks = cache.get_many(keys)
+
+    missing = [pk for (pk, _), key in zip(events, keys) if key not in blocks]
+    if missing:
+        rendered = {
+            _block_key(event.pk, event.updated_at): render_vevent(event)
+            for event in Event.objects.filter(pk__in=missing).only(*EVENT_FIELDS)
+        }
+        cache.set_many(rendered, settings.CALENDAR_CACHE_TIMEOUT)
+        blocks.update(rendered)
+
+    # An event edited or deleted in between is left out until the next request
+    return [blocks[key] for key in keys if key in blocks]
+
+
+def render_calendar(vevents) -> str:
+    header = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//ACM CUI Wah//Events//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(settings.CALENDAR_NAME)}",
+    ]
+    return "".join(line + CRLF for line in header) + "".join(vevents) + "END:VCALENDAR" + CRLF
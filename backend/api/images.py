@@ -0,0 +1,158 @@
+import os
+import struct
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".jfif", ".png", ".webp", ".gif")
+VARIANT_CONTENT_TYPE = "image/webp"
+
+
+def is_image_path(path: str) -> bool:
+    return bool(path) and os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+# JPEG markers that start a frame and carry its dimensions (SOF0-SOF15, minus DHT, JPG and DAC)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Markers with no length field after them
+_JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+
+
+def read_image_header(file) -> tuple:
+    """
+    Identifies a JPEG, PNG or WebP image by its magic bytes and reads its
+    dimensions from the header, without decoding any pixel data. For JPEG
+    only the marker segments before the first frame are walked.
+
+    :param file: A file-like object; its position is reset to the start
+    :return: Tuple of (content_type, width, height)
+    :raises ValueError: If the format isn't recognised or the header is malformed
+    """
+    file.seek(0)
+    try:
+        head = file.read(30)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            width, height = struct.unpack(">II", head[16:24])
+            return "image/png", width, height
+        if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+            return ("image/webp", *_webp_size(head))
+        if head.startswith(b"\xff\xd8\xff"):
+            return ("image/jpeg", *_jpeg_size(file))
+        raise ValueError("Not a JPEG, PNG or WebP image")
+    except struct.error:
+        raise ValueError("Truncated image header")
+    finally:
+        file.seek(0)
+
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    raise ValueError("Unknown WebP chunk")
+
+
+def _jpeg_size(file):
+    file.seek(2)
+    while True:
+        byte = file.read(1)
+        if not byte:
+            raise ValueError("No frame header in JPEG")
+        if byte != b"\xff":
+            continue
+        marker = file.read(1)
+        while marker == b"\xff":  # Fill bytes
+            marker = file.read(1)
+        if not marker:
+            raise ValueError("No frame header in JPEG")
+        marker = marker[0]
+
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):  # End of image, start of scan
+            raise ValueError("No frame header in JPEG")
+        (length,) = struct.unpack(">H", file.read(2))
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", file.read(5))
+            return width, height
+        file.seek(length - 2, os.SEEK_CUR)
+
+
+def variant_path(path: str, name: str) -> str:
+    """
+    Returns the bucket path of a derivative, stored next to the original.
+    e.g. blogs/<uuid>_photo.jpg -> blogs/<uuid>_photo@thumb.webp
+    """
+    stem = os.path.splitext(path)[0]
+    return f"{stem}@{name}.webp"
+
+
+def variant_paths(path: str) -> dict:
+    if not is_image_path(path):
+        return {}
+    return {name: variant_path(path, name) for name in settings.IMAGE_VARIANTS}
+
+
+def generate_variants(file) -> dict:
+    """
+    Decodes the image once and renders every size in IMAGE_VARIANTS as WebP.
+    Images are only ever scaled down, never up.
+
+    :param file: A file-like object containing the original image
+    :return: Dict mapping variant name to a ContentFile with the encoded WebP
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        # Let the JPEG decoder skip detail we're about to throw away anyway
+        largest = max(settings.IMAGE_VARIANTS.values())
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        variants = {}
+        # Render the largest size first and shrink from it to save work
+        for name, size in sorted(settings.IMAGE_VARIANTS.items(), key=lambda item: -item[1]):
+            image = image.copy()
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, "WEBP", quality=settings.IMAGE_VARIANT_QUALITY, method=4)
+            variants[name] = ContentFile(buffer.getvalue(), name=f"{name}.webp")
+
+    file.seek(0)
+    return variants
+
+
+def render_qr_code(data: str, scale: int = 8, border: int = 4) -> bytes:
+    """
+    Encodes data as a QR code (error correction level M) and returns it as
+    a black and white PNG.
+
+    :param scale: Pixels per module
+    :param border: Quiet zone around the code, in modules
+    """
+    from reportlab.graphics.barcode.qrencoder import QRCode, QRErrorCorrectLevel
+
+    qr = QRCode(None, QRErrorCorrectLevel.M)
+    qr.addData(data)
+    qr.make()
+    count = qr.getModuleCount()
+
+    image = Image.new("1", (count + 2 * border, count + 2 * border), 1)
+    pixels = image.load()
+    for row in range(count):
+        for col in range(count):
+            if qr.isDark(row, col):
+                pixels[col + border, row + border] = 0
+    image = image.resize((image.width * scale, image.height * scale), Image.Resampling.NEAREST)
+
+    buffer = BytesIO()
+    image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
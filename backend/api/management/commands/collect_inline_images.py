@@ -0,0 +1,101 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from api.models import Blog, InlineImage, StoredObject
+from api.utils import delete_from_bucket, find_upload_ids, flush_pending_deletions, get_upload_id
+
+
+class Command(BaseCommand):
+    help = ('Deletes inline images that no blog post references once they are older than '
+            'INLINE_IMAGE_GRACE_PERIOD, and removes their objects from the bucket in batches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=None,
+                            help='Override INLINE_IMAGE_GRACE_PERIOD, in hours.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows read and deleted per query.')
+        parser.add_argument('--dry-run', action='store_true', help='List the orphaned images without deleting them.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['grace_hours'] is not None:
+            grace = timedelta(hours=options['grace_hours'])
+        else:
+            grace = timedelta(seconds=settings.INLINE_IMAGE_GRACE_PERIOD)
+        cutoff = timezone.now() - grace
+
+        scan_started = timezone.now()
+        referenced = self.referenced_upload_ids(batch_size)
+
+        orphaned = reclaimed = untracked = 0
+        last_id = 0
+        while True:
+            batch = list(
+                InlineImage.objects
+                .filter(id__gt=last_id, uploaded_at__lt=cutoff)
+                .order_by('id')
+                .values_list('id', 'image')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            # Posts saved while we were scanning may have started using an image
+            referenced |= self.referenced_upload_ids(batch_size, Blog.objects.filter(updatedAt__gte=scan_started))
+            # Images whose path carries no upload ID can't be matched, so they're kept
+            orphans = [
+                (pk, path) for pk, path in batch
+                if get_upload_id(path) is not None and get_upload_id(path) not in referenced
+            ]
+            if not orphans:
+                continue
+            orphaned += len(orphans)
+
+            if options['dry_run']:
+                for _, path in orphans:
+                    self.stdout.write(path)
+                continue
+
+            with transaction.atomic():
+                sizes = dict(
+                    StoredObject.objects
+                    .filter(path__in={path for _, path in orphans})
+                    .values_list('path', 'size')
+                )
+                InlineImage.objects.filter(id__in=[pk for pk, _ in orphans]).delete()
+                for _, path in orphans:
+                    # Shared (deduplicated) objects only lose a reference here
+                    if delete_from_bucket(settings.SUPABASE_BUCKET, path):
+                        if path in sizes:
+                            reclaimed += sizes[path]
+                        else:
+                            untracked += 1
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{orphaned} orphaned inline image(s) found.'))
+            return
+
+        removed, failed = flush_pending_deletions()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {orphaned} orphaned inline image(s), reclaiming {reclaimed} bytes'
+            + (f' plus {untracked} object(s) of unknown size' if untracked else '')
+            + f'. Removed {removed} object(s) from the bucket, {failed} rescheduled.'
+        ))
+
+    @staticmethod
+    def referenced_upload_ids(batch_size, blogs=None):
+        """
+        Collects the upload IDs referenced by blog content, reading the
+        posts in primary key order so only one batch is in memory at a time.
+        """
+        blogs = Blog.objects.all() if blogs is None else blogs
+        referenced = set()
+        last_id = 0
+        while True:
+            batch = list(blogs.filter(id__gt=last_id).order_by('id').values_list('id', 'content')[:batch_size])
+            if not batch:
+                return referenced
+            last_id = batch[-1][0]
+            for _, content in batch:
+                referenced |= find_upload_ids(content)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from api.utils import expire_pending_uploads, flush_pending_deletions
+
+
+class Command(BaseCommand):
+    help = ('Expires unclaimed direct uploads, then removes queued objects from the media bucket in batches, '
+            'retrying failed batches with backoff.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Objects per remove() call.')
+
+    def handle(self, *args, **options):
+        expired = expire_pending_uploads()
+        if expired:
+            self.stdout.write(f'Expired {expired} unclaimed upload(s).')
+        removed, failed = flush_pending_deletions(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} object(s), {failed} rescheduled.'))
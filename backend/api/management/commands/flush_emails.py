@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from api.utils import flush_pending_emails
+
+
+class Command(BaseCommand):
+    help = 'Sends queued emails in batches, retrying failed batches with backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Emails sent per SMTP connection.')
+
+    def handle(self, *args, **options):
+        sent, failed = flush_pending_emails(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} email(s), {failed} rescheduled.'))
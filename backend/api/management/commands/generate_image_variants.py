@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from api.images import is_image_path
+from api.models import Bill, BlogImage, Event, Student
+from api.utils import regenerate_image_variants
+
+# (model, field holding the bucket path) for every model that stores uploaded images
+IMAGE_SOURCES = {
+    'blogs': (BlogImage, 'image'),
+    'events': (Event, 'image'),
+    'profiles': (Student, 'profile_pic'),
+    'bills': (Bill, 'image'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Backfills the resized WebP variants (IMAGE_VARIANTS) for images uploaded before they existed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            choices=IMAGE_SOURCES.keys(),
+            action='append',
+            help='Restrict the backfill to these sources (can be repeated).',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='List the images without uploading anything.')
+
+    def handle(self, *args, **options):
+        sources = options['only'] or IMAGE_SOURCES.keys()
+        done = failed = 0
+
+        for source in sources:
+            model, field = IMAGE_SOURCES[source]
+            paths = (
+                model.objects
+                .exclude(**{f'{field}__isnull': True})
+                .exclude(**{field: ''})
+                .order_by()
+                .values_list(field, flat=True)
+                .distinct()
+                .iterator(chunk_size=500)
+            )
+            for path in paths:
+                if not is_image_path(path):
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(path)
+                    continue
+                try:
+                    regenerate_image_variants(path)
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{path}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {done} image(s), {failed} failed.'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.counters import rank_blog_views
+
+
+class Command(BaseCommand):
+    help = 'Stores the most read blog posts of the week. Run daily, so old days drop out without new views.'
+
+    def handle(self, *args, **options):
+        ranking = rank_blog_views()
+        self.stdout.write(self.style.SUCCESS(f'Ranked {len(ranking)} post(s).'))
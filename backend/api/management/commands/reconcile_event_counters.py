@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from api.cache import bump_version
+from api.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds Event.active_registration_count and seats_remaining from the registrations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, action='append', help='Only reconcile these event IDs (can be repeated).')
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if options['event']:
+            events = events.filter(pk__in=options['event'])
+        fixed = events.reconcile_counters()
+        if fixed:
+            # The counters are fixed with .update(), which sends no signals
+            bump_version(Event)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {fixed} event(s) with drifted counters.'))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:16
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Event = apps.get_model('api', 'Event')
+    EventRegistration = apps.get_model('api', 'EventRegistration')
+    active = (
+        EventRegistration.objects
+        .filter(event=OuterRef('pk'))
+        .exclude(status='CANCELLED')
+        .order_by()
+        .values('event')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    count = Coalesce(Subquery(active), Value(0))
+    Event.objects.update(active_registration_count=count, seats_remaining=F('total_seats') - count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_pendingupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='active_registration_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='seats_remaining',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
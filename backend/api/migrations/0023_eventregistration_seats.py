@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:18
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def count_seats(apps, schema_editor):
+    Event = apps.get_model('api', 'Event')
+    EventRegistration = apps.get_model('api', 'EventRegistration')
+    EventParticipant = apps.get_model('api', 'EventParticipant')
+
+    participants = (
+        EventParticipant.objects
+        .filter(registration=OuterRef('pk'))
+        .order_by()
+        .values('registration')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    EventRegistration.objects.update(seats=Greatest(Coalesce(Subquery(participants), Value(0)), Value(1)))
+
+    seats = (
+        EventRegistration.objects
+        .filter(event=OuterRef('pk'))
+        .exclude(status='CANCELLED')
+        .order_by()
+        .values('event')
+        .annotate(seats=Sum('seats'))
+        .values('seats')
+    )
+    Event.objects.update(seats_remaining=F('total_seats') - Coalesce(Subquery(seats), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_event_registration_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventregistration',
+            name='seats',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.RunPython(count_seats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_eventregistration_seats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254)),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='eventregistration',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled'), ('WAITLISTED', 'Waitlisted')], default='PENDING', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(condition=models.Q(('status', 'WAITLISTED')), fields=['event', 'id'], name='registration_waitlist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pendingemail',
+            index=models.Index(fields=['next_attempt_at'], name='api_pending_next_at_b8a549_idx'),
+        ),
+    ]
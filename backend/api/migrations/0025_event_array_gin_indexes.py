@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:24
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_registration_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='event_tags_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['hosts'], name='event_hosts_gin'),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:40
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+def resolve_duplicates(apps, schema_editor):
+    """
+    Copies event_id onto the participants, then removes every participant
+    whose reg_no or email (ignoring case) is registered for the same event
+    more than once. The one kept is the earliest holding seats, else the
+    earliest waitlisted, and only then a cancelled one. Registrations left
+    without participants are deleted, and the seats and event counters are
+    recounted for the rest. Each removal is reported.
+    """
+    Event = apps.get_model('api', 'Event')
+    EventRegistration = apps.get_model('api', 'EventRegistration')
+    EventParticipant = apps.get_model('api', 'EventParticipant')
+
+    EventParticipant.objects.update(
+        event_id=Subquery(EventRegistration.objects.filter(pk=OuterRef('registration_id')).values('event_id')[:1])
+    )
+
+    seen = set()
+    duplicates = []
+    participants = (
+        EventParticipant.objects
+        .order_by(
+            Case(
+                When(registration__status='CANCELLED', then=2),
+                When(registration__status='WAITLISTED', then=1),
+                default=0,
+            ),
+            'id',
+        )
+        .values_list('id', 'event_id', 'registration_id', 'name', 'reg_no', 'email')
+    )
+    for pk, event_id, registration_id, name, reg_no, email in participants.iterator():
+        keys = {(event_id, 'reg_no', reg_no), (event_id, 'email', email.lower())}
+        if keys & seen:
+            duplicates.append(pk)
+            print(f"\n  Removing duplicate participant {name} ({reg_no}, {email}) "
+                  f"from registration {registration_id} of event {event_id}", end="")
+        else:
+            seen |= keys
+    if not duplicates:
+        return
+
+    affected = EventParticipant.objects.filter(pk__in=duplicates)
+    registration_ids = set(affected.values_list('registration_id', flat=True))
+    event_ids = set(affected.values_list('event_id', flat=True))
+    affected.delete()
+
+    registrations = EventRegistration.objects.filter(pk__in=registration_ids)
+    emptied = registrations.filter(participants__isnull=True)
+    print(f"\n  Removed {len(duplicates)} duplicate participant(s), "
+          f"deleting {emptied.count()} registration(s) left empty", end="")
+    emptied.delete()
+
+    participant_count = (
+        EventParticipant.objects
+        .filter(registration=OuterRef('pk'))
+        .order_by()
+        .values('registration')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    registrations.update(seats=Subquery(participant_count))
+
+    active = (
+        EventRegistration.objects
+        .filter(event=OuterRef('pk'))
+        .exclude(status__in=['CANCELLED', 'WAITLISTED'])
+        .order_by()
+        .values('event')
+    )
+    Event.objects.filter(pk__in=event_ids).update(
+        active_registration_count=Coalesce(Subquery(active.annotate(count=Count('pk')).values('count')), Value(0)),
+        seats_remaining=F('total_seats') - Coalesce(Subquery(active.annotate(seats=Sum('seats')).values('seats')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_event_array_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventparticipant',
+            name='event',
+            field=models.ForeignKey(null=True, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='api.event'),
+        ),
+        migrations.RunPython(resolve_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='eventparticipant',
+            name='event',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='api.event'),
+        ),
+        migrations.AddConstraint(
+            model_name='eventparticipant',
+            constraint=models.UniqueConstraint(fields=('event', 'reg_no'), name='unique_event_participant_reg_no'),
+        ),
+        migrations.AddConstraint(
+            model_name='eventparticipant',
+            constraint=models.UniqueConstraint(models.F('event'), django.db.models.functions.text.Lower('email'), name='unique_event_participant_email'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:52
+
+import api.models.event
+from django.db import migrations, models
+
+
+def generate_tokens(apps, schema_editor):
+    EventRegistration = apps.get_model('api', 'EventRegistration')
+
+    registrations = list(EventRegistration.objects.filter(check_in_token__isnull=True).only('pk'))
+    for registration in registrations:
+        registration.check_in_token = api.models.event.generate_check_in_token()
+    EventRegistration.objects.bulk_update(registrations, ['check_in_token'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_event_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='checked_in_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='eventregistration',
+            name='checked_in_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventregistration',
+            name='check_in_token',
+            field=models.CharField(editable=False, max_length=32, null=True),
+        ),
+        migrations.RunPython(generate_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='eventregistration',
+            name='check_in_token',
+            field=models.CharField(default=api.models.event.generate_check_in_token, editable=False, max_length=32, unique=True),
+        ),
+    ]
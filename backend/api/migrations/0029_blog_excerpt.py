@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:10
+
+from django.db import migrations, models
+from api.models.blog import make_excerpt
+
+
+def fill_excerpts(apps, schema_editor):
+    Blog = apps.get_model('api', 'Blog')
+    blogs = list(Blog.objects.only('id', 'content'))
+    for blog in blogs:
+        blog.excerpt = make_excerpt(blog.content)
+    Blog.objects.bulk_update(blogs, ['excerpt'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_registration_check_in'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(models.OrderBy(models.F('createdAt'), descending=True), models.F('id'), name='blog_created_at_id_idx'),
+        ),
+    ]
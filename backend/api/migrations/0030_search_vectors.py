@@ -0,0 +1,77 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# The vectors are computed by the database, so that every write of the
+# searched columns keeps them current, whichever way it's made. The
+# triggers only fire for those columns, not for the counter updates.
+CREATE_TRIGGERS = """
+CREATE FUNCTION api_blog_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.content, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_blog_search_vector
+    BEFORE INSERT OR UPDATE OF title, content ON api_blog
+    FOR EACH ROW EXECUTE FUNCTION api_blog_search_vector();
+
+CREATE FUNCTION api_event_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(array_to_string(NEW.tags, ' '), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.content, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_event_search_vector
+    BEFORE INSERT OR UPDATE OF title, description, tags, content ON api_event
+    FOR EACH ROW EXECUTE FUNCTION api_event_search_vector();
+
+UPDATE api_blog SET title = title;
+UPDATE api_event SET title = title;
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER api_blog_search_vector ON api_blog;
+DROP FUNCTION api_blog_search_vector();
+DROP TRIGGER api_event_search_vector ON api_event;
+DROP FUNCTION api_event_search_vector();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_blog_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        migrations.AddIndex(
+            model_name='blog',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='blog_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='event_search_vector_gin'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_search_vectors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('blog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='api.blog')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='blog_stats_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('blog', 'day'), name='unique_blog_stats_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_blogstats'),
+    ]
+
+    operations = [
+        # Existing objects may or may not have variants; the next upload_image
+        # reusing one makes them again, overwriting any that exist
+        migrations.AddField(
+            model_name='storedobject',
+            name='has_variants',
+            field=models.BooleanField(default=False),
+        ),
+    ]
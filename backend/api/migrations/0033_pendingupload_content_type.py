@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_storedobject_has_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingupload',
+            name='content_type',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:40
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def copy_cancelled(apps, schema_editor):
+    EventParticipant = apps.get_model('api', 'EventParticipant')
+    EventParticipant.objects.filter(registration__status='CANCELLED').update(cancelled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_pendingupload_content_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventparticipant',
+            name='cancelled',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(copy_cancelled, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='eventparticipant',
+            name='unique_event_participant_reg_no',
+        ),
+        migrations.RemoveConstraint(
+            model_name='eventparticipant',
+            name='unique_event_participant_email',
+        ),
+        migrations.AddConstraint(
+            model_name='eventparticipant',
+            constraint=models.UniqueConstraint(condition=models.Q(('cancelled', False)), fields=('event', 'reg_no'), name='unique_event_participant_reg_no'),
+        ),
+        migrations.AddConstraint(
+            model_name='eventparticipant',
+            constraint=models.UniqueConstraint(models.F('event'), django.db.models.functions.text.Lower('email'), condition=models.Q(('cancelled', False)), name='unique_event_participant_email'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from .user import User, Student
 from .bill import Bill
-from .blog import Blog, BlogImage, InlineImage
-from .event import Event, EventType, EventRegistration, EventParticipant, RegistrationType, RegistrationStatus
+from .blog import Blog, BlogImage, BlogStats, InlineImage
+from .event import Event, EventType, EventRegistration, EventParticipant, RegistrationType, RegistrationStatus, NoSeatsAvailable, DuplicateParticipant, CheckInRejected
+from .storage import StoredObject, PendingDeletion, PendingUpload, with_variant_flag
+from .notification import PendingEmail
 from .meeting import Meeting, MeetingAttendance
 from .recruitment import (RecruitmentSession, RecruitmentApplication, PersonalInfo, AcademicInfo, RolePreferences, ApplicationStatus, Role, SelectionPreference)
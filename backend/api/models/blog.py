@@ -1,6 +1,15 @@
+import html
 import os
 import uuid
-from django.db import models
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connections, models
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
 from api.models import User
 
 
@@ -8,12 +17,91 @@ def blog_image_upload_path(instance, filename):
     # Store images under: media/blog_images/<blog_uuid>/<filename>
     return f'blog_images/{instance.blog.id}/{filename}'
 
+def make_excerpt(content: str) -> str:
+    """ Returns the start of the post's HTML content as plain text, cut at BLOG_EXCERPT_LENGTH characters. """
+    # Tags are spaced out first so adjacent paragraphs don't run together
+    text = " ".join(html.unescape(strip_tags(content.replace("<", " <"))).split())
+    return Truncator(text).chars(settings.BLOG_EXCERPT_LENGTH)
+
+
 class Blog(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
+    # Plain-text preview for the list, kept in step with content on save
+    excerpt = models.TextField(blank=True, editable=False)
     createdBy = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blogs')
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
+    # Title and content for full-text search, kept current by a database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Newest-first listing and its keyset pagination
+            models.Index(models.F('createdAt').desc(), 'id', name='blog_created_at_id_idx'),
+            GinIndex(fields=['search_vector'], name='blog_search_vector_gin'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.excerpt = make_excerpt(self.content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        super().save(*args, **kwargs)
+
+
+class BlogStatsQuerySet(models.QuerySet):
+    def add_views(self, counts):
+        """
+        Adds views to the day rows in one INSERT ... ON CONFLICT statement.
+        Views of posts deleted in the meantime are dropped.
+
+        :param counts: Mapping of (blog_id, day) to the number of views
+        """
+        if not counts:
+            return
+        table = self.model._meta.db_table
+        values = ", ".join(["(%s, %s::date, %s)"] * len(counts))
+        params = [value for (blog_id, day), views in counts.items() for value in (blog_id, day, views)]
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (blog_id, day, views) "
+                f"SELECT v.blog_id, v.day, v.views FROM (VALUES {values}) AS v (blog_id, day, views) "
+                f"JOIN {Blog._meta.db_table} b ON b.id = v.blog_id "
+                f"ON CONFLICT (blog_id, day) DO UPDATE SET views = {table}.views + EXCLUDED.views",
+                params,
+            )
+
+    def most_read(self, days=7, limit=10):
+        """ Returns [{'blog': id, 'views': ...}] over the last `days` days, most viewed first. """
+        since = timezone.localdate() - timedelta(days=days - 1)
+        return (
+            self.filter(day__gte=since)
+            .values('blog')
+            .annotate(views=Sum('views'))
+            .order_by('-views', 'blog')[:limit]
+        )
+
+
+class BlogStats(models.Model):
+    """
+    Views of a post on one day. Views are counted in memory and added here
+    in bulk every BLOG_VIEW_FLUSH_INTERVAL seconds (see api.counters).
+    """
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name='stats')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    objects = BlogStatsQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['blog', 'day'], name='unique_blog_stats_day'),
+        ]
+        indexes = [
+            # The weekly ranking reads only the recent days
+            models.Index(fields=['day'], name='blog_stats_day_idx'),
+        ]
 
 
 class BlogImage(models.Model):
@@ -1,8 +1,15 @@
-from django.db import models
+import secrets
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Exists, F, Func, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Lower
 from datetime import date
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import RegexValidator
+from django.utils import timezone
+from api.cache import bump_version
 
 
 def event_image_upload_path(instance, filename):
@@ -18,6 +25,11 @@ class RegistrationStatus(models.TextChoices):
     PENDING = 'PENDING'
     COMPLETED = 'COMPLETED'
     CANCELLED = 'CANCELLED'
+    WAITLISTED = 'WAITLISTED'
+
+
+# Registrations in these states don't hold seats
+SEATLESS_STATUSES = (RegistrationStatus.CANCELLED, RegistrationStatus.WAITLISTED)
 
 
 class EventType(models.Model):
@@ -37,6 +49,102 @@ class EventType(models.Model):
         return self.type
 
 
+class NoSeatsAvailable(Exception):
+    pass
+
+
+class DuplicateParticipant(Exception):
+    """ A participant's reg_no or email is already registered for the event. """
+    pass
+
+
+def _is_duplicate_participant(error):
+    return getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None) in EventParticipant.UNIQUE_CONSTRAINTS
+
+
+class CheckInRejected(Exception):
+    """
+    A check-in token that doesn't admit anyone (any more).
+
+    :ivar registration: The registration the token belongs to, or None if unknown
+    """
+
+    def __init__(self, registration=None):
+        super().__init__(registration)
+        self.registration = registration
+
+
+def generate_check_in_token():
+    return secrets.token_urlsafe(16)
+
+
+class EventQuerySet(models.QuerySet):
+    def with_actual_counters(self):
+        """
+        Annotates actual_registration_count, actual_seats_remaining and
+        actual_checked_in_count, computed from the registrations themselves.
+        """
+        registrations = EventRegistration.objects.filter(event=OuterRef('pk')).order_by().values('event')
+        active = registrations.exclude(status__in=SEATLESS_STATUSES)
+        count = Coalesce(Subquery(active.annotate(count=Count('pk')).values('count')), Value(0))
+        seats = Coalesce(Subquery(active.annotate(seats=Sum('seats')).values('seats')), Value(0))
+        checked_in = registrations.filter(checked_in_at__isnull=False).annotate(count=Count('pk')).values('count')
+        return self.annotate(
+            actual_registration_count=count,
+            actual_seats_remaining=F('total_seats') - seats,
+            actual_checked_in_count=Coalesce(Subquery(checked_in), Value(0)),
+        )
+
+    def adjust_counters(self, registrations, seats):
+        """
+        Moves the counters by the given number of registrations and seats
+        taken (negative to release them).
+
+        :return: Number of events updated
+        """
+        return self.update(
+            active_registration_count=F('active_registration_count') + registrations,
+            seats_remaining=F('seats_remaining') - seats,
+        )
+
+    def tag_counts(self):
+        """
+        Returns [{'tag': ..., 'count': ...}], most used first, from one
+        GROUP BY over the unnested tags.
+        """
+        return (
+            self.annotate(tag=Func(F('tags'), function='unnest'))
+            .values('tag')
+            .annotate(count=Count('*'))
+            .order_by('-count', 'tag')
+        )
+
+    def reconcile_counters(self):
+        """
+        Rebuilds the registration counters from the registrations. The events
+        are locked first, which waits out in-flight registrations, since those
+        always update the event before touching registration rows.
+
+        :return: Number of events whose counters were wrong
+        """
+        with transaction.atomic():
+            ids = list(self.select_for_update().order_by('pk').values_list('pk', flat=True))
+            drifted = list(
+                Event.objects.filter(pk__in=ids).with_actual_counters()
+                .exclude(
+                    active_registration_count=F('actual_registration_count'),
+                    seats_remaining=F('actual_seats_remaining'),
+                    checked_in_count=F('actual_checked_in_count'),
+                )
+                .values_list('pk', 'actual_registration_count', 'actual_seats_remaining', 'actual_checked_in_count')
+            )
+            for pk, count, remaining, checked_in in drifted:
+                Event.objects.filter(pk=pk).update(
+                    active_registration_count=count, seats_remaining=remaining, checked_in_count=checked_in,
+                )
+        return len(drifted)
+
+
 class Event(models.Model):
     event_type = models.ForeignKey(EventType, on_delete=models.PROTECT, related_name='events', null=True)
 
@@ -68,16 +176,189 @@ class Event(models.Model):
         blank=True,
     )
 
+    # Denormalized from the registrations and only ever changed with F()
+    # expressions (see EventRegistration). Every participant takes a seat.
+    # seats_remaining goes negative if total_seats is lowered below the
+    # seats already taken.
+    active_registration_count = models.PositiveIntegerField(default=0, editable=False)
+    seats_remaining = models.IntegerField(default=0, editable=False)
+    # Registrations checked in at the venue, see EventRegistrationQuerySet.check_in
+    checked_in_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Set by every save(), but not by the counter updates
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Title, description, tags and content for full-text search, kept
+    # current by a database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = EventQuerySet.as_manager()
+
+    COUNTER_FIELDS = ('active_registration_count', 'seats_remaining', 'checked_in_count')
+
     class Meta:
         ordering = ['-date']
         indexes = [
             models.Index(fields=['date']),
             models.Index(fields=['event_type']),
+            # For the overlap/contains filters on the arrays
+            GinIndex(fields=['tags'], name='event_tags_gin'),
+            GinIndex(fields=['hosts'], name='event_hosts_gin'),
+            GinIndex(fields=['search_vector'], name='event_search_vector_gin'),
         ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        """
+        A full save leaves the counters alone, so a stale copy can't
+        overwrite registrations made since it was loaded. A change to
+        total_seats moves seats_remaining by the same amount, and only added
+        seats check the waitlist.
+        """
+        if self._state.adding:
+            self.seats_remaining = self.total_seats
+            return super().save(*args, **kwargs)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated_at'}
+            return super().save(*args, **kwargs)
+
+        kwargs['update_fields'] = [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.name not in (*self.COUNTER_FIELDS, 'total_seats', 'search_vector')
+        ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # The row is locked by the UPDATE above, so this is the current value
+            previous = Event.objects.values_list('total_seats', flat=True).get(pk=self.pk)
+            if self.total_seats == previous:
+                return
+            Event.objects.filter(pk=self.pk).update(
+                total_seats=self.total_seats,
+                seats_remaining=F('seats_remaining') + self.total_seats - previous,
+            )
+            # Added seats go to the waitlist first
+            if self.total_seats > previous:
+                EventRegistration.objects.promote_waitlisted(self.pk)
+
+
+class EventRegistrationQuerySet(models.QuerySet):
+    def register(self, event, participants, **fields):
+        """
+        Takes one seat per participant and creates the registration along
+        with its participants. The seats are taken with a conditional UPDATE
+        on the event row, which serializes concurrent registrations for the
+        same event, so it can never be oversold.
+
+        If the seats aren't there, or others are already waiting, the
+        registration joins the end of the event's waitlist instead.
+
+        :param participants: List of dicts of EventParticipant fields
+        :raises DuplicateParticipant: If one of them is already registered for
+            the event (cancelled registrations don't count). Nothing is saved then.
+        """
+        seats = len(participants)
+        try:
+            with transaction.atomic():
+                waiting = EventRegistration.objects.filter(event=OuterRef('pk'), status=RegistrationStatus.WAITLISTED)
+                taken = (
+                    Event.objects
+                    .filter(pk=event.pk, seats_remaining__gte=seats)
+                    .exclude(Exists(waiting))
+                    .adjust_counters(1, seats)
+                )
+                if not taken:
+                    fields['status'] = RegistrationStatus.WAITLISTED
+                registration = self.create(event=event, seats=seats, **fields)
+                EventParticipant.objects.bulk_create([
+                    EventParticipant(
+                        registration=registration, event=event,
+                        cancelled=registration.status == RegistrationStatus.CANCELLED, **participant,
+                    )
+                    for participant in participants
+                ])
+        except IntegrityError as e:
+            if _is_duplicate_participant(e):
+                raise DuplicateParticipant() from e
+            raise
+        return registration
+
+    def check_in(self, event_id, token):
+        """
+        Marks the registration holding `token` as checked in, with one
+        UPDATE on the unique token index that only matches a registration of
+        this event that holds seats and isn't checked in yet. Of several
+        scanners reading the same code at once, exactly one succeeds.
+
+        Only then is the event's checked_in_count bumped, in a statement of
+        its own: rejected scans never wait on the event row, and no
+        registration lock is held while taking it. Call it outside a
+        transaction. Neither UPDATE sends signals, so the cached event
+        responses are invalidated here.
+
+        :return: The check-in time
+        :raises CheckInRejected: If the token is unknown, already used, or
+            its registration is cancelled or waitlisted
+        """
+        now = timezone.now()
+        marked = (
+            self.filter(event_id=event_id, check_in_token=token, checked_in_at__isnull=True)
+            .exclude(status__in=SEATLESS_STATUSES)
+            .update(checked_in_at=now)
+        )
+        if not marked:
+            raise CheckInRejected(self.filter(event_id=event_id, check_in_token=token).first())
+        Event.objects.filter(pk=event_id).update(checked_in_count=F('checked_in_count') + 1)
+        bump_version(Event)
+        return now
+
+    def promote_waitlisted(self, event_id):
+        """
+        Moves registrations from the head of the event's waitlist into the
+        seats that are free, oldest first. Each step is one index lookup and
+        one conditional UPDATE. A team that doesn't fit yet keeps its place
+        and holds back the registrations behind it.
+
+        Must run in the transaction that freed the seats, with the event row
+        locked. The promoted participants are emailed after it commits.
+
+        :return: List of promoted registrations
+        """
+        promoted = []
+        events = Event.objects.filter(pk=event_id)
+        while True:
+            head = (
+                self.select_for_update()
+                .filter(event_id=event_id, status=RegistrationStatus.WAITLISTED)
+                .order_by('pk')
+                .first()
+            )
+            if head is None or not events.filter(seats_remaining__gte=head.seats).adjust_counters(1, head.seats):
+                break
+            head.status = RegistrationStatus.PENDING
+            head.save(update_fields=['status'])
+            promoted.append(head)
+
+        if promoted:
+            _notify_promoted(promoted)
+        return promoted
+
+
+def _notify_promoted(registrations):
+    from api.utils import queue_emails  # api.utils imports api.models
+
+    participants = EventParticipant.objects.filter(registration__in=registrations).select_related('registration__event')
+    queue_emails([
+        (
+            participant.email,
+            f"You're in - {participant.registration.event.title}",
+            f"Hi {participant.name},\n\nA seat opened up for {participant.registration.event.title} on "
+            f"{participant.registration.event.date:%d %B %Y} and your registration has moved off the "
+            f"waitlist. See you there!\n\nACM CUI Wah Team",
+        )
+        for participant in participants
+    ])
+
 
 class EventRegistration(models.Model):
     event = models.ForeignKey(
@@ -103,9 +384,108 @@ class EventRegistration(models.Model):
         default=RegistrationStatus.PENDING
     )
 
+    # Seats taken, i.e. the number of participants
+    seats = models.PositiveSmallIntegerField(default=1)
+
+    # Shown as a QR code and scanned at the venue
+    check_in_token = models.CharField(max_length=32, unique=True, default=generate_check_in_token, editable=False)
+    checked_in_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = EventRegistrationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The waitlist: each event's waiting registrations in arrival order
+            models.Index(
+                fields=['event', 'id'],
+                condition=models.Q(status=RegistrationStatus.WAITLISTED),
+                name='registration_waitlist_idx',
+            ),
+        ]
+
+    # Lock order is always event row, then registration rows, see EventQuerySet.reconcile_counters
+
     def __str__(self):
         return f"{self.event.title} - {self.registration_type}"
 
+    @property
+    def is_active(self):
+        """ Whether the registration holds seats. """
+        return self.status not in SEATLESS_STATUSES
+
+    def _lock(self):
+        """
+        Locks the event, then this registration, and returns a fresh copy of
+        the registration.
+        """
+        list(Event.objects.select_for_update().filter(pk=self.event_id).values_list('pk'))
+        return EventRegistration.objects.select_for_update().get(pk=self.pk)
+
+    def change_status(self, status):
+        """
+        Sets the status and moves the event's counters when the registration
+        gives up its seats (cancelled or put back on the waitlist) or takes
+        them (reinstated, or promoted by hand). Freed seats go to the waitlist.
+        Cancelling frees the participants to register again.
+
+        :raises NoSeatsAvailable: If taking seats that aren't free
+        :raises DuplicateParticipant: If reinstating a participant who has
+            registered again since
+        """
+        with transaction.atomic():
+            current = self._lock()
+            self.status = status
+            events = Event.objects.filter(pk=self.event_id)
+            if current.is_active and not self.is_active:
+                events.adjust_counters(-1, -current.seats)
+            elif self.is_active and not current.is_active:
+                if not events.filter(seats_remaining__gte=current.seats).adjust_counters(1, current.seats):
+                    raise NoSeatsAvailable()
+            self.save(update_fields=['status'])
+            cancelled = status == RegistrationStatus.CANCELLED
+            if cancelled != (current.status == RegistrationStatus.CANCELLED):
+                try:
+                    self.participants.update(cancelled=cancelled)
+                except IntegrityError as e:
+                    if _is_duplicate_participant(e):
+                        raise DuplicateParticipant() from e
+                    raise
+            if current.is_active and not self.is_active:
+                EventRegistration.objects.promote_waitlisted(self.event_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            current = self._lock()
+            if current.is_active:
+                Event.objects.filter(pk=self.event_id).adjust_counters(-1, -current.seats)
+            if current.checked_in_at:
+                Event.objects.filter(pk=self.event_id).update(checked_in_count=F('checked_in_count') - 1)
+            result = super().delete(*args, **kwargs)
+            if current.is_active:
+                EventRegistration.objects.promote_waitlisted(self.event_id)
+            return result
+
+
+class EventParticipantQuerySet(models.QuerySet):
+    def conflicting(self, event, participants):
+        """
+        Returns the participants of the event that share a reg_no or email
+        (case-insensitively) with any of `participants`, in one query that
+        uses the unique indexes. Participants of cancelled registrations
+        don't count.
+
+        :param participants: List of dicts with reg_no and email
+        """
+        return (
+            self.alias(email_lower=Lower('email'))
+            .filter(
+                models.Q(reg_no__in=[participant['reg_no'] for participant in participants])
+                | models.Q(email_lower__in=[participant['email'].lower() for participant in participants]),
+                event=event,
+                cancelled=False,
+            )
+        )
+
 
 class EventParticipant(models.Model):
     registration = models.ForeignKey(
@@ -113,6 +493,10 @@ class EventParticipant(models.Model):
         on_delete=models.CASCADE,
         related_name='participants'
     )
+    # Copied from the registration, so uniqueness can be enforced per event
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='participants', editable=False)
+    # Whether the registration is cancelled, also copied: those participants may register again
+    cancelled = models.BooleanField(default=False, editable=False)
 
     name = models.CharField(max_length=100)
     email = models.EmailField()
@@ -129,10 +513,28 @@ class EventParticipant(models.Model):
     # )
     phone_no = models.CharField(max_length=20)
 
+    objects = EventParticipantQuerySet.as_manager()
+
+    UNIQUE_CONSTRAINTS = ('unique_event_participant_reg_no', 'unique_event_participant_email')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event', 'reg_no'], condition=models.Q(cancelled=False), name='unique_event_participant_reg_no',
+            ),
+            models.UniqueConstraint(
+                F('event'), Lower('email'), condition=models.Q(cancelled=False), name='unique_event_participant_email',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.event_id is None:
+            self.event_id = self.registration.event_id
+        super().save(*args, **kwargs)
+
 
 # NOTE: Only remove this when serializers and views are finished
 class EventImage(models.Model):
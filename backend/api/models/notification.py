@@ -0,0 +1,25 @@
+from django.db import models
+from django.utils import timezone
+
+
+class PendingEmail(models.Model):
+    """
+    An email waiting to be sent. Rows are written in the transaction that
+    triggered the email, so nothing goes out for a rolled-back change, and
+    flush_pending_emails sends them in batches over one SMTP connection.
+    """
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient}"
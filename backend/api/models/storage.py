@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+
+class StoredObject(models.Model):
+    """
+    A file in the media bucket, keyed by the SHA-256 of its content.
+    Uploads of identical bytes reuse the existing object and bump ref_count;
+    the object is only removed from the bucket once ref_count drops to zero.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=1)
+    # Whether the image variants were made; objects stored by upload_file have none
+    has_variants = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.path} ({self.ref_count} refs)"
+
+
+def with_variant_flag(queryset, field='image'):
+    """
+    Annotates `<field>_has_variants`: whether the image at the path in
+    `field` is recorded with its variants, for get_image_variant_urls,
+    without a query per row.
+    """
+    recorded = StoredObject.objects.filter(path=OuterRef(field), has_variants=True)
+    return queryset.annotate(**{f'{field}_has_variants': Exists(recorded)})
+
+
+class PendingDeletion(models.Model):
+    """
+    A bucket object waiting to be removed. Rows are written in the same
+    transaction as the change that orphaned the object, so a rollback never
+    deletes a live file; flush_pending_deletions drains them in batches.
+    """
+    bucket = models.CharField(max_length=63)
+    path = models.CharField(max_length=255)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket}/{self.path}"
+
+
+class PendingUpload(models.Model):
+    """
+    A path handed out with a signed upload URL. The client uploads the file
+    to the bucket itself and then submits the path; the row is deleted when
+    a serializer claims it, or once it expires (see expire_pending_uploads).
+    """
+    path = models.CharField(max_length=255, unique=True)
+    folder = models.CharField(max_length=32)
+    # The type the client asked to upload; the object's magic bytes must match it
+    content_type = models.CharField(max_length=32, blank=True)
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='pending_uploads')
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.path
@@ -0,0 +1,131 @@
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a fixed (field, id) ordering. The cursor holds the
+    last row's values and the next page is fetched with a WHERE on them, so
+    every page costs the same, however deep, and rows inserted meanwhile
+    don't shift it.
+
+    Opt-in: without ?cursor or ?page_size the full list is returned as before.
+    """
+    ordering = ('-date', 'id')
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.after(queryset.model, cursor))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def after(self, model, cursor):
+        """ Returns the filter selecting the rows that follow the cursor. """
+        field, key = (name.lstrip('-') for name in self.ordering)
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            value = self.parse_value(model, field, value)
+            pk = int(pk)
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        lookup = 'lt' if self.ordering[0].startswith('-') else 'gt'
+        return Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'{key}__gt': pk})
+
+    def parse_value(self, model, field, value):
+        return model._meta.get_field(field).to_python(value)
+
+    def encode_cursor(self, row):
+        field, key = (name.lstrip('-') for name in self.ordering)
+        position = [str(getattr(row, field)), getattr(row, key)]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results per page, at most {self.max_page_size}.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class BlogKeysetPagination(KeysetPagination):
+    ordering = ('-createdAt', 'id')
+
+
+class RankedKeysetPagination(KeysetPagination):
+    """ Pages search results, best match first (see api.search). """
+    ordering = ('-rank', 'id')
+
+    def parse_value(self, model, field, value):
+        # The rank is an annotation, not a model field
+        return float(value)
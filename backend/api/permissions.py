@@ -31,10 +31,10 @@ class IsAdminOrReadOnly(permissions.BasePermission):
 
 class IsLeadOrAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and (request.user.role == LEAD or ADMIN)
+        return request.user.is_authenticated and request.user.role in (LEAD, ADMIN)
 
 def is_staff(role: str):
-    return role == LEAD or ADMIN
+    return role in (LEAD, ADMIN)
 
 class IsTreasurer(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -42,7 +42,7 @@ class IsTreasurer(permissions.BasePermission):
 
 class SignUpPermission(permissions.BasePermission):
     def has_permission(self, request, view):
-        if request.user.is_authenticated and (request.user.role == LEAD or ADMIN):
+        if request.user.is_authenticated and request.user.role in (LEAD, ADMIN):
             if request.user.role == LEAD and request.user.student.club != request.data['club']:
                 raise PermissionDenied('Registering users of another club is not allowed.')
         return True
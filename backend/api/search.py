@@ -0,0 +1,74 @@
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast
+from api.pagination import RankedKeysetPagination
+
+# Text search configuration the search_vector triggers index with (see migration 0030)
+SEARCH_CONFIG = 'english'
+_WORD = re.compile(r'\w+')
+
+
+def parse_query(text: str):
+    """
+    Turns what was typed into a tsquery matching rows with all its words,
+    the last one as a prefix so results show up while it's being typed.
+    Returns None if there are no words in it.
+    """
+    words = _WORD.findall(text)
+    if not words:
+        return None
+    return ' & '.join([*words[:-1], f'{words[-1]}:*'])
+
+
+def search(queryset, text, fallback_fields=()):
+    """
+    Filters the queryset down to rows matching text, best matches first,
+    each annotated with its `rank`. On Postgres this is a full-text search
+    on the model's GIN-indexed search_vector. Other databases get a
+    case-insensitive substring match on fallback_fields, unranked.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        condition = Q()
+        for field in fallback_fields:
+            condition |= Q(**{f'{field}__icontains': text.strip()})
+        return queryset.filter(condition).annotate(rank=Value(0.0, FloatField())).order_by('-rank', 'id')
+
+    tsquery = parse_query(text)
+    if tsquery is None:
+        return queryset.none()
+    query = SearchQuery(tsquery, config=SEARCH_CONFIG, search_type='raw')
+    return (
+        queryset
+        .filter(search_vector=query)
+        # As a double, which comes back exactly, for the page cursors to hold
+        .annotate(rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+        .order_by('-rank', 'id')
+    )
+
+
+class SearchMixin:
+    """
+    Adds ?q= to a list view; ?search= is taken as well, as the frontend
+    sends it. The view passes its queryset through self.search() in
+    get_queryset. Results are ranked, and ?page_size/?cursor page them by
+    rank instead of the view's usual order.
+    """
+    search_fallback_fields = ()
+
+    @property
+    def search_text(self):
+        params = self.request.query_params
+        return (params.get('q') or params.get('search') or '').strip()
+
+    def search(self, queryset):
+        if not self.search_text:
+            return queryset
+        return search(queryset, self.search_text, self.search_fallback_fields)
+
+    @property
+    def paginator(self):
+        if self.search_text and not hasattr(self, '_paginator'):
+            self._paginator = RankedKeysetPagination()
+        return super().paginator
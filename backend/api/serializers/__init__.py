@@ -1,10 +1,11 @@
 from .admin import AdminSerializer
 from .bill import BillSerializer, BillWriteSerializer
-from .blog import BlogSerializer, BlogImageSerializer, BlogUpdateSerializer, BlogUploadSerializer, InlineImageSerializer
-from .event import EventSerializer, EventTypeSerializer, EventWriteSerializer, EventRegistrationCreateSerializer, RegistrationStatusUpdateSerializer, EventParticipantSerializer, EventParticipantReadSerializer, EventRegistrationReadSerializer
+from .blog import BlogSerializer, BlogSummarySerializer, MostReadBlogSerializer, BlogImageSerializer, BlogUpdateSerializer, BlogUploadSerializer, InlineImageSerializer
+from .event import EventSerializer, EventListSerializer, EventTypeSerializer, EventWriteSerializer, EventRegistrationCreateSerializer, RegistrationStatusUpdateSerializer, EventParticipantSerializer, EventParticipantReadSerializer, EventRegistrationReadSerializer
 from .meeting import MeetingSerializer, MeetingAttendanceSerializer
 from .user import UserSerializer, UserListSerializer, StudentSerializer, StudentListSerializer, ProfileUserSerializer, \
     ProfileUpdateSerializer, PublicStudentSerializer, PasswordChangeSerializer, OTPSerializer, LoginSerializer
 from .recruitment import RecruitmentApplicationSubmissionSerializer, RecruitmentApplicationSerializer, \
     ApplicationStatusUpdateSerializer, RecruitmentApplicationDetailSerializer, AcademicInfoSerializer, \
     PersonalInfoSerializer, RolePreferencesSerializer, RecruitmentSessionSerializer
+from .upload import SignedUploadSerializer, ImageUploadField, UploadedObjectField
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from api.models import Bill
-from api.utils import get_bucket_public_url, upload_file
+from api.utils import get_bucket_public_url, get_image_variant_urls, upload_image
+from .upload import ImageUploadField, UploadedObjectField, claim_uploaded_objects
 
 class BillSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Bill
@@ -15,33 +17,51 @@ class BillSerializer(serializers.ModelSerializer):
             return None
         return get_bucket_public_url(obj.image)
 
+    def get_image_srcset(self, obj):
+        return get_image_variant_urls(obj.image, getattr(obj, 'image_has_variants', None))
+
 
 class BillWriteSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField(write_only=True, required=True)
+    image = ImageUploadField(write_only=True, required=False)
+    image_path = UploadedObjectField("bills", write_only=True, required=False)
 
     class Meta:
         model = Bill
         fields = '__all__'
         read_only_fields = ['id']
 
+    def validate(self, data):
+        if self.instance is None and not data.get("image") and not data.get("image_path"):
+            raise serializers.ValidationError({"image": ["This field is required."]})
+        return data
+
     def create(self, validated_data):
         uploaded_image = validated_data.pop("image", None)
+        image_path = validated_data.pop("image_path", None)
         bill = Bill.objects.create(**validated_data)
 
         if uploaded_image:
-            bill.image = upload_file(uploaded_image, "bills")
+            bill.image = upload_image(uploaded_image, "bills")
+            bill.save(update_fields=["image"])
+        elif image_path:
+            claim_uploaded_objects("image_path", [image_path])
+            bill.image = image_path
             bill.save(update_fields=["image"])
 
         return bill
 
     def update(self, instance, validated_data):
         image = validated_data.pop('image', None)
+        image_path = validated_data.pop('image_path', None)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
         if image:
-            instance.image = upload_file(image, "bills")
+            instance.image = upload_image(image, "bills")
+        elif image_path:
+            claim_uploaded_objects('image_path', [image_path])
+            instance.image = image_path
 
         instance.save()
         return instance
\ No newline at end of file
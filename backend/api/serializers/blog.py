@@ -1,22 +1,22 @@
 from typing import Optional
-from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 from api.models import Blog, BlogImage, InlineImage
-from api.utils import get_bucket_public_url, upload_file, delete_from_bucket
+from api.utils import get_bucket_public_url, get_image_variant_urls, upload_image, upload_files, delete_from_bucket, \
+    discard_uploads
+from .upload import ImageUploadField, UploadedObjectField, claim_uploaded_objects
 
-# Allowed types & default max size (5 MB)
-ALLOWED_IMAGE_TYPES = ("image/jpeg", "image/png", "image/webp")
-MAX_IMAGE_SIZE = getattr(settings, "MAX_BLOG_IMAGE_SIZE", 5 * 1024 * 1024)  # bytes
 TEMP_INLINE_PREFIX = "/media/temp_inline/"
 
 
 class BlogImageSerializer(serializers.ModelSerializer):
     relative_path = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = BlogImage
-        fields = ("id", "relative_path", "image_url")
+        fields = ("id", "relative_path", "image_url", "image_srcset")
 
     def get_relative_path(self, obj) -> str:
         return obj.image
@@ -26,14 +26,23 @@ class BlogImageSerializer(serializers.ModelSerializer):
             return None
         return get_bucket_public_url(obj.image)
 
+    def get_image_srcset(self, obj) -> Optional[dict]:
+        return get_image_variant_urls(obj.image, getattr(obj, 'image_has_variants', None))
+
 
 class InlineImageSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField(write_only=True)
+    image = ImageUploadField(write_only=True, required=False)
+    image_path = UploadedObjectField("blogs", write_only=True, required=False)
     url = serializers.SerializerMethodField()
 
     class Meta:
         model = InlineImage
-        fields = ['id', 'image', 'url', 'uploaded_at']
+        fields = ['id', 'image', 'image_path', 'url', 'uploaded_at']
+
+    def validate(self, data):
+        if self.instance is None and not data.get('image') and not data.get('image_path'):
+            raise serializers.ValidationError("Either image or image_path is required.")
+        return data
 
     def get_url(self, obj):
         if not obj.image:
@@ -42,22 +51,31 @@ class InlineImageSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         image = validated_data.pop('image', None)
+        image_path = validated_data.pop('image_path', None)
         inline_image = InlineImage.objects.create(**validated_data)
 
         if image:
-            inline_image.image = upload_file(image, "blogs")
+            inline_image.image = upload_image(image, "blogs")
+            inline_image.save(update_fields=["image"])
+        elif image_path:
+            claim_uploaded_objects('image_path', [image_path])
+            inline_image.image = image_path
             inline_image.save(update_fields=["image"])
 
         return inline_image
 
     def update(self, instance, validated_data):
         image = validated_data.pop('image', None)
+        image_path = validated_data.pop('image_path', None)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
         if image:
-            instance.image = upload_file(image, "blogs")
+            instance.image = upload_image(image, "blogs")
+        elif image_path:
+            claim_uploaded_objects('image_path', [image_path])
+            instance.image = image_path
 
         instance.save()
         return instance
@@ -77,47 +95,82 @@ class BlogSerializer(serializers.ModelSerializer):
         return {"id": user.id, "username": getattr(user, "username", None)}
 
 
+class BlogSummarySerializer(BlogSerializer):
+    """
+    The fields a blog card needs: the plain-text excerpt replaces the
+    content, which is only served by the detail endpoint.
+    """
+
+    class Meta:
+        model = Blog
+        fields = ("id", "title", "excerpt", "created_by", "createdBy", "createdAt", "updatedAt", "images")
+
+
+class MostReadBlogSerializer(BlogSummarySerializer):
+    views = serializers.IntegerField(read_only=True)
+
+    class Meta(BlogSummarySerializer.Meta):
+        fields = (*BlogSummarySerializer.Meta.fields, "views")
+
+
 class BlogUploadSerializer(serializers.Serializer):
     title = serializers.CharField(max_length=255)
     content = serializers.CharField()
+    # ImageUploadField checks the type and dimensions.
+    # NOTE: Image size limit is set in Supabase bucket. Setting it in two places might cause inconsistency.
     images = serializers.ListField(
-        child=serializers.ImageField(),
-        allow_empty=False
+        child=ImageUploadField(),
+        allow_empty=False,
+        required=False
+    )
+    image_paths = serializers.ListField(
+        child=UploadedObjectField("blogs"),
+        allow_empty=False,
+        required=False,
+        help_text="Paths uploaded through a signed upload URL, instead of (or as well as) images"
     )
 
-    def validate_images(self, images):
-        for img in images:
-            # NOTE: Image size limit is set in Supabase bucket. Setting it in two places might cause inconsistency.
-            # if img.size > MAX_IMAGE_SIZE:
-            #     raise serializers.ValidationError(f"{img.name} exceeds the max size of {MAX_IMAGE_SIZE} bytes.")
-
-            content_type = getattr(img, "content_type", None)
-            if content_type not in ALLOWED_IMAGE_TYPES:
-                raise serializers.ValidationError(f"{img.name} has invalid content type ({content_type}).")
-        return images
+    def validate(self, data):
+        if not data.get("images") and not data.get("image_paths"):
+            raise serializers.ValidationError({"images": ["At least one image is required."]})
+        return data
 
     def create(self, validated_data):
         request = self.context.get("request")
         user = request.user
 
-        blog = Blog.objects.create(
-            title=validated_data["title"],
-            content=validated_data["content"],
-            createdBy=user
-        )
+        # Upload first so a failed upload doesn't leave a blog without its images
+        image_paths = upload_files(validated_data.get("images", []), "blogs", images=True)
 
-        for img in validated_data["images"]:
-            image_path = upload_file(img, "blogs")
-            BlogImage.objects.create(blog=blog, image=image_path)
+        try:
+            claim_uploaded_objects("image_paths", validated_data.get("image_paths", []))
+            image_paths += validated_data.get("image_paths", [])
+            blog = Blog.objects.create(
+                title=validated_data["title"],
+                content=validated_data["content"],
+                createdBy=user
+            )
+            BlogImage.objects.bulk_create([
+                BlogImage(blog=blog, image=path) for path in image_paths
+            ])
+        except Exception:
+            discard_uploads(image_paths)
+            raise
 
         return blog
 
 
 class BlogUpdateSerializer(serializers.ModelSerializer):
     images = serializers.ListField(
-        child=serializers.ImageField(),
+        child=ImageUploadField(),
         required=False
     )
+    image_paths = serializers.ListField(
+        child=UploadedObjectField("blogs"),
+        required=False,
+        write_only=True,
+        help_text="Paths uploaded through a signed upload URL"
+    )
     images_to_delete = serializers.ListField(
         child=serializers.IntegerField(),
         required=False,
@@ -127,31 +180,43 @@ class BlogUpdateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Blog
-        fields = ("title", "content", "images", "images_to_delete")
+        fields = ("title", "content", "images", "image_paths", "images_to_delete")
 
     def update(self, instance, validated_data):
         new_images = validated_data.pop("images", None)
+        uploaded_paths = validated_data.pop("image_paths", [])
         images_to_delete = validated_data.pop("images_to_delete", [])
 
-        instance.title = validated_data.get("title", instance.title)
-        instance.content = validated_data.get("content", instance.content)
-        instance.save()
-
-        if images_to_delete:
-            images = BlogImage.objects.filter(
-                blog=instance,
-                id__in=images_to_delete
-            )
-
-            for img in images:
-                if img.image:
-                    delete_from_bucket("media", img.image)
-
-            images.delete()
-
-        if new_images:
-            for img in new_images:
-                image_path = upload_file(img, "blogs")
-                BlogImage.objects.create(blog=instance, image=image_path)
+        # Upload first so a failed upload leaves the post untouched
+        image_paths = upload_files(new_images, "blogs", images=True) if new_images else []
+
+        try:
+            claim_uploaded_objects("image_paths", uploaded_paths)
+            image_paths += uploaded_paths
+
+            with transaction.atomic():
+                instance.title = validated_data.get("title", instance.title)
+                instance.content = validated_data.get("content", instance.content)
+                instance.save()
+
+                if images_to_delete:
+                    images = BlogImage.objects.filter(
+                        blog=instance,
+                        id__in=images_to_delete
+                    )
+
+                    for img in images:
+                        if img.image:
+                            delete_from_bucket("media", img.image)
+
+                    images.delete()
+
+                if image_paths:
+                    BlogImage.objects.bulk_create([
+                        BlogImage(blog=instance, image=path) for path in image_paths
+                    ])
+        except Exception:
+            discard_uploads(image_paths)
+            raise
 
         return instance
@@ -1,7 +1,10 @@
-from rest_framework import serializers
-from api.models import Event, EventType, EventRegistration, EventParticipant, RegistrationType, RegistrationStatus
 from django.db import transaction
-from api.utils import get_bucket_public_url, upload_file
+from django.urls import reverse
+from rest_framework import serializers
+from api.models import Event, EventType, EventRegistration, EventParticipant, RegistrationType, RegistrationStatus, \
+    NoSeatsAvailable, DuplicateParticipant
+from api.utils import get_bucket_public_url, get_check_in_qr_code, get_image_variant_urls, upload_image
+from .upload import ImageUploadField, UploadedObjectField, claim_uploaded_objects
 
 
 class EventTypeSerializer(serializers.ModelSerializer):
@@ -16,21 +19,50 @@ class EventSerializer(serializers.ModelSerializer):
     time_to = serializers.TimeField(format='%I:%M %p')
     registration_count = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Event
-        fields = '__all__'
+        exclude = ['search_vector']
 
     def get_registration_count(self, obj):
-        return obj.registrations.exclude(
-            status=RegistrationStatus.CANCELLED
-        ).count()
+        return obj.active_registration_count
 
     def get_image(self, obj):
         if not obj.image:
             return None
         return get_bucket_public_url(obj.image)
 
+    def get_image_srcset(self, obj):
+        return get_image_variant_urls(obj.image, getattr(obj, 'image_has_variants', None))
+
+
+class EventListSerializer(EventSerializer):
+    """
+    The fields an event card needs. The content is left out; it's only
+    served by the detail endpoint.
+    """
+
+    class Meta:
+        model = Event
+        fields = [
+            'id',
+            'event_type',
+            'title',
+            'description',
+            'date',
+            'time_from',
+            'time_to',
+            'location',
+            'image',
+            'image_srcset',
+            'total_seats',
+            'seats_remaining',
+            'registration_count',
+            'tags',
+            'hosts',
+        ]
+
 
 class EventWriteSerializer(serializers.ModelSerializer):
     event_type = serializers.PrimaryKeyRelatedField(
@@ -39,7 +71,12 @@ class EventWriteSerializer(serializers.ModelSerializer):
     time_from = serializers.TimeField(format='%I:%M %p')
     time_to = serializers.TimeField(format='%I:%M %p')
 
-    image = serializers.ImageField(
+    image = ImageUploadField(
+        write_only=True,
+        required=False
+    )
+    image_path = UploadedObjectField(
+        "events",
         write_only=True,
         required=False
     )
@@ -57,6 +94,7 @@ class EventWriteSerializer(serializers.ModelSerializer):
             'time_to',
             'location',
             'image',
+            'image_path',
             'total_seats',
             'tags',
             'hosts',
@@ -65,22 +103,31 @@ class EventWriteSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         image = validated_data.pop('image', None)
+        image_path = validated_data.pop('image_path', None)
         event = Event.objects.create(**validated_data)
 
         if image:
-            event.image = upload_file(image, "events")
+            event.image = upload_image(image, "events")
+            event.save(update_fields=["image"])
+        elif image_path:
+            claim_uploaded_objects('image_path', [image_path])
+            event.image = image_path
             event.save(update_fields=["image"])
 
         return event
 
     def update(self, instance, validated_data):
         image = validated_data.pop('image', None)
+        image_path = validated_data.pop('image_path', None)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
         if image:
-            instance.image_path = upload_file(image, "events")
+            instance.image = upload_image(image, "events")
+        elif image_path:
+            claim_uploaded_objects('image_path', [image_path])
+            instance.image = image_path
 
         instance.save()
         return instance
@@ -101,6 +148,8 @@ class EventParticipantSerializer(serializers.ModelSerializer):
 
 class EventRegistrationCreateSerializer(serializers.ModelSerializer):
     participants = EventParticipantSerializer(many=True, write_only=True)
+    # Shown to the registrant and scanned at the venue
+    check_in_qr_code = serializers.SerializerMethodField()
 
     class Meta:
         model = EventRegistration
@@ -109,17 +158,27 @@ class EventRegistrationCreateSerializer(serializers.ModelSerializer):
             'registration_type',
             'team_name',
             'participants',
+            'status',
+            'check_in_token',
+            'check_in_qr_code',
         ]
+        # WAITLISTED when the event was full
+        read_only_fields = ['status', 'check_in_token']
+
+    def get_check_in_qr_code(self, obj) -> str:
+        url = reverse('check-in-qr-code', args=[obj.check_in_token])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
-    # For enforcing the total seats/spots limit
     def validate(self, data):
         event = data['event']
         participants = data.get('participants', [])
         reg_type = data['registration_type']
 
-        if event.registrations.count() >= event.total_seats:
+        # A full event puts registrations on its waitlist, but one that could never fit is refused
+        if len(participants) > event.total_seats:
             raise serializers.ValidationError(
-                "No seats available for this event."
+                "Not enough seats for this event."
             )
 
         if reg_type == RegistrationType.SINGLE and len(participants) != 1:
@@ -133,22 +192,42 @@ class EventRegistrationCreateSerializer(serializers.ModelSerializer):
         #         "Team registration must have at least two participants."
         #     )
 
+        reg_nos = [participant['reg_no'] for participant in participants]
+        emails = [participant['email'].lower() for participant in participants]
+        if len(set(reg_nos)) < len(reg_nos) or len(set(emails)) < len(emails):
+            raise serializers.ValidationError(
+                "Each participant must have a different registration number and email."
+            )
+
+        # One query for the whole team
+        registered = EventParticipant.objects.conflicting(event, participants).values_list('reg_no', 'email')
+        conflicts = sorted({
+            value
+            for reg_no, email in registered
+            for value in (reg_no, email)
+            if value in reg_nos or value.lower() in emails
+        })
+        if conflicts:
+            raise serializers.ValidationError(
+                f"Already registered for this event: {', '.join(conflicts)}."
+            )
+
         return data
 
-    @transaction.atomic
     def create(self, validated_data):
         participants_data = validated_data.pop('participants')
+        event = validated_data.pop('event')
 
-        registration = EventRegistration.objects.create(**validated_data)
-
-        EventParticipant.objects.bulk_create([
-            EventParticipant(
-                registration=registration,
-                **participant
+        try:
+            registration = EventRegistration.objects.register(event, participants_data, **validated_data)
+        except DuplicateParticipant:
+            # Someone else registered the same participant since validate()
+            raise serializers.ValidationError(
+                "A participant is already registered for this event."
             )
-            for participant in participants_data
-        ])
 
+        token = registration.check_in_token
+        transaction.on_commit(lambda: get_check_in_qr_code(token))
         return registration
 
 
@@ -159,6 +238,19 @@ class RegistrationStatusUpdateSerializer(serializers.ModelSerializer):
         model = EventRegistration
         fields = ['status']
 
+    def update(self, instance, validated_data):
+        try:
+            instance.change_status(validated_data['status'])
+        except NoSeatsAvailable:
+            raise serializers.ValidationError(
+                "Not enough seats left for this registration."
+            )
+        except DuplicateParticipant:
+            raise serializers.ValidationError(
+                "A participant has registered for this event again since it was cancelled."
+            )
+        return instance
+
 
 class EventParticipantReadSerializer(serializers.ModelSerializer):
     class Meta:
@@ -186,6 +278,7 @@ class EventRegistrationReadSerializer(serializers.ModelSerializer):
             'registration_type',
             'team_name',
             'status',
+            'checked_in_at',
             'participants',
         ]
         read_only_fields = fields
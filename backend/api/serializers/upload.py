@@ -0,0 +1,139 @@
+from io import BytesIO
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from api.images import is_image_path, read_image_header
+from api.models import PendingUpload
+from api.storage import StorageError, get_storage
+from api.utils import claim_upload
+
+ALLOWED_IMAGE_TYPES = ("image/jpeg", "image/png", "image/webp")
+UPLOAD_FOLDERS = ("blogs", "events", "bills", "profiles")
+
+IMAGE_ERROR_MESSAGES = {
+    'invalid_image': serializers.ImageField.default_error_messages['invalid_image'],
+    'too_large': 'Image is {width}x{height}; images may be at most {max_side} pixels on a side '
+                 'and {max_pixels} pixels in total.',
+}
+
+
+def check_image_size(field, width, height):
+    """ Fails `field` with 'too_large' if the dimensions are over MAX_IMAGE_DIMENSION/MAX_IMAGE_PIXELS. """
+    if max(width, height) > settings.MAX_IMAGE_DIMENSION or width * height > settings.MAX_IMAGE_PIXELS:
+        field.fail('too_large', width=width, height=height,
+                   max_side=settings.MAX_IMAGE_DIMENSION, max_pixels=settings.MAX_IMAGE_PIXELS)
+
+
+class SignedUploadSerializer(serializers.Serializer):
+    folder = serializers.ChoiceField(choices=UPLOAD_FOLDERS)
+    filename = serializers.CharField(max_length=150)
+    content_type = serializers.ChoiceField(choices=ALLOWED_IMAGE_TYPES)
+
+    # Returned
+    path = serializers.CharField(read_only=True)
+    upload_url = serializers.CharField(read_only=True)
+    token = serializers.CharField(read_only=True)
+    expires_at = serializers.DateTimeField(read_only=True)
+    max_size = serializers.IntegerField(read_only=True)
+
+    def validate_filename(self, value):
+        if not is_image_path(value):
+            raise serializers.ValidationError(f"{value} is not an image file name.")
+        return value
+
+
+class ImageUploadField(serializers.FileField):
+    """
+    An uploaded image validated from its header alone. The format comes from
+    the file's magic bytes rather than the client's Content-Type, and the
+    dimensions are checked before anything decodes the pixels. Unlike DRF's
+    ImageField the upload isn't copied into memory and verified by Pillow;
+    a corrupt body still fails later, when the variants are generated.
+    """
+    default_error_messages = IMAGE_ERROR_MESSAGES
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        try:
+            content_type, width, height = read_image_header(file)
+        except ValueError:
+            self.fail('invalid_image')
+
+        # The extension matters too: the stored path keeps it, and variants are keyed on it
+        if content_type not in ALLOWED_IMAGE_TYPES or not is_image_path(file.name):
+            self.fail('invalid_image')
+        check_image_size(self, width, height)
+
+        file.content_type = content_type
+        return file
+
+
+class UploadedObjectField(serializers.CharField):
+    """
+    The path of an image the client uploaded itself through a signed URL,
+    accepted in place of a file. The path must have been issued to the
+    requesting user for `folder`, be unexpired, and exist in the bucket.
+    Before anything decodes it, the object is held to what ImageUploadField
+    checks, from a ranged read of its header, and must be of the type that
+    was requested and at most SIGNED_UPLOAD_MAX_SIZE bytes.
+    Serializers call claim_uploaded_objects() when saving.
+    """
+    default_error_messages = {
+        **IMAGE_ERROR_MESSAGES,
+        'unknown': 'No upload was requested for this path.',
+        'expired': 'The upload URL for this path has expired.',
+        'missing': 'Nothing has been uploaded to this path.',
+        'wrong_type': 'The uploaded image is {content_type}, not the {expected} that was requested.',
+        'too_big': 'The uploaded file is {size} bytes; direct uploads may be at most {max_size} bytes.',
+    }
+
+    def __init__(self, folder, **kwargs):
+        self.folder = folder
+        kwargs.setdefault('max_length', 255)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        path = super().to_internal_value(data)
+        pending = PendingUpload.objects.filter(path=path, folder=self.folder)
+        request = self.context.get("request")
+        if request is not None:
+            pending = pending.filter(uploaded_by_id=request.user.pk)
+        pending = pending.first()
+
+        if pending is None:
+            self.fail('unknown')
+        if pending.expires_at <= timezone.now():
+            self.fail('expired')
+
+        storage = get_storage()
+        size = storage.size(path)
+        if size is None:
+            self.fail('missing')
+        if size > settings.SIGNED_UPLOAD_MAX_SIZE:
+            self.fail('too_big', size=size, max_size=settings.SIGNED_UPLOAD_MAX_SIZE)
+        try:
+            head = storage.download_range(path, settings.SIGNED_UPLOAD_HEADER_BYTES)
+            content_type, width, height = read_image_header(BytesIO(head))
+        except StorageError:
+            self.fail('missing')
+        except ValueError:
+            self.fail('invalid_image')
+
+        if content_type not in ALLOWED_IMAGE_TYPES:
+            self.fail('invalid_image')
+        if pending.content_type and content_type != pending.content_type:
+            self.fail('wrong_type', content_type=content_type, expected=pending.content_type)
+        check_image_size(self, width, height)
+        return path
+
+
+def claim_uploaded_objects(field_name, paths, images=True):
+    """
+    Claims every path or none of them: if one was claimed by a concurrent
+    request in the meantime, the others are left pending.
+    """
+    with transaction.atomic():
+        for path in paths:
+            if not claim_upload(path, image=images):
+                raise serializers.ValidationError({field_name: [f"The upload for {path} is no longer available."]})
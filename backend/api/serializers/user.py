@@ -3,7 +3,8 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from api.models import User, Student
 from django.contrib.auth import authenticate
-from api.utils import upload_file, delete_from_bucket, get_bucket_public_url
+from api.utils import upload_image, delete_from_bucket, get_bucket_public_url, get_image_variant_urls
+from .upload import ImageUploadField, UploadedObjectField, claim_uploaded_objects
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -14,7 +15,8 @@ class UserSerializer(serializers.ModelSerializer):
 
 class StudentSerializer(serializers.ModelSerializer):
     user = UserSerializer()
-    profile_pic = serializers.ImageField(write_only=True, required=False)  # incoming file
+    profile_pic = ImageUploadField(write_only=True, required=False)  # incoming file
+    profile_pic_path = UploadedObjectField("profiles", write_only=True, required=False)  # or a direct upload
     profile_pic_url = serializers.SerializerMethodField()  # public URL for read
 
     roll_no = serializers.RegexField(
@@ -53,6 +55,7 @@ class StudentSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user_data = validated_data.pop('user')
         uploaded_file = validated_data.pop('profile_pic', None)
+        uploaded_path = validated_data.pop('profile_pic_path', None)
 
         # Create user
         user_data['password'] = make_password(user_data['password'])
@@ -63,7 +66,11 @@ class StudentSerializer(serializers.ModelSerializer):
 
         # Upload profile pic
         if uploaded_file:
-            student.profile_pic = upload_file(uploaded_file, "profiles")
+            student.profile_pic = upload_image(uploaded_file, "profiles")
+            student.save(update_fields=["profile_pic"])
+        elif uploaded_path:
+            claim_uploaded_objects('profile_pic_path', [uploaded_path])
+            student.profile_pic = uploaded_path
             student.save(update_fields=["profile_pic"])
 
         return student
@@ -71,6 +78,7 @@ class StudentSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         user_data = validated_data.pop('user', None)
         uploaded_file = validated_data.pop('profile_pic', None)
+        uploaded_path = validated_data.pop('profile_pic_path', None)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -107,7 +115,13 @@ class StudentSerializer(serializers.ModelSerializer):
             if instance.profile_pic:
                 delete_from_bucket("media", instance.profile_pic)
             
-            instance.profile_pic = upload_file(uploaded_file, "profiles")
+            instance.profile_pic = upload_image(uploaded_file, "profiles")
+        elif uploaded_path:
+            claim_uploaded_objects('profile_pic_path', [uploaded_path])
+            if instance.profile_pic:
+                delete_from_bucket("media", instance.profile_pic)
+
+            instance.profile_pic = uploaded_path
 
         instance.save()
         return instance
@@ -137,10 +151,11 @@ class StudentListSerializer(serializers.ModelSerializer):
 class PublicStudentSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
     profile_pic = serializers.SerializerMethodField()
+    profile_pic_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Student
-        fields = ['full_name', 'title', 'profile_pic', 'user_id', 'club']
+        fields = ['full_name', 'title', 'profile_pic', 'profile_pic_srcset', 'user_id', 'club']
 
     def get_full_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}"
@@ -150,6 +165,9 @@ class PublicStudentSerializer(serializers.ModelSerializer):
             return None
         return get_bucket_public_url(obj.profile_pic)
 
+    def get_profile_pic_srcset(self, obj):
+        return get_image_variant_urls(obj.profile_pic, getattr(obj, 'profile_pic_has_variants', None))
+
 
 class ProfileUserSerializer(serializers.ModelSerializer):
     """Serializer for updating user info in profile updates"""
@@ -190,12 +208,13 @@ class ProfileUserSerializer(serializers.ModelSerializer):
 class ProfileUpdateSerializer(serializers.ModelSerializer):
     """Serializer specifically for profile updates - doesn't require roll_no validation"""
     user = ProfileUserSerializer(required=False)
-    profile_pic = serializers.ImageField(required=False, allow_null=True)
+    profile_pic = ImageUploadField(required=False, allow_null=True)
+    profile_pic_path = UploadedObjectField("profiles", write_only=True, required=False)
     profile_desc = serializers.CharField(required=False, allow_blank=True, max_length=200)
 
     class Meta:
         model = Student
-        fields = ['id', 'user', 'profile_pic', 'profile_desc']
+        fields = ['id', 'user', 'profile_pic', 'profile_pic_path', 'profile_desc']
         read_only_fields = ['id']
 
     def validate_user(self, value):
@@ -220,6 +239,14 @@ class ProfileUpdateSerializer(serializers.ModelSerializer):
         
         sentinel = object()
         uploaded_file = validated_data.pop('profile_pic', sentinel)
+        uploaded_path = validated_data.pop('profile_pic_path', None)
+        if uploaded_path:
+            # A direct upload replaces the picture; profile_pic is ignored then
+            claim_uploaded_objects('profile_pic_path', [uploaded_path])
+            uploaded_file = sentinel
+            if instance.profile_pic:
+                delete_from_bucket("media", instance.profile_pic)
+            instance.profile_pic = uploaded_path
 
         if uploaded_file is not sentinel:
             if instance.profile_pic:
@@ -228,7 +255,7 @@ class ProfileUpdateSerializer(serializers.ModelSerializer):
             if uploaded_file is None:
                 instance.profile_pic = None
             else:
-                instance.profile_pic = upload_file(uploaded_file, "profiles")
+                instance.profile_pic = upload_image(uploaded_file, "profiles")
 
         if 'profile_desc' in validated_data:
             instance.profile_desc = validated_data['profile_desc']
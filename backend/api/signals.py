@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from api.cache import bump_version
+from api.models import Blog, BlogImage, Event, EventRegistration, EventType, RecruitmentSession, Student
+
+# Models public responses are cached from, see api.cache.cache_response
+CACHED_MODELS = (Event, EventType, EventRegistration, Blog, BlogImage, Student, get_user_model(), RecruitmentSession)
+
+
+def invalidate_cached_responses(sender, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which no cached response shows
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_version(sender)
+
+
+def connect():
+    for model in CACHED_MODELS:
+        post_save.connect(invalidate_cached_responses, sender=model, dispatch_uid=f'cache-{model._meta.label}-save')
+        post_delete.connect(invalidate_cached_responses, sender=model, dispatch_uid=f'cache-{model._meta.label}-delete')
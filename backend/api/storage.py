@@ -0,0 +1,389 @@
+import base64
+import logging
+import os
+import random
+import secrets
+import time
+from pathlib import Path
+from threading import Lock
+from urllib.parse import parse_qs, urlsplit
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from .supabase import get_supabase
+
+logger = logging.getLogger(__name__)
+
+
+class StorageError(Exception):
+    pass
+
+
+class StorageBackend:
+    """
+    Interface every media storage implementation provides. Paths are
+    relative to the bucket, e.g. 'blogs/<uuid>_photo.jpg'.
+    """
+
+    def __init__(self, bucket=None):
+        self.bucket = bucket or settings.SUPABASE_BUCKET
+
+    def upload(self, path, file, content_type, upsert=False):
+        """ Stores a Django File (anything with .size and .chunks()) at path. """
+        raise NotImplementedError
+
+    def remove(self, paths, bucket=None):
+        """ Removes several objects at once. Missing objects are ignored. """
+        raise NotImplementedError
+
+    def download(self, path) -> bytes:
+        raise NotImplementedError
+
+    def download_range(self, path, length) -> bytes:
+        """ Returns the first `length` bytes of the object (all of it if it's shorter). """
+        raise NotImplementedError
+
+    def exists(self, path) -> bool:
+        raise NotImplementedError
+
+    def size(self, path):
+        """ Returns the object's size in bytes, or None if there is no such object. """
+        raise NotImplementedError
+
+    def public_url(self, path) -> str:
+        raise NotImplementedError
+
+    def create_signed_upload_url(self, path) -> dict:
+        """
+        Returns {"url": ..., "token": ...} for a single upload to path made by
+        the client itself. Backends that can't do this raise NotImplementedError.
+        """
+        raise NotImplementedError
+
+
+class SupabaseStorage(StorageBackend):
+    """
+    Supabase Storage. Uploads are streamed in UPLOAD_CHUNK_SIZE chunks;
+    files of RESUMABLE_UPLOAD_THRESHOLD bytes or more use the resumable
+    (TUS) endpoint.
+    """
+
+    def __init__(self, bucket=None):
+        super().__init__(bucket)
+        self._client = None
+        self._client_lock = Lock()
+
+    def _get_client(self):
+        """
+        Returns a shared httpx client for the Supabase Storage REST API.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx  # Deferred with the rest of the Supabase stack, see api.supabase
+
+                    self._client = httpx.Client(
+                        base_url=f"{settings.SUPABASE_URL}/storage/v1",
+                        headers={
+                            "apikey": settings.SUPABASE_KEY,
+                            "Authorization": f"Bearer {settings.SUPABASE_KEY}",
+                        },
+                        timeout=settings.UPLOAD_TIMEOUT,
+                    )
+        return self._client
+
+    def upload(self, path, file, content_type, upsert=False):
+        if file.size >= settings.RESUMABLE_UPLOAD_THRESHOLD:
+            self._upload_resumable(path, file, content_type, upsert)
+        else:
+            self._upload_streaming(path, file, content_type, upsert)
+
+    def _upload_streaming(self, path, file, content_type, upsert=False):
+        """
+        Sends the file as the raw request body, one chunk at a time.
+        """
+        file.seek(0)
+        response = self._get_client().post(
+            f"/object/{self.bucket}/{path}",
+            content=file.chunks(settings.UPLOAD_CHUNK_SIZE),
+            headers={
+                "Content-Type": content_type,
+                "Content-Length": str(file.size),
+                "x-upsert": "true" if upsert else "false",
+            },
+        )
+        response.raise_for_status()
+
+    def _upload_resumable(self, path, file, content_type, upsert=False):
+        """
+        Uploads the file through the TUS protocol. Each PATCH carries one
+        RESUMABLE_UPLOAD_CHUNK_SIZE chunk, itself streamed from the file; after
+        a failed chunk the server's offset is queried and the upload continues
+        from there.
+        """
+        from httpx import HTTPError
+
+        client = self._get_client()
+        tus_headers = {"Tus-Resumable": "1.0.0"}
+
+        response = client.post(
+            "/upload/resumable",
+            headers={
+                **tus_headers,
+                "Upload-Length": str(file.size),
+                "Upload-Metadata": _tus_metadata(
+                    bucketName=self.bucket,
+                    objectName=path,
+                    contentType=content_type,
+                ),
+                "x-upsert": "true" if upsert else "false",
+            },
+        )
+        response.raise_for_status()
+        upload_url = response.headers["Location"]
+
+        offset = 0
+        retries = 0
+        while offset < file.size:
+            length = min(settings.RESUMABLE_UPLOAD_CHUNK_SIZE, file.size - offset)
+            file.seek(offset)
+            try:
+                response = client.patch(
+                    upload_url,
+                    content=_read_range(file, length),
+                    headers={
+                        **tus_headers,
+                        "Upload-Offset": str(offset),
+                        "Content-Length": str(length),
+                        "Content-Type": "application/offset+octet-stream",
+                    },
+                )
+                response.raise_for_status()
+                offset = int(response.headers["Upload-Offset"])
+                retries = 0
+            except HTTPError as e:
+                retries += 1
+                if retries > settings.RESUMABLE_UPLOAD_RETRIES:
+                    raise
+                logger.warning(f"Resumable upload of {path} failed at offset {offset}, resuming: {str(e)}")
+                head = client.head(upload_url, headers=tus_headers)
+                head.raise_for_status()
+                offset = int(head.headers["Upload-Offset"])
+
+    def remove(self, paths, bucket=None):
+        get_supabase().storage.from_(bucket or self.bucket).remove(list(paths))
+
+    def download(self, path):
+        response = self._get_client().get(f"/object/{self.bucket}/{path}")
+        response.raise_for_status()
+        return response.content
+
+    def download_range(self, path, length):
+        response = self._get_client().get(f"/object/{self.bucket}/{path}", headers={"Range": f"bytes=0-{length - 1}"})
+        response.raise_for_status()
+        return response.content[:length]
+
+    def exists(self, path):
+        response = self._get_client().head(f"/object/{self.bucket}/{path}")
+        return response.status_code == 200
+
+    def size(self, path):
+        response = self._get_client().head(f"/object/{self.bucket}/{path}")
+        if response.status_code != 200:
+            return None
+        return int(response.headers["Content-Length"])
+
+    def public_url(self, path):
+        return f"{settings.SUPABASE_URL}/storage/v1/object/public/{self.bucket}/{path}"
+
+    def create_signed_upload_url(self, path):
+        response = self._get_client().post(f"/object/upload/sign/{self.bucket}/{path}")
+        response.raise_for_status()
+        # e.g. /object/upload/sign/media/blogs/<uuid>_photo.jpg?token=...
+        url = response.json()["url"]
+        token = parse_qs(urlsplit(url).query)["token"][0]
+        return {"url": f"{settings.SUPABASE_URL}/storage/v1{url}", "token": token}
+
+
+class LocalFileSystemStorage(StorageBackend):
+    """
+    Stores objects under MEDIA_ROOT/<bucket>/ and serves them from MEDIA_URL,
+    for working offline. Django only serves MEDIA_URL when DEBUG is on.
+    """
+
+    def __init__(self, bucket=None, location=None, base_url=None):
+        super().__init__(bucket)
+        self.location = Path(location or settings.MEDIA_ROOT) / self.bucket
+        self.base_url = base_url or f"{settings.MEDIA_URL}{self.bucket}/"
+
+    def _full_path(self, path, bucket=None):
+        root = self.location if bucket in (None, self.bucket) else self.location.parent / bucket
+        full_path = (root / path).resolve()
+        if root.resolve() not in full_path.parents:
+            raise StorageError(f"Path escapes the storage root: {path}")
+        return full_path
+
+    def upload(self, path, file, content_type, upsert=False):
+        full_path = self._full_path(path)
+        if full_path.exists() and not upsert:
+            raise StorageError(f"Object already exists: {path}")
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        file.seek(0)
+        with open(full_path, "wb") as destination:
+            for chunk in file.chunks(settings.UPLOAD_CHUNK_SIZE):
+                destination.write(chunk)
+
+    def remove(self, paths, bucket=None):
+        for path in paths:
+            try:
+                os.remove(self._full_path(path, bucket))
+            except FileNotFoundError:
+                pass
+
+    def download(self, path):
+        try:
+            return self._full_path(path).read_bytes()
+        except FileNotFoundError:
+            raise StorageError(f"Object not found: {path}")
+
+    def download_range(self, path, length):
+        try:
+            with open(self._full_path(path), "rb") as file:
+                return file.read(length)
+        except FileNotFoundError:
+            raise StorageError(f"Object not found: {path}")
+
+    def exists(self, path):
+        return self._full_path(path).is_file()
+
+    def size(self, path):
+        try:
+            return self._full_path(path).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def public_url(self, path):
+        return f"{self.base_url}{path}"
+
+
+class InMemoryStorage(StorageBackend):
+    """
+    Keeps objects in a dict. Meant for tests and for load-testing upload
+    endpoints on one machine.
+
+    :param latency: Seconds every call blocks for, or [min, max] for a random delay
+    :param failure_rate: Probability (0-1) that a call raises StorageError
+    """
+
+    def __init__(self, bucket=None, latency=0, failure_rate=0.0, seed=None):
+        super().__init__(bucket)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.objects = {}
+        self._lock = Lock()
+        self._random = random.Random(seed)
+
+    def _simulate_network(self, operation):
+        with self._lock:
+            if isinstance(self.latency, (list, tuple)):
+                delay = self._random.uniform(*self.latency)
+            else:
+                delay = self.latency
+            failed = self._random.random() < self.failure_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            raise StorageError(f"Injected failure during {operation}")
+
+    def upload(self, path, file, content_type, upsert=False):
+        self._simulate_network("upload")
+        file.seek(0)
+        content = b"".join(file.chunks(settings.UPLOAD_CHUNK_SIZE))
+        with self._lock:
+            if path in self.objects and not upsert:
+                raise StorageError(f"Object already exists: {path}")
+            self.objects[path] = (content, content_type)
+
+    def remove(self, paths, bucket=None):
+        self._simulate_network("remove")
+        with self._lock:
+            for path in paths:
+                self.objects.pop(path, None)
+
+    def download(self, path):
+        self._simulate_network("download")
+        with self._lock:
+            if path not in self.objects:
+                raise StorageError(f"Object not found: {path}")
+            return self.objects[path][0]
+
+    def download_range(self, path, length):
+        self._simulate_network("download")
+        with self._lock:
+            if path not in self.objects:
+                raise StorageError(f"Object not found: {path}")
+            return self.objects[path][0][:length]
+
+    def exists(self, path):
+        self._simulate_network("exists")
+        with self._lock:
+            return path in self.objects
+
+    def size(self, path):
+        self._simulate_network("size")
+        with self._lock:
+            if path not in self.objects:
+                return None
+            return len(self.objects[path][0])
+
+    def public_url(self, path):
+        return f"memory://{self.bucket}/{path}"
+
+    def create_signed_upload_url(self, path):
+        self._simulate_network("create_signed_upload_url")
+        token = secrets.token_urlsafe()
+        return {"url": f"memory://{self.bucket}/{path}?token={token}", "token": token}
+
+
+def _tus_metadata(**values):
+    return ",".join(
+        f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in values.items()
+    )
+
+
+def _read_range(file, length):
+    """
+    Yields the next `length` bytes of the file in UPLOAD_CHUNK_SIZE pieces.
+    """
+    while length > 0:
+        data = file.read(min(settings.UPLOAD_CHUNK_SIZE, length))
+        if not data:
+            break
+        length -= len(data)
+        yield data
+
+
+_storage = None
+_storage_lock = Lock()
+
+
+def get_storage() -> StorageBackend:
+    """
+    Returns the process-wide backend configured by STORAGE_BACKEND.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                config = settings.STORAGE_BACKEND
+                backend_class = import_string(config["BACKEND"])
+                _storage = backend_class(**config.get("OPTIONS", {}))
+    return _storage
+
+
+@receiver(setting_changed)
+def _reset_storage(*, setting, **kwargs):
+    global _storage
+    if setting == "STORAGE_BACKEND":
+        _storage = None
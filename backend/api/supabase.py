@@ -1,7 +1,26 @@
-from supabase import create_client
+from threading import Lock
 from django.conf import settings
 
-supabase = create_client(
-    settings.SUPABASE_URL,
-    settings.SUPABASE_KEY,
-)
\ No newline at end of file
+_client = None
+_client_lock = Lock()
+
+
+def get_supabase():
+    """
+    Returns the process-wide Supabase client, creating it on first use.
+
+    Importing supabase pulls in httpx, realtime, storage3, pyiceberg and
+    friends, which takes most of a second. Deferring it keeps that cost out
+    of manage.py commands and worker boot when storage is never touched.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from supabase import create_client
+
+                _client = create_client(
+                    settings.SUPABASE_URL,
+                    settings.SUPABASE_KEY,
+                )
+    return _client
@@ -3,10 +3,47 @@ from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
-from .models import UserRole, Blog, BlogImage
-from io import BytesIO
+from .models import Blog, BlogImage, BlogStats, Event, EventType, EventParticipant, EventRegistration, RegistrationStatus, InlineImage, PendingEmail, StoredObject, DuplicateParticipant, PendingDeletion, PendingUpload
+from .models.user import UserRole
+from io import BytesIO, StringIO
 from PIL import Image
-from django.core.files.uploadedfile import SimpleUploadedFile
+from openpyxl import load_workbook
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.conf import settings
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from unittest import mock
+from datetime import timedelta
+import csv
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import xml.etree.ElementTree as ElementTree
+import httpx
+from api import ical, utils
+from api.counters import BufferedCounter, blog_views
+from api.storage import InMemoryStorage, LocalFileSystemStorage, StorageError, SupabaseStorage, get_storage
+from api.images import generate_variants, read_image_header, variant_path
+from api.serializers import InlineImageSerializer
+from api.serializers.upload import ImageUploadField
+from rest_framework import serializers
+import struct
+
+
+def tearDownModule():
+    # Left over, these views would be written by the exit flush, after the test database is gone
+    blog_views.flush()
+
 
 file = SimpleUploadedFile(
     name='example.jpg',
@@ -17,6 +54,8 @@ file = SimpleUploadedFile(
 
 User = get_user_model()
 
+MEMORY_STORAGE = {'BACKEND': 'api.storage.InMemoryStorage', 'OPTIONS': {}}
+
 '''
 class SignupViewTests(APITestCase):
 
@@ -209,6 +248,7 @@ class LoginViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 '''
 
+@override_settings(STORAGE_BACKEND=MEMORY_STORAGE)
 class BlogUploadTests(APITestCase):
     ALLOW_TEXT_ONLY = False  # Added so test_missing_images won't error
 
@@ -400,3 +440,1939 @@ class BlogDeleteViewTests(APITestCase):
         self.client.force_authenticate(user=self.user)
         response = self.client.delete("/api/blogs/9999/delete/")
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BlogListTests(APITestCase):
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.addCleanup(caches[settings.RESPONSE_CACHE_ALIAS].clear)
+        self.author = User.objects.create_user(username="author", email="author@example.com")
+        self.blogs = self.add_blogs(6)
+        # Several posts share a timestamp, so pages have to break ties on id
+        Blog.objects.filter(pk__in=[blog.pk for blog in self.blogs[:3]]).update(createdAt=self.blogs[0].createdAt)
+
+    def add_blogs(self, count):
+        blogs = []
+        for _ in range(count):
+            blog = Blog.objects.create(title="Post", content="<p>Long &amp; winding</p>" * 100, createdBy=self.author)
+            BlogImage.objects.bulk_create([BlogImage(blog=blog, image=f"blogs/{blog.pk}_{n}.jpg") for n in range(2)])
+            blogs.append(blog)
+        return blogs
+
+    def get(self, **params):
+        response = self.client.get(reverse("blog-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_query_count_does_not_grow_with_posts(self):
+        for summary in ("", "true"):
+            with CaptureQueriesContext(connection) as few:
+                posts = len(self.get(summary=summary))
+            self.add_blogs(20)
+            with CaptureQueriesContext(connection) as many:
+                data = self.get(summary=summary)
+
+            self.assertEqual(len(data), posts + 20)
+            self.assertEqual(len(few), 2)  # Posts with their authors, then the images
+            self.assertEqual(len(many), len(few))
+            self.assertEqual(data[0]["createdBy"], "author")
+            self.assertEqual(len(data[0]["images"]), 2)
+
+    def test_summary_serves_the_excerpt(self):
+        full = self.get()[0]
+        summary = self.get(summary="true")[0]
+
+        self.assertIn("<p>", full["content"])
+        self.assertNotIn("content", summary)
+        self.assertEqual(len(summary["excerpt"]), settings.BLOG_EXCERPT_LENGTH)
+        self.assertTrue(summary["excerpt"].startswith("Long & winding Long & winding"))
+        self.assertEqual(summary["created_by"], full["created_by"])
+
+    def test_excerpt_follows_the_content(self):
+        blog = self.blogs[0]
+        blog.content = "<h1>Short</h1>"
+        blog.save(update_fields=["content"])
+
+        self.assertEqual(Blog.objects.get(pk=blog.pk).excerpt, "Short")
+
+    def test_cursor_pages_follow_created_at_then_id(self):
+        expected = list(Blog.objects.order_by("-createdAt", "id").values_list("id", flat=True))
+        seen = []
+        page = self.get(page_size=4, summary="true", limit=1)
+        while True:
+            seen += [blog["id"] for blog in page["results"]]
+            if page["next"] is None:
+                break
+            with self.assertNumQueries(2):
+                response = self.client.get(page["next"])
+            page = response.data
+
+        self.assertEqual(seen, expected)
+        self.assertNotIn("content", page["results"][0])
+
+    def test_limit_without_pages(self):
+        self.assertEqual(len(self.get(limit=2)), 2)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.addCleanup(caches[settings.RESPONSE_CACHE_ALIAS].clear)
+        self.blog = Blog.objects.create(
+            title="Post", content="...", createdBy=User.objects.create_user(username="author", email="author@example.com"),
+        )
+        BlogImage.objects.create(blog=self.blog, image="blogs/a.jpg")
+        self.event = Event.objects.create(title="Launch", content="...", time_from="09:00", time_to="17:00", total_seats=10)
+        self.blog_url = reverse("blog-detail", args=[self.blog.pk])
+        self.event_url = reverse("events-RUD", args=[self.event.pk])
+
+    def test_unchanged_blog_is_not_sent_again(self):
+        response = self.client.get(self.blog_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("s-maxage=", response["Cache-Control"])
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.blog_url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn("public", cached["Cache-Control"])
+        since = self.client.get(self.blog_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_blog_edits_and_images_change_the_etag(self):
+        etag = self.client.get(self.blog_url)["ETag"]
+
+        BlogImage.objects.create(blog=self.blog, image="blogs/b.jpg")
+        response = self.client.get(self.blog_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["data"]["images"]), 2)
+
+        self.blog.title = "Edited"
+        self.blog.save()
+        response = self.client.get(self.blog_url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.data["data"]["title"], "Edited")
+
+    def test_renamed_author_changes_the_blog_etag(self):
+        etag = self.client.get(self.blog_url)["ETag"]
+
+        author = self.blog.createdBy
+        author.username = "renamed"
+        author.save()
+        response = self.client.get(self.blog_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["created_by"]["username"], "renamed")
+
+    def test_unchanged_event_is_not_sent_again(self):
+        response = self.client.get(self.event_url)
+        self.assertNotIn("Last-Modified", response)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.event_url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_registrations_and_edits_change_the_event_etag(self):
+        etag = self.client.get(self.event_url)["ETag"]
+
+        # What a registration does to the row: updated_at stays as it was
+        Event.objects.filter(pk=self.event.pk).update(seats_remaining=F("seats_remaining") - 1)
+        response = self.client.get(self.event_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["seats_remaining"], 9)
+
+        self.event.title = "Relaunch"
+        self.event.save()
+        response = self.client.get(self.event_url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.data["title"], "Relaunch")
+
+    def test_missing_objects(self):
+        self.assertEqual(self.client.get(reverse("blog-detail", args=[0]), HTTP_IF_NONE_MATCH='"x"').status_code, 404)
+        self.assertEqual(self.client.get(reverse("events-RUD", args=[0]), HTTP_IF_NONE_MATCH='"x"').status_code, 404)
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.addCleanup(caches[settings.RESPONSE_CACHE_ALIAS].clear)
+        author = User.objects.create_user(username="author", email="author@example.com")
+        self.in_title = Blog.objects.create(title="Django workshops", content="<p>Notes</p>", createdBy=author)
+        self.in_content = Blog.objects.create(title="Recap", content="<p>We ran a Django workshop.</p>", createdBy=author)
+        Blog.objects.create(title="Hiking", content="<p>Mountains</p>", createdBy=author)
+        self.tagged = Event.objects.create(
+            title="Hack night", content="...", time_from="09:00", time_to="17:00", tags=["python", "web"],
+        )
+        self.described = Event.objects.create(
+            title="Launch", description="Our first python meetup", content="...", time_from="09:00", time_to="17:00",
+        )
+        Event.objects.create(title="Sports day", content="...", time_from="09:00", time_to="17:00")
+
+    def search(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def ids(self, name, **params):
+        return [row["id"] for row in self.search(name, **params)]
+
+    def test_blogs_rank_title_matches_first(self):
+        self.assertEqual(self.ids("blog-list", q="django workshop"), [self.in_title.pk, self.in_content.pk])
+        self.assertEqual(self.ids("blog-list", q="mountain"), [Blog.objects.get(title="Hiking").pk])
+
+    def test_last_word_matches_as_a_prefix(self):
+        self.assertEqual(self.ids("blog-list", q="djan"), [self.in_title.pk, self.in_content.pk])
+        self.assertEqual(self.ids("blog-list", q="workshops djan"), [self.in_title.pk, self.in_content.pk])
+        self.assertEqual(self.ids("blog-list", q="???"), [])
+
+    def test_events_search_tags_and_description(self):
+        self.assertEqual(set(self.ids("events-list-create", q="python")), {self.tagged.pk, self.described.pk})
+        self.assertEqual(self.ids("events-list-create", search="meetup"), [self.described.pk])
+        self.assertNotIn("search_vector", self.client.get(reverse("events-RUD", args=[self.tagged.pk])).data)
+
+    def test_vectors_follow_edits(self):
+        self.tagged.title = "Robotics night"
+        self.tagged.save()
+        self.in_content.content = "<p>Nothing here</p>"
+        self.in_content.save(update_fields=["content"])
+        # Counter updates don't touch the searched columns
+        Event.objects.filter(pk=self.tagged.pk).update(seats_remaining=F("seats_remaining") - 1)
+
+        self.assertEqual(self.ids("events-list-create", q="robotics"), [self.tagged.pk])
+        self.assertEqual(self.ids("blog-list", q="django"), [self.in_title.pk])
+
+    def test_pages_follow_the_rank(self):
+        expected = self.ids("blog-list", q="django")
+        first = self.search("blog-list", q="django", page_size=1)
+        second = self.client.get(first["next"]).data
+
+        self.assertEqual([row["id"] for row in first["results"] + second["results"]], expected)
+        self.assertIsNone(second["next"])
+
+    def test_substring_fallback_off_postgres(self):
+        with mock.patch.object(connection, "vendor", "sqlite"):
+            self.assertEqual(set(self.ids("blog-list", q="Django work")), {self.in_title.pk, self.in_content.pk})
+            self.assertEqual(self.ids("events-list-create", q="meetup"), [self.described.pk])
+
+
+class BlogViewCounterTests(APITestCase):
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.addCleanup(caches[settings.RESPONSE_CACHE_ALIAS].clear)
+        blog_views.flush()  # Whatever earlier tests counted
+        author = User.objects.create_user(username="author", email="author@example.com")
+        self.blogs = [Blog.objects.create(title=f"Post {n}", content="<p>...</p>", createdBy=author) for n in range(3)]
+        self.url = reverse("blog-detail", args=[self.blogs[0].pk])
+
+    def test_reads_are_written_in_one_batch(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(1):  # The 304 lookup, nothing written
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.client.get(self.url)
+        self.client.get(reverse("blog-detail", args=[self.blogs[1].pk]))
+        self.client.get(reverse("blog-detail", args=[0]))
+        self.assertFalse(BlogStats.objects.exists())
+
+        with self.assertNumQueries(2):  # The batch, then the ranking
+            blog_views.flush()
+        self.client.get(self.url)
+        blog_views.flush()
+
+        today = timezone.localdate()
+        self.assertEqual(
+            set(BlogStats.objects.values_list("blog", "day", "views")),
+            {(self.blogs[0].pk, today, 4), (self.blogs[1].pk, today, 1)},
+        )
+
+    def test_views_of_deleted_posts_are_dropped(self):
+        self.client.get(self.url)
+        self.blogs[0].delete()
+        blog_views.flush()
+        self.assertFalse(BlogStats.objects.exists())
+
+    def test_failed_write_is_retried(self):
+        self.client.get(self.url)
+        with mock.patch.object(BlogStats.objects, "add_views", side_effect=Exception("down")), \
+                self.assertLogs("api.counters", "WARNING"):
+            blog_views.flush()
+        blog_views.flush()
+        self.assertEqual(BlogStats.objects.get().views, 1)
+
+    def test_most_read_this_week(self):
+        today = timezone.localdate()
+        first, second, third = self.blogs
+        BlogStats.objects.bulk_create([
+            BlogStats(blog=first, day=today, views=5),
+            BlogStats(blog=first, day=today - timedelta(days=6), views=5),
+            BlogStats(blog=second, day=today, views=7),
+            BlogStats(blog=third, day=today - timedelta(days=7), views=50),
+        ])
+
+        out = StringIO()
+        call_command("rank_blog_views", stdout=out)
+        self.assertIn("Ranked 2 post(s)", out.getvalue())
+        BlogStats.objects.filter(blog=third).update(day=today)  # Not ranked yet
+
+        with self.assertNumQueries(2):  # The posts and their images, no aggregation
+            response = self.client.get(reverse("blog-most-read"))
+        self.assertEqual([(post["id"], post["views"]) for post in response.data], [(first.pk, 10), (second.pk, 7)])
+        self.assertIn("excerpt", response.data[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse("blog-most-read"))["X-Cache"], "HIT")
+
+    def test_views_are_ranked_as_they_are_written(self):
+        first, second, _ = self.blogs
+        for blog in (second, second, first):
+            self.client.get(reverse("blog-detail", args=[blog.pk]))
+        blog_views.flush()
+
+        response = self.client.get(reverse("blog-most-read"))
+        self.assertEqual([(post["id"], post["views"]) for post in response.data], [(second.pk, 2), (first.pk, 1)])
+
+        second.delete()
+        response = self.client.get(reverse("blog-most-read"))
+        self.assertEqual([post["id"] for post in response.data], [first.pk])
+
+
+class BufferedCounterTests(SimpleTestCase):
+    @override_settings(BLOG_VIEW_FLUSH_INTERVAL=0.01)
+    def test_flushed_in_the_background(self):
+        written = threading.Event()
+        batches = []
+        counter = BufferedCounter(lambda counts: (batches.append(counts), written.set()), "BLOG_VIEW_FLUSH_INTERVAL")
+
+        counter.add("a")
+        counter.add("a")
+        counter.add("b", 3)
+
+        self.assertTrue(written.wait(5))
+        self.assertEqual(batches, [{"a": 2, "b": 3}])
+
+    def test_flushed_at_exit(self):
+        batches = []
+        counter = BufferedCounter(batches.append, "BLOG_VIEW_FLUSH_INTERVAL")
+
+        with mock.patch("api.counters.atexit.register") as register:
+            counter.add("a")
+            counter.add("a")
+        register.assert_called_once_with(counter.flush)
+
+        register.call_args.args[0]()
+        self.assertEqual(batches, [{"a": 2}])
+
+
+class ConcurrentUploadTests(SimpleTestCase):
+    def make_files(self, count):
+        return [
+            SimpleUploadedFile(f"img{i}.jpg", b"data", content_type="image/jpeg")
+            for i in range(count)
+        ]
+
+    def test_uploads_run_concurrently_and_keep_order(self):
+        in_flight = []
+        peak = [0]
+        lock = threading.Lock()
+
+        def fake_upload(file, folder):
+            with lock:
+                in_flight.append(file.name)
+                peak[0] = max(peak[0], len(in_flight))
+            time.sleep(0.05)
+            with lock:
+                in_flight.remove(file.name)
+            return f"{folder}/{file.name}"
+
+        with mock.patch.object(utils, "upload_file", side_effect=fake_upload):
+            paths = utils.upload_files(self.make_files(4), "blogs")
+
+        self.assertEqual(paths, [f"blogs/img{i}.jpg" for i in range(4)])
+        self.assertGreater(peak[0], 1)
+
+    def test_partial_failure_removes_uploaded_objects(self):
+        def fake_upload(file, folder):
+            if file.name == "img2.jpg":
+                raise RuntimeError("bucket unavailable")
+            return f"{folder}/{file.name}"
+
+        with mock.patch.object(utils, "upload_file", side_effect=fake_upload), \
+                mock.patch.object(utils, "delete_from_bucket") as delete:
+            with self.assertRaises(RuntimeError):
+                utils.upload_files(self.make_files(3), "blogs")
+            # Cleanup callbacks may still be running on the pool
+            deadline = time.monotonic() + 2
+            while delete.call_count < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        deleted = {call.args[1] for call in delete.call_args_list}
+        self.assertEqual(deleted, {"blogs/img0.jpg", "blogs/img1.jpg"})
+
+    @override_settings(UPLOAD_TIMEOUT=0.05)
+    def test_slow_upload_times_out(self):
+        def fake_upload(file, folder):
+            time.sleep(0.3)
+            return f"{folder}/{file.name}"
+
+        with mock.patch.object(utils, "upload_file", side_effect=fake_upload), \
+                mock.patch.object(utils, "delete_from_bucket") as delete:
+            with self.assertRaises(utils.FutureTimeoutError):
+                utils.upload_files(self.make_files(2), "blogs")
+            # The timed-out uploads are removed once they eventually finish
+            deadline = time.monotonic() + 2
+            while delete.call_count < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        self.assertEqual(delete.call_count, 2)
+
+    @override_settings(UPLOAD_TIMEOUT=0.25)
+    def test_timeout_covers_the_whole_batch(self):
+        # Each upload finishes within UPLOAD_TIMEOUT of the previous one, but not of the start
+        def fake_upload(file, folder):
+            time.sleep(0.1 * (int(file.name[3]) + 1))
+            return f"{folder}/{file.name}"
+
+        started = time.monotonic()
+        with mock.patch.object(utils, "upload_file", side_effect=fake_upload), \
+                mock.patch.object(utils, "delete_from_bucket") as delete:
+            with self.assertRaises(utils.FutureTimeoutError):
+                utils.upload_files(self.make_files(3), "blogs")
+            elapsed = time.monotonic() - started
+            # Let the cleanup of all three finish while delete_from_bucket is still patched
+            deadline = time.monotonic() + 2
+            while delete.call_count < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        self.assertLess(elapsed, 0.3)
+        self.assertEqual(delete.call_count, 3)
+
+
+class StreamingTransport(httpx.BaseTransport):
+    """ Like httpx.MockTransport, but leaves the request body unread for the handler. """
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def handle_request(self, request):
+        return self.handler(request)
+
+
+class StreamingUploadMemoryTests(TestCase):
+    """
+    Memory benchmark for api.utils.upload_file. Peak allocations while
+    uploading must not grow with the file size.
+    """
+    MB = 1024 * 1024
+    TUS_URL = "http://storage.test/storage/v1/upload/resumable/1"
+
+    def setUp(self):
+        self.received = []
+        self.tus_offsets = {}
+        self.fail_next_patch = False
+        client = httpx.Client(
+            base_url="http://storage.test/storage/v1",
+            transport=StreamingTransport(self.handle),
+        )
+        patcher = mock.patch.object(SupabaseStorage, "_get_client", return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def handle(self, request):
+        if request.method == "POST" and request.url.path.endswith("/upload/resumable"):
+            self.tus_offsets[self.TUS_URL] = 0
+            return httpx.Response(201, headers={"Location": self.TUS_URL})
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"Upload-Offset": str(self.tus_offsets[str(request.url)])})
+
+        # Drain the body the way a socket would, without keeping it around
+        size = 0
+        for chunk in request.stream:
+            size += len(chunk)
+
+        if request.method == "PATCH":
+            if self.fail_next_patch:
+                self.fail_next_patch = False
+                return httpx.Response(500)
+            self.tus_offsets[str(request.url)] += size
+            return httpx.Response(204, headers={"Upload-Offset": str(self.tus_offsets[str(request.url)])})
+
+        self.received.append(size)
+        return httpx.Response(200, json={"Key": request.url.path})
+
+    def make_file(self, size):
+        file = TemporaryUploadedFile("big.jpg", "image/jpeg", size, None)
+        block = b"\0" * self.MB
+        for _ in range(size // self.MB):
+            file.write(block)
+        file.seek(0)
+        self.addCleanup(file.close)
+        return file
+
+    def peak_upload_memory(self, size):
+        file = self.make_file(size)
+        tracemalloc.start()
+        try:
+            utils.upload_file(file, "blogs")
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    @override_settings(RESUMABLE_UPLOAD_THRESHOLD=1024 * 1024 * 1024)
+    def test_streaming_peak_memory_is_flat(self):
+        small = self.peak_upload_memory(2 * self.MB)
+        large = self.peak_upload_memory(32 * self.MB)
+
+        self.assertEqual(self.received, [2 * self.MB, 32 * self.MB])
+        print(f"\n[memory] streaming upload peak: 2 MB -> {small} B, 32 MB -> {large} B")
+        self.assertLess(large, 4 * self.MB)
+        self.assertLess(large, small + 2 * self.MB)
+
+    @override_settings(RESUMABLE_UPLOAD_THRESHOLD=4 * 1024 * 1024, RESUMABLE_UPLOAD_CHUNK_SIZE=1024 * 1024)
+    def test_resumable_upload_resumes_after_failed_chunk(self):
+        self.fail_next_patch = True
+        peak = self.peak_upload_memory(8 * self.MB)
+
+        self.assertEqual(self.tus_offsets[self.TUS_URL], 8 * self.MB)
+        self.assertLess(peak, 4 * self.MB)
+
+
+class ImageVariantTests(SimpleTestCase):
+    def make_image(self, size, mode='RGB', fmt='JPEG'):
+        file = BytesIO()
+        Image.new(mode, size, color='red').save(file, fmt)
+        file.seek(0)
+        return file
+
+    def test_variants_are_webp_and_fit_their_box(self):
+        variants = generate_variants(self.make_image((2000, 1000)))
+
+        self.assertEqual(set(variants), {'thumb', 'medium'})
+        with Image.open(variants['thumb']) as thumb:
+            self.assertEqual(thumb.format, 'WEBP')
+            self.assertEqual(thumb.size, (320, 160))
+        with Image.open(variants['medium']) as medium:
+            self.assertEqual(medium.size, (960, 480))
+
+    def test_small_images_are_not_upscaled(self):
+        variants = generate_variants(self.make_image((100, 80), mode='RGBA', fmt='PNG'))
+        with Image.open(variants['medium']) as medium:
+            self.assertEqual(medium.size, (100, 80))
+
+    def test_variant_urls_sit_next_to_the_original(self):
+        self.assertEqual(variant_path('blogs/abc_photo.jpg', 'thumb'), 'blogs/abc_photo@thumb.webp')
+        urls = utils.get_image_variant_urls('blogs/abc_photo.jpg', True)
+        self.assertEqual(set(urls), {'original', 'thumb', 'medium'})
+        self.assertTrue(urls['thumb'].endswith('/blogs/abc_photo@thumb.webp'))
+        self.assertIsNone(utils.get_image_variant_urls('blogs/abc_photo.jpg', False))
+        self.assertIsNone(utils.get_image_variant_urls(None))
+
+
+def encode_image(fmt, size=(64, 48), noise=False):
+    if noise:
+        image = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    else:
+        image = Image.new("RGB", size, "red")
+    buffer = BytesIO()
+    image.save(buffer, fmt, quality=90)
+    return buffer.getvalue()
+
+
+class ImageUploadFieldTests(SimpleTestCase):
+    def validate(self, content, name="upload.jpg", content_type="image/jpeg"):
+        return ImageUploadField().run_validation(SimpleUploadedFile(name, content, content_type=content_type))
+
+    def test_dimensions_read_from_header(self):
+        for fmt, content_type in (("JPEG", "image/jpeg"), ("PNG", "image/png"), ("WEBP", "image/webp")):
+            with self.subTest(fmt):
+                self.assertEqual(read_image_header(BytesIO(encode_image(fmt))), (content_type, 64, 48))
+
+    def test_content_type_is_sniffed(self):
+        file = self.validate(encode_image("PNG"), name="photo.jpg", content_type="image/jpeg")
+        self.assertEqual(file.content_type, "image/png")
+
+    def test_non_image_rejected(self):
+        with self.assertRaises(serializers.ValidationError) as raised:
+            self.validate(b"#!/bin/sh\nrm -rf /", name="photo.jpg")
+        self.assertIn("Upload a valid image", str(raised.exception))
+
+        with self.assertRaises(serializers.ValidationError):
+            self.validate(encode_image("PNG"), name="photo.html")
+
+    def test_oversize_dimensions_rejected_before_decode(self):
+        # A PNG header claiming 20000x20000 pixels with no image data behind it
+        header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", 20000, 20000) + b"\x08\x02\x00\x00\x00"
+        with mock.patch.object(Image, "open") as image_open:
+            with self.assertRaises(serializers.ValidationError) as raised:
+                self.validate(header, name="bomb.png")
+        image_open.assert_not_called()
+        self.assertIn("20000x20000", str(raised.exception))
+
+
+class ImageValidationBenchmarkTests(SimpleTestCase):
+    """
+    Compares CPU time per upload of DRF's ImageField, which copies the file
+    into memory and has Pillow verify it, with ImageUploadField.
+    """
+    ROUNDS = 20
+
+    def cpu_time_per_upload(self, field, content):
+        files = [SimpleUploadedFile("photo.jpg", content, content_type="image/jpeg") for _ in range(self.ROUNDS)]
+        started = time.process_time()
+        for file in files:
+            field.run_validation(file)
+        return (time.process_time() - started) / self.ROUNDS
+
+    def test_header_validation_is_cheaper(self):
+        for fmt in ("JPEG", "PNG", "WEBP"):
+            content = encode_image(fmt, size=(1600, 1200), noise=True)
+            before = self.cpu_time_per_upload(serializers.ImageField(), content)
+            after = self.cpu_time_per_upload(ImageUploadField(), content)
+            print(f"\n[benchmark] {fmt} {len(content) // 1024} KB: ImageField {before * 1000:.2f} ms, "
+                  f"ImageUploadField {after * 1000:.3f} ms CPU per upload")
+            with self.subTest(fmt):
+                self.assertLess(after, before)
+
+
+@override_settings(STORAGE_BACKEND=MEMORY_STORAGE)
+class UploadDeduplicationTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(utils, "_upload_to_path")
+        self.upload = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_file(self, name, content=b"same bytes"):
+        return SimpleUploadedFile(name, content, content_type="image/jpeg")
+
+    def test_identical_bytes_reuse_the_stored_object(self):
+        first = utils.upload_file(self.make_file("poster.jpg"), "events")
+        second = utils.upload_file(self.make_file("copy.jpg"), "blogs")
+        other = utils.upload_file(self.make_file("other.jpg", b"different"), "blogs")
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(self.upload.call_count, 2)
+        self.assertEqual(StoredObject.objects.get(path=first).ref_count, 2)
+
+    def test_object_is_removed_with_its_last_reference(self):
+        path = utils.upload_file(self.make_file("poster.jpg"), "events")
+        utils.upload_file(self.make_file("poster.jpg"), "events")
+
+        utils.delete_from_bucket("media", path)
+        self.assertFalse(PendingDeletion.objects.exists())
+        self.assertEqual(StoredObject.objects.get(path=path).ref_count, 1)
+
+        utils.delete_from_bucket("media", path)
+        self.assertTrue(PendingDeletion.objects.filter(path=path).exists())
+        self.assertFalse(StoredObject.objects.filter(path=path).exists())
+
+    def test_reused_object_gets_the_variants_it_lacks(self):
+        content = encode_image("JPEG")
+        inline = utils.upload_file(self.make_file("inline.jpg", content), "blogs")
+        cover = utils.upload_image(self.make_file("cover.jpg", content), "blogs")
+
+        self.assertEqual(cover, inline)
+        uploaded = [call.args[0] for call in self.upload.call_args_list]
+        self.assertEqual(set(uploaded), {inline, variant_path(inline, "thumb"), variant_path(inline, "medium")})
+        self.assertTrue(StoredObject.objects.get(path=inline).has_variants)
+
+        utils.upload_image(self.make_file("again.jpg", content), "events")
+        self.assertEqual(self.upload.call_count, 3)
+
+    def test_inline_images_get_variants(self):
+        serializer = InlineImageSerializer(data={"image": self.make_file("inline.jpg", encode_image("JPEG"))})
+        serializer.is_valid(raise_exception=True)
+        inline = serializer.save()
+
+        self.assertTrue(StoredObject.objects.get(path=inline.image).has_variants)
+        self.assertIn(variant_path(inline.image, "thumb"), [call.args[0] for call in self.upload.call_args_list])
+
+    def test_failed_variant_upload_keeps_the_original(self):
+        def upload(path, *args, **kwargs):
+            if "@" in path:
+                raise StorageError("down")
+        self.upload.side_effect = upload
+
+        with self.assertLogs("api.utils", "ERROR"):
+            path = utils.upload_image(self.make_file("cover.jpg", encode_image("JPEG")), "blogs")
+
+        self.assertFalse(StoredObject.objects.get(path=path).has_variants)
+        self.assertFalse(PendingDeletion.objects.exists())
+
+    def test_srcset_is_only_served_for_recorded_variants(self):
+        self.assertIsNone(utils.get_image_variant_urls("blogs/untracked.jpg"))
+
+        path = utils.upload_image(self.make_file("cover.jpg", encode_image("JPEG")), "blogs")
+        self.assertIn("thumb", utils.get_image_variant_urls(path))
+        StoredObject.objects.filter(path=path).update(has_variants=False)
+        self.assertIsNone(utils.get_image_variant_urls(path))
+
+    def test_regenerated_variants_are_recorded(self):
+        with mock.patch.object(utils, "download_from_bucket", return_value=encode_image("JPEG")):
+            utils.regenerate_image_variants("blogs/direct.jpg")
+
+        self.assertTrue(StoredObject.objects.get(path="blogs/direct.jpg").has_variants)
+        self.assertTrue(utils.get_image_variant_urls("blogs/direct.jpg"))
+
+    def test_untracked_objects_are_removed_directly(self):
+        utils.delete_from_bucket("media", "blogs/legacy.jpg")
+        self.assertTrue(PendingDeletion.objects.filter(path="blogs/legacy.jpg").exists())
+
+
+@override_settings(STORAGE_BACKEND=MEMORY_STORAGE)
+class DeletionQueueTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(InMemoryStorage, "remove")
+        self.remove = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rolled_back_delete_never_touches_the_bucket(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    utils.delete_from_bucket("media", "bills/receipt.pdf")
+                    raise RuntimeError("delete failed")
+            except RuntimeError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertFalse(PendingDeletion.objects.exists())
+
+    def test_committed_delete_schedules_a_flush(self):
+        with mock.patch.object(utils, "schedule_deletion_flush") as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                utils.delete_from_bucket("media", "blogs/photo.jpg")
+
+        schedule.assert_called_once()
+        self.assertEqual(
+            set(PendingDeletion.objects.values_list("path", flat=True)),
+            {"blogs/photo.jpg", "blogs/photo@thumb.webp", "blogs/photo@medium.webp"},
+        )
+
+    def test_queues_are_flushed_apart_from_the_upload_pool(self):
+        threads = []
+
+        def record():
+            threads.append(threading.current_thread().name)
+
+        with mock.patch.object(utils, "_flush_in_background", side_effect=record), \
+                mock.patch.object(utils, "_send_emails_in_background", side_effect=record):
+            utils.schedule_deletion_flush()
+            utils.schedule_email_flush()
+            utils._get_background_executor().submit(lambda: None).result(timeout=5)
+
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(name.startswith("background") for name in threads))
+
+    def test_flush_removes_in_batches(self):
+        PendingDeletion.objects.bulk_create([
+            PendingDeletion(bucket="media", path=f"bills/{i}.pdf") for i in range(5)
+        ])
+
+        removed, failed = utils.flush_pending_deletions(batch_size=2)
+
+        self.assertEqual((removed, failed), (5, 0))
+        self.assertEqual(self.remove.call_count, 3)
+        self.assertFalse(PendingDeletion.objects.exists())
+
+    def test_failed_batch_backs_off(self):
+        PendingDeletion.objects.create(bucket="media", path="bills/1.pdf")
+        self.remove.side_effect = RuntimeError("storage unavailable")
+
+        removed, failed = utils.flush_pending_deletions()
+        entry = PendingDeletion.objects.get()
+
+        self.assertEqual((removed, failed), (0, 1))
+        self.assertEqual(entry.attempts, 1)
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+        self.assertIn("storage unavailable", entry.last_error)
+
+
+@override_settings(STORAGE_BACKEND=MEMORY_STORAGE)
+class SignedUploadTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="author", password="pass1234", email="author@example.com", phone_number="03000000001"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def request_upload(self, folder="blogs", filename="photo.jpg", content_type="image/jpeg"):
+        response = self.client.post(
+            reverse("signed-upload"),
+            {"folder": folder, "filename": filename, "content_type": content_type},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def upload_directly(self, path, content=None):
+        content = encode_image("JPEG") if content is None else content
+        get_storage().upload(path, SimpleUploadedFile("photo.jpg", content), "image/jpeg")
+
+    def submit(self, path):
+        return self.client.post(
+            reverse("blog-upload"),
+            {"title": "Direct", "content": "No bytes through Django", "image_paths": [path]},
+            format="multipart",
+        )
+
+    def test_blog_created_from_direct_upload(self):
+        signed = self.request_upload()
+        self.assertTrue(signed["path"].startswith("blogs/"))
+        self.assertIn(signed["token"], signed["upload_url"])
+        self.assertEqual(signed["max_size"], settings.SIGNED_UPLOAD_MAX_SIZE)
+        self.upload_directly(signed["path"])
+
+        response = self.client.post(
+            reverse("blog-upload"),
+            {"title": "Direct", "content": "No bytes through Django", "image_paths": [signed["path"]]},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(BlogImage.objects.get().image, signed["path"])
+        self.assertFalse(PendingUpload.objects.exists())
+
+    def test_path_must_be_uploaded_first(self):
+        signed = self.request_upload()
+
+        response = self.client.post(
+            reverse("blog-upload"),
+            {"title": "Direct", "content": "Missing", "image_paths": [signed["path"]]},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Blog.objects.exists())
+
+    def test_path_issued_to_someone_else_is_rejected(self):
+        signed = self.request_upload()
+        self.upload_directly(signed["path"])
+        other = User.objects.create_user(
+            username="other", password="pass1234", email="other@example.com", phone_number="03000000002"
+        )
+        self.client.force_authenticate(user=other)
+
+        response = self.client.post(
+            reverse("blog-upload"),
+            {"title": "Stolen", "content": "Not mine", "image_paths": [signed["path"]]},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(PendingUpload.objects.filter(path=signed["path"]).exists())
+
+    def test_uploaded_object_is_validated_before_it_is_claimed(self):
+        # A PNG header claiming 20000x20000 pixels with no image data behind it
+        bomb = b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", 20000, 20000) + b"\x08\x02\x00\x00\x00"
+        cases = [
+            ("image/jpeg", b"#!/bin/sh\nrm -rf /", "Upload a valid image"),
+            ("image/png", encode_image("JPEG"), "not the image/png that was requested"),
+            ("image/png", bomb, "20000x20000"),
+        ]
+        for content_type, content, error in cases:
+            with self.subTest(error):
+                signed = self.request_upload(filename="photo.png", content_type=content_type)
+                self.upload_directly(signed["path"], content)
+
+                with mock.patch.object(utils, "generate_variants") as generate:
+                    response = self.submit(signed["path"])
+
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(error, str(response.data))
+                generate.assert_not_called()
+                self.assertTrue(PendingUpload.objects.filter(path=signed["path"]).exists())
+
+    @override_settings(SIGNED_UPLOAD_MAX_SIZE=100)
+    def test_oversize_object_is_rejected(self):
+        signed = self.request_upload()
+        self.upload_directly(signed["path"], encode_image("JPEG", noise=True))
+
+        response = self.submit(signed["path"])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("at most 100 bytes", str(response.data))
+
+    def test_header_is_read_with_a_ranged_download(self):
+        signed = self.request_upload()
+        self.upload_directly(signed["path"])
+
+        storage = get_storage()
+        with mock.patch.object(storage, "download_range", wraps=storage.download_range) as read, \
+                mock.patch.object(storage, "download") as download:
+            self.assertEqual(self.submit(signed["path"]).status_code, status.HTTP_201_CREATED)
+
+        read.assert_called_once_with(signed["path"], settings.SIGNED_UPLOAD_HEADER_BYTES)
+        download.assert_not_called()
+
+    def test_non_image_filename_is_rejected(self):
+        response = self.client.post(
+            reverse("signed-upload"),
+            {"folder": "blogs", "filename": "script.sh", "content_type": "image/jpeg"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unclaimed_uploads_expire(self):
+        signed = self.request_upload()
+        PendingUpload.objects.update(expires_at=timezone.now())
+
+        with mock.patch.object(utils, "schedule_deletion_flush"):
+            self.assertEqual(utils.expire_pending_uploads(), 1)
+
+        self.assertFalse(PendingUpload.objects.exists())
+        self.assertTrue(PendingDeletion.objects.filter(path=signed["path"]).exists())
+
+    @override_settings(STORAGE_BACKEND={'BACKEND': 'api.storage.LocalFileSystemStorage', 'OPTIONS': {}})
+    def test_unsupported_backend(self):
+        response = self.client.post(
+            reverse("signed-upload"),
+            {"folder": "events", "filename": "poster.png", "content_type": "image/png"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertFalse(PendingUpload.objects.exists())
+
+
+@override_settings(STORAGE_BACKEND=MEMORY_STORAGE)
+class InlineImageCollectionTests(TestCase):
+    USED = "blogs/1b4e28ba-2fa1-41d2-883f-0016d3cca427_my photo.png"
+    ORPHANED = "blogs/6ec0bd7f-11c0-43da-975e-2a8ad9ebae0b_pasted.png"
+    RECENT = "blogs/0f8fad5b-d9cb-469f-a165-70867728950e_new.png"
+    LEGACY = "temp_inline/4b1c8d1e.png"
+
+    def setUp(self):
+        author = User.objects.create_user(username="writer", password="pass1234")
+        url = get_storage().public_url(self.USED).replace(" ", "%20")
+        Blog.objects.create(title="Post", content=f'<p><img src="{url}"></p>', createdBy=author)
+
+        for path in (self.USED, self.ORPHANED, self.RECENT, self.LEGACY):
+            InlineImage.objects.create(image=path)
+        InlineImage.objects.exclude(image=self.RECENT).update(uploaded_at=timezone.now() - timedelta(days=2))
+        StoredObject.objects.create(digest="a" * 64, path=self.ORPHANED, size=1234)
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command("collect_inline_images", "--batch-size", "2", *args, stdout=out)
+        return out.getvalue()
+
+    def test_only_old_unreferenced_images_are_deleted(self):
+        output = self.collect()
+
+        self.assertEqual(
+            set(InlineImage.objects.values_list("image", flat=True)),
+            {self.USED, self.RECENT, self.LEGACY},
+        )
+        self.assertFalse(StoredObject.objects.filter(path=self.ORPHANED).exists())
+        self.assertFalse(PendingDeletion.objects.filter(path=self.ORPHANED).exists())
+        self.assertIn("reclaiming 1234 bytes", output)
+
+    def test_dry_run_deletes_nothing(self):
+        output = self.collect("--dry-run")
+
+        self.assertEqual(InlineImage.objects.count(), 4)
+        self.assertIn(self.ORPHANED, output)
+        self.assertIn("1 orphaned", output)
+
+
+class EventRegistrationMixin:
+    def setUp(self):
+        self.event = Event.objects.create(
+            title="Hackathon", content="...", time_from="09:00", time_to="17:00", total_seats=3,
+        )
+        self.participant_numbers = itertools.count()
+
+    def participant(self, n=None):
+        n = next(self.participant_numbers) if n is None else n
+        return {
+            "name": f"Participant {n}", "email": f"p{n}@example.com", "reg_no": f"FA22-BCS-{n:03d}",
+            "current_semester": 5, "department": "CS", "phone_no": "+923000000000",
+        }
+
+    def register(self, team_size=None):
+        if team_size is None:
+            data = {"registration_type": "SINGLE", "participants": [self.participant()]}
+        else:
+            data = {"registration_type": "TEAM", "team_name": "Team",
+                    "participants": [self.participant() for _ in range(team_size)]}
+        return self.client.post(reverse("registration-create"), {"event": self.event.pk, **data}, format="json")
+
+    def assertCounters(self, count, remaining):
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.active_registration_count, self.event.seats_remaining), (count, remaining))
+
+
+class EventRegistrationCounterTests(EventRegistrationMixin, APITestCase):
+    def test_counters_follow_create_cancel_and_delete(self):
+        self.register()
+        self.register()
+        self.assertCounters(2, 1)
+
+        registration = EventRegistration.objects.order_by("pk").first()
+        url = reverse("registration-status-update", args=[registration.pk])
+        self.client.patch(url, {"status": RegistrationStatus.CANCELLED}, format="json")
+        self.assertCounters(1, 2)
+        # Cancelling twice doesn't release the seat twice
+        self.client.patch(url, {"status": RegistrationStatus.CANCELLED}, format="json")
+        self.assertCounters(1, 2)
+
+        self.client.delete(reverse("registration-delete", args=[registration.pk]))
+        self.assertCounters(1, 2)
+        self.client.delete(reverse("registration-delete", args=[EventRegistration.objects.get().pk]))
+        self.assertCounters(0, 3)
+
+    def test_team_that_can_never_fit_is_rejected(self):
+        response = self.register(team_size=4)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Not enough seats", str(response.data))
+
+    def test_team_takes_a_seat_per_participant(self):
+        self.assertEqual(self.register(team_size=2).status_code, status.HTTP_201_CREATED)
+        self.assertCounters(1, 1)
+
+        registration = EventRegistration.objects.get()
+        registration.change_status(RegistrationStatus.CANCELLED)
+        self.assertCounters(0, 3)
+        self.register()
+        self.register()
+
+        # Its seats are gone, so the team can't be reinstated
+        response = self.client.patch(
+            reverse("registration-status-update", args=[registration.pk]),
+            {"status": RegistrationStatus.PENDING}, format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertCounters(2, 1)
+
+    def test_stale_save_keeps_counters_and_applies_seat_change(self):
+        stale = Event.objects.get(pk=self.event.pk)
+        self.register()
+
+        stale.total_seats = 10
+        stale.save()
+        self.assertCounters(1, 9)
+
+    def test_reconcile_rebuilds_counters(self):
+        self.register()
+        Event.objects.filter(pk=self.event.pk).update(active_registration_count=7, seats_remaining=-4)
+
+        out = StringIO()
+        call_command("reconcile_event_counters", stdout=out)
+
+        self.assertCounters(1, 2)
+        self.assertIn("Reconciled 1 event", out.getvalue())
+
+
+class EventParticipantUniquenessTests(EventRegistrationMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.event.total_seats = 10
+        self.event.save()
+
+    def post(self, *participants):
+        return self.client.post(reverse("registration-create"), {
+            "event": self.event.pk, "registration_type": "TEAM", "team_name": "Team", "participants": participants,
+        }, format="json")
+
+    def test_team_member_already_registered(self):
+        self.register(team_size=2)
+        taken = self.participant(1)
+        taken["email"] = "P1@Example.com"
+        other = self.participant(0)
+        other["reg_no"] = "FA22-BCS-900"
+
+        response = self.post(self.participant(), taken, other)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Already registered for this event: FA22-BCS-001, p0@example.com, p1@example.com", str(response.data))
+        self.assertCounters(1, 8)
+
+    def test_conflicts_are_found_in_one_query(self):
+        self.register(team_size=2)
+        with self.assertNumQueries(1):
+            found = list(EventParticipant.objects.conflicting(self.event, [self.participant(n) for n in range(5)]))
+        self.assertEqual(len(found), 2)
+
+    def test_same_participant_twice_in_one_team(self):
+        participant = self.participant()
+        self.assertEqual(self.post(participant, participant).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_events_are_unaffected(self):
+        self.register()
+        other = Event.objects.create(title="Other", content="...", time_from="09:00", time_to="17:00", total_seats=5)
+        response = self.client.post(reverse("registration-create"), {
+            "event": other.pk, "registration_type": "SINGLE", "participants": [self.participant(0)],
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_cancelled_participants_may_register_again(self):
+        self.assertEqual(self.post(self.participant(0)).status_code, status.HTTP_201_CREATED)
+        cancelled = EventRegistration.objects.get()
+        cancelled.change_status(RegistrationStatus.CANCELLED)
+
+        response = self.post(self.participant(0))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertCounters(1, 9)
+
+        # Reinstating the old registration would register them twice
+        response = self.client.patch(
+            reverse("registration-status-update", args=[cancelled.pk]), {"status": RegistrationStatus.PENDING},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, RegistrationStatus.CANCELLED)
+        self.assertCounters(1, 9)
+
+    def test_database_rejects_duplicates_that_slip_past_validation(self):
+        self.register()
+        with self.assertRaises(DuplicateParticipant):
+            EventRegistration.objects.register(self.event, [self.participant(0)], registration_type="SINGLE")
+
+        self.assertEqual(EventRegistration.objects.count(), 1)
+        self.assertCounters(1, 9)
+
+
+class CheckInTests(EventRegistrationMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.addCleanup(caches[settings.RESPONSE_CACHE_ALIAS].clear)
+        self.url = reverse("event-check-in", args=[self.event.pk])
+        self.volunteer = User.objects.create_user(username="volunteer", email="v@example.com", role=UserRole.ADMIN)
+
+    def scan(self, token):
+        self.client.force_authenticate(user=self.volunteer)
+        try:
+            return self.client.post(self.url, {"token": token}, format="json")
+        finally:
+            self.client.force_authenticate(user=None)
+
+    def test_registration_gets_a_qr_code_rendered_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.register()
+        token = response.data["check_in_token"]
+        self.assertTrue(response.data["check_in_qr_code"].endswith(f"/events/check-in/{token}/qr.png"))
+
+        with mock.patch.object(utils, "render_qr_code") as render:
+            qr = self.client.get(response.data["check_in_qr_code"])
+        render.assert_not_called()
+
+        self.assertEqual(qr["Content-Type"], "image/png")
+        self.assertIn("immutable", qr["Cache-Control"])
+        image = Image.open(BytesIO(qr.content))
+        self.assertEqual(image.width, image.height)
+        self.assertEqual(self.client.get(reverse("check-in-qr-code", args=["nope"])).status_code, 404)
+
+    def test_check_in_once(self):
+        token = self.register().data["check_in_token"]
+
+        response = self.scan(token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["checked_in"], response.data["registered"]), (1, 1))
+        self.assertEqual(response.data["registration"]["participants"][0]["name"], "Participant 0")
+
+        again = self.scan(token)
+        self.assertEqual(again.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(again.data["checked_in_at"], EventRegistration.objects.get().checked_in_at)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.checked_in_count, 1)
+
+    def test_check_in_refreshes_the_cached_events(self):
+        token = self.register().data["check_in_token"]
+        self.assertEqual(self.client.get(reverse("events-list-create")).data[0]["checked_in_count"], 0)
+
+        self.scan(token)
+
+        response = self.client.get(reverse("events-list-create"))
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data[0]["checked_in_count"], 1)
+
+    def test_rejected_tokens(self):
+        other = Event.objects.create(title="Other", content="...", time_from="09:00", time_to="17:00", total_seats=5)
+        foreign = EventRegistration.objects.register(other, [self.participant()], registration_type="SINGLE")
+        cancelled = self.register().data["check_in_token"]
+        EventRegistration.objects.get(check_in_token=cancelled).change_status(RegistrationStatus.CANCELLED)
+
+        self.assertEqual(self.scan("unknown").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.scan(foreign.check_in_token).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.scan(cancelled)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("cancelled", response.data["error"])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.checked_in_count, 0)
+
+    def test_counts_are_read_without_counting(self):
+        self.scan(self.register().data["check_in_token"])
+        self.register()
+        self.client.force_authenticate(user=self.volunteer)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data, {"checked_in": 1, "registered": 2})
+
+    def test_scanning_needs_an_account(self):
+        token = self.register().data["check_in_token"]
+        response = self.client.post(self.url, {"token": token}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_students_cannot_scan(self):
+        token = self.register().data["check_in_token"]
+        self.volunteer.role = UserRole.STUDENT
+        self.volunteer.save()
+
+        self.assertEqual(self.scan(token).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.volunteer)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIsNone(EventRegistration.objects.get().checked_in_at)
+
+    def test_deleting_and_reconciling_keep_the_count(self):
+        token = self.register().data["check_in_token"]
+        self.scan(token)
+        Event.objects.filter(pk=self.event.pk).update(checked_in_count=5)
+        self.assertEqual(Event.objects.reconcile_counters(), 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.checked_in_count, 1)
+
+        EventRegistration.objects.get().delete()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.checked_in_count, 0)
+
+
+class EventWaitlistTests(EventRegistrationMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(utils, "schedule_email_flush")
+        self.schedule_email_flush = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fill(self):
+        for _ in range(3):
+            self.register()
+
+    def waitlisted(self):
+        return list(
+            EventRegistration.objects.filter(status=RegistrationStatus.WAITLISTED).order_by("pk").values_list("pk", flat=True)
+        )
+
+    def test_full_event_waitlists_registration(self):
+        self.fill()
+        response = self.register()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["status"], RegistrationStatus.WAITLISTED)
+        self.assertCounters(3, 0)
+
+    def test_cancellation_promotes_oldest_and_emails_after_commit(self):
+        self.fill()
+        self.register(team_size=1)
+        oldest, newest = self.register().data, self.register().data
+        first, second = self.waitlisted()[:2]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse("registration-status-update", args=[EventRegistration.objects.order_by("pk").first().pk]),
+                {"status": RegistrationStatus.CANCELLED}, format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(EventRegistration.objects.get(pk=first).status, RegistrationStatus.PENDING)
+        self.assertEqual(len(self.waitlisted()), 2)
+        self.assertCounters(3, 0)
+        self.assertEqual(list(PendingEmail.objects.values_list("recipient", flat=True)), ["p3@example.com"])
+        self.schedule_email_flush.assert_called_once()
+        self.assertEqual((oldest["status"], newest["status"]), (RegistrationStatus.WAITLISTED,) * 2)
+
+    def test_team_at_head_holds_back_the_queue(self):
+        self.fill()
+        self.register(team_size=2)
+        self.register()
+        team, single = self.waitlisted()
+
+        EventRegistration.objects.order_by("pk").first().delete()
+
+        # One seat is free, but the team at the head needs two
+        self.assertEqual(self.waitlisted(), [team, single])
+        self.assertCounters(2, 1)
+        # Newcomers queue up behind them instead of taking the seat
+        self.assertEqual(self.register().data["status"], RegistrationStatus.WAITLISTED)
+
+        EventRegistration.objects.order_by("pk").first().delete()
+        self.assertEqual(self.waitlisted()[0], single)
+        self.assertCounters(2, 0)
+
+    def test_added_seats_go_to_the_waitlist(self):
+        self.fill()
+        self.register()
+        self.register()
+
+        self.event.total_seats = 4
+        self.event.save()
+
+        self.assertEqual(len(self.waitlisted()), 1)
+        self.assertCounters(4, 0)
+
+    def test_only_added_seats_check_the_waitlist(self):
+        self.fill()
+        self.register()
+
+        with mock.patch.object(EventRegistration.objects, "promote_waitlisted") as promote:
+            self.event.title = "Renamed"
+            self.event.save()
+            self.event.total_seats = 2
+            self.event.save()
+            promote.assert_not_called()
+
+            self.event.total_seats = 5
+            self.event.save()
+            promote.assert_called_once_with(self.event.pk)
+
+        self.assertCounters(3, 2)
+
+    def test_queued_emails_are_sent_in_batches(self):
+        utils.queue_emails([(f"p{n}@example.com", "Subject", "Body") for n in range(5)])
+
+        with mock.patch.object(utils, "get_connection", wraps=utils.get_connection) as get_connection:
+            sent, failed = utils.flush_pending_emails(batch_size=2)
+
+        self.assertEqual((sent, failed), (5, 0))
+        self.assertEqual(get_connection.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(PendingEmail.objects.exists())
+
+    def test_failed_email_batch_backs_off(self):
+        utils.queue_emails([("p0@example.com", "Subject", "Body")])
+
+        with mock.patch.object(utils, "get_connection", side_effect=ConnectionRefusedError("smtp down")):
+            sent, failed = utils.flush_pending_emails()
+
+        email = PendingEmail.objects.get()
+        self.assertEqual((sent, failed), (0, 1))
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+
+class EventListTests(APITestCase):
+    def setUp(self):
+        self.workshop = EventType.objects.create(type="WORKSHOP")
+        self.talk = EventType.objects.create(type="TALK")
+        today = timezone.localdate()
+        # Several events share a date, so pages have to break ties on id
+        self.events = [
+            Event.objects.create(
+                title=f"Event {n}", content="Long write-up " * 100, time_from="09:00", time_to="17:00",
+                date=today + timedelta(days=n // 3 - 2), event_type=self.workshop if n % 2 else self.talk,
+            )
+            for n in range(10)
+        ]
+
+    def get(self, **params):
+        response = self.client.get(reverse("events-list-create"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_unpaginated_by_default(self):
+        data = self.get()
+
+        self.assertEqual(len(data), 10)
+        self.assertIn("Long write-up", data[0]["content"])
+        self.assertEqual(data[0]["event_type"]["type"], "WORKSHOP")
+
+    def test_summary_leaves_content_out(self):
+        data = self.get(summary="true")
+
+        self.assertEqual(len(data), 10)
+        self.assertNotIn("content", data[0])
+        self.assertEqual(data[0]["event_type"]["type"], "WORKSHOP")
+        self.assertNotIn("content", self.get(summary="true", page_size=4)["results"][0])
+
+    def test_cursor_pages_follow_date_then_id(self):
+        expected = [
+            event.pk for event in sorted(self.events, key=lambda event: (-event.date.toordinal(), event.pk))
+        ]
+        seen = []
+        page = self.get(page_size=4)
+        while True:
+            seen += [event["id"] for event in page["results"]]
+            if page["next"] is None:
+                break
+            with self.assertNumQueries(1):
+                response = self.client.get(page["next"])
+            page = response.data
+
+        self.assertEqual(seen, expected)
+
+    def test_new_event_does_not_shift_pages(self):
+        first = self.get(page_size=5)
+        Event.objects.create(title="Late", content="...", time_from="09:00", time_to="17:00")
+        second = self.client.get(first["next"]).data
+
+        ids = [event["id"] for event in first["results"] + second["results"]]
+        self.assertEqual(len(set(ids)), 10)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("events-list-create"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filters(self):
+        today = timezone.localdate()
+        upcoming = {event.pk for event in self.events if event.date >= today}
+
+        self.assertEqual({event["id"] for event in self.get(upcoming="true")}, upcoming)
+        self.assertEqual({event["id"] for event in self.get(upcoming="false")}, {e.pk for e in self.events} - upcoming)
+        self.assertEqual(len(self.get(event_type=self.talk.pk)), 5)
+        self.assertEqual(len(self.get(date=today)), 3)
+        self.assertEqual(len(self.get(date_after=today, date_before=today + timedelta(days=1), page_size=2)["results"]), 2)
+
+    def test_detail_keeps_content(self):
+        response = self.client.get(reverse("events-RUD", args=[self.events[0].pk]))
+        self.assertIn("Long write-up", response.data["content"])
+
+
+class EventTagFilterTests(APITestCase):
+    def setUp(self):
+        def event(title, tags, hosts):
+            return Event.objects.create(
+                title=title, content="...", time_from="09:00", time_to="17:00", tags=tags, hosts=hosts,
+            ).pk
+
+        self.python = event("Python 101", ["python", "beginner"], ["ACM"])
+        self.django = event("Django", ["python", "web"], ["ACM", "GDSC"])
+        self.react = event("React", ["web", "javascript"], ["GDSC"])
+        self.untagged = event("Social", None, None)
+
+    def ids(self, **params):
+        response = self.client.get(reverse("events-list-create"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {event["id"] for event in response.data}
+
+    def test_any_of_the_tags(self):
+        self.assertEqual(self.ids(tags="python"), {self.python, self.django})
+        self.assertEqual(self.ids(tags="beginner, javascript"), {self.python, self.react})
+
+    def test_all_of_the_tags(self):
+        self.assertEqual(self.ids(tags_all="python,web"), {self.django})
+        self.assertEqual(self.ids(tags_all="python,javascript"), set())
+
+    def test_hosts(self):
+        self.assertEqual(self.ids(hosts="GDSC"), {self.django, self.react})
+        self.assertEqual(self.ids(hosts_all="ACM,GDSC"), {self.django})
+        self.assertEqual(self.ids(hosts="GDSC", tags="beginner"), set())
+
+    def test_empty_filter_is_ignored(self):
+        self.assertEqual(len(self.ids(tags="")), 4)
+        self.assertEqual(len(self.ids(tags=",")), 4)
+
+    def test_tag_counts(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("event-tags"))
+
+        self.assertEqual(response.data, [
+            {"tag": "python", "count": 2},
+            {"tag": "web", "count": 2},
+            {"tag": "beginner", "count": 1},
+            {"tag": "javascript", "count": 1},
+        ])
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.addCleanup(caches[settings.RESPONSE_CACHE_ALIAS].clear)
+        self.event = Event.objects.create(
+            title="Hackathon", content="...", time_from="09:00", time_to="17:00", total_seats=10,
+        )
+        self.url = reverse("events-list-create")
+
+    def test_repeated_get_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(first.data, second.data)
+
+    def test_query_string_is_part_of_the_key(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, {"upcoming": "false"})["X-Cache"], "MISS")
+
+    def test_saving_a_model_invalidates(self):
+        self.client.get(self.url)
+        Event.objects.create(title="Talk", content="...", time_from="09:00", time_to="10:00")
+
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.data), 2)
+
+    def test_registration_invalidates_event_counts(self):
+        self.client.get(self.url)
+        EventRegistration.objects.register(self.event, [{
+            "name": "P", "email": "p@example.com", "reg_no": "FA22-BCS-001",
+            "current_semester": 5, "department": "CS", "phone_no": "+923000000000",
+        }], registration_type="SINGLE")
+
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data[0]["registration_count"], 1)
+
+    def test_unrelated_model_does_not_invalidate(self):
+        self.client.get(self.url)
+        Blog.objects.create(title="Post", content="...", createdBy=User.objects.create_user(username="author"))
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+
+    def test_login_does_not_invalidate(self):
+        user = User.objects.create_user(username="reader")
+        self.client.get(reverse("public-students"))
+        user.last_login = timezone.now()
+        user.save(update_fields=["last_login"])
+        self.assertEqual(self.client.get(reverse("public-students"))["X-Cache"], "HIT")
+
+    def test_version_bumped_again_on_commit(self):
+        from api.cache import get_versions
+
+        before = get_versions([Event])[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.save()
+        self.assertEqual(get_versions([Event])[0], before + 2)
+
+    def test_stats(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.get(self.url)
+        admin = User.objects.create_user(username="admin", role=UserRole.ADMIN)
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.get(reverse("response-cache-stats"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["EventListCreateView"], {"hits": 2, "misses": 1, "hit_rate": 0.667})
+
+
+class EventParticipantExportTests(APITestCase):
+    def setUp(self):
+        self.event = Event.objects.create(
+            title="Code Sprint", content="...", time_from="09:00", time_to="17:00", total_seats=10000,
+        )
+        self.url = reverse("event-participant-export", args=[self.event.pk])
+        admin = User.objects.create_user(username="admin", email="admin@example.com", role=UserRole.ADMIN)
+        self.client.force_authenticate(user=admin)
+
+    def add_registrations(self, count, team_size=1, start=0):
+        for n in range(start, start + count):
+            EventRegistration.objects.register(self.event, [
+                {"name": f"P{n}-{m}", "email": f"p{n}.{m}@example.com", "reg_no": f"FA22-BCS-{n:03d}-{m}",
+                 "current_semester": 5, "department": "CS", "phone_no": "+923000000000"}
+                for m in range(team_size)
+            ], registration_type="SINGLE" if team_size == 1 else "TEAM", team_name=None if team_size == 1 else f"T{n}")
+
+    def test_csv_is_streamed(self):
+        self.add_registrations(2, team_size=2)
+        other = Event.objects.create(title="Other", content="...", time_from="09:00", time_to="17:00", total_seats=5)
+        EventRegistration.objects.register(other, [{
+            "name": "Elsewhere", "email": "x@example.com", "reg_no": "FA22-BCS-999",
+            "current_semester": 5, "department": "CS", "phone_no": "+923000000000",
+        }], registration_type="SINGLE")
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertIn('filename="code-sprint-participants.csv"', response["Content-Disposition"])
+        rows = list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][:5], ["Registration ID", "Registration Type", "Team Name", "Status", "Name"])
+        self.assertEqual([row[4] for row in rows[1:]], ["P0-0", "P0-1", "P1-0", "P1-1"])
+        self.assertEqual(rows[1][2:4], ["T0", "PENDING"])
+
+    def test_xlsx(self):
+        self.add_registrations(3)
+        EventRegistration.objects.first().change_status(RegistrationStatus.CANCELLED)
+
+        response = self.client.get(self.url, {"type": "xlsx", "status": "PENDING"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sheet = load_workbook(BytesIO(b"".join(response.streaming_content)), read_only=True).active
+        rows = list(sheet.values)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([row[4] for row in rows[1:]], ["P1-0", "P2-0"])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {"type": "pdf"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {"status": "LOST"}).status_code, status.HTTP_400_BAD_REQUEST)
+        missing = reverse("event-participant-export", args=[self.event.pk + 1])
+        self.assertEqual(self.client.get(missing).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_admins_only(self):
+        student = User.objects.create_user(username="student", email="student@example.com", phone_number="+923001112223")
+        self.client.force_authenticate(user=student)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def peak_export_memory(self):
+        response = self.client.get(self.url)
+        tracemalloc.start()
+        try:
+            rows = sum(chunk.count(b"\n") for chunk in response.streaming_content)
+            return rows, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    @override_settings(EXPORT_CHUNK_SIZE=100)
+    def test_csv_memory_is_flat(self):
+        self.add_registrations(50, team_size=4)
+        small_rows, small = self.peak_export_memory()
+        self.add_registrations(500, team_size=4, start=50)
+        large_rows, large = self.peak_export_memory()
+
+        self.assertEqual((small_rows, large_rows), (201, 2201))
+        print(f"\n[memory] CSV export peak: {small_rows} rows -> {small} B, {large_rows} rows -> {large} B")
+        self.assertLess(large, small * 2)
+
+
+class EventCalendarTests(TestCase):
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.addCleanup(caches[settings.RESPONSE_CACHE_ALIAS].clear)
+        self.event = Event.objects.create(
+            title="Night, Hack; Code", description="Bring a laptop\nand snacks", content="...",
+            date="2026-03-14", time_from="20:00", time_to="02:00", location="Lab 3",
+        )
+        self.other = Event.objects.create(
+            title="Talk", content="...", date="2026-03-20", time_from="10:00", time_to="11:00",
+        )
+        self.url = reverse("event-calendar-feed")
+
+    def test_feed(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        body = response.content.decode()
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertEqual(body.count("BEGIN:VEVENT"), 2)
+        self.assertIn(f"UID:event-{self.event.pk}@acmcuiwah.com\r\n", body)
+        # 20:00 in Karachi (UTC+5), running past midnight
+        self.assertIn("DTSTART:20260314T150000Z\r\nDTEND:20260314T210000Z\r\n", body)
+        self.assertIn("SUMMARY:Night\\, Hack\\; Code\r\n", body)
+        self.assertIn("DESCRIPTION:Bring a laptop\\nand snacks\r\n", body)
+        self.assertLess(body.index("SUMMARY:Night"), body.index("SUMMARY:Talk"))
+
+    def test_unchanged_poll_gets_304(self):
+        response = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            etag_poll = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        date_poll = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+
+        self.assertEqual((etag_poll.status_code, date_poll.status_code), (304, 304))
+
+    def test_edits_and_deletions_change_the_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.event.title = "Renamed"
+        self.event.save()
+        edited = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(edited.status_code, 200)
+        self.assertIn("SUMMARY:Renamed", edited.content.decode())
+
+        self.other.delete()
+        deleted = self.client.get(self.url, HTTP_IF_NONE_MATCH=edited["ETag"])
+        self.assertEqual(deleted.status_code, 200)
+        self.assertEqual(deleted.content.decode().count("BEGIN:VEVENT"), 1)
+
+    def test_only_edited_events_are_rendered_again(self):
+        self.client.get(self.url)
+        self.event.location = "Auditorium"
+        self.event.save()
+
+        with mock.patch("api.ical.render_vevent", wraps=ical.render_vevent) as render:
+            body = self.client.get(self.url).content.decode()
+
+        self.assertEqual([call.args[0].pk for call in render.call_args_list], [self.event.pk])
+        self.assertIn("LOCATION:Auditorium", body)
+
+    def test_long_lines_are_folded(self):
+        self.other.description = "é" * 100
+        self.other.save()
+        body = self.client.get(self.url).content
+        for line in body.split(b"\r\n"):
+            self.assertLessEqual(len(line), 75)
+        self.assertIn("é" * 100, body.decode().replace("\r\n ", ""))
+
+    def test_single_event_download(self):
+        url = reverse("event-calendar", args=[self.other.pk])
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('filename="talk.ics"', response["Content-Disposition"])
+        self.assertEqual(response.content.decode().count("BEGIN:VEVENT"), 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(self.client.get(reverse("event-calendar", args=[0])).status_code, 404)
+
+
+@override_settings(STORAGE_BACKEND=MEMORY_STORAGE, SITE_URL="https://example.com")
+class BlogFeedTests(TestCase):
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.addCleanup(caches[settings.RESPONSE_CACHE_ALIAS].clear)
+        author = User.objects.create_user(username="author", email="author@example.com")
+        self.older = Blog.objects.create(title="Older", content="<p>First &amp; foremost</p>", createdBy=author)
+        self.newer = Blog.objects.create(title="Newer", content="<p>Second</p>", createdBy=author)
+        Blog.objects.filter(pk=self.older.pk).update(createdAt=timezone.now() - timedelta(days=1))
+        BlogImage.objects.create(blog=self.newer, image="blogs/cover.png")
+        BlogImage.objects.create(blog=self.newer, image="blogs/later.jpg")
+        StoredObject.objects.create(digest="a" * 64, path="blogs/cover.png", size=1234)
+        self.url = reverse("blog-rss-feed")
+
+    def test_rss(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response["Content-Type"], "application/rss+xml; charset=utf-8")
+        self.assertIn("max-age=300", response["Cache-Control"])
+        items = ElementTree.fromstring(response.content).findall("channel/item")
+        self.assertEqual([item.findtext("title") for item in items], ["Newer", "Older"])
+        self.assertEqual(items[0].findtext("link"), f"https://example.com/blog/{self.newer.pk}")
+        self.assertEqual(items[1].findtext("description"), "First & foremost")
+        enclosure = items[0].find("enclosure")
+        self.assertTrue(enclosure.get("url").endswith("blogs/cover.png"))
+        self.assertEqual((enclosure.get("length"), enclosure.get("type")), ("1234", "image/png"))
+        self.assertIsNone(items[1].find("enclosure"))
+
+    def test_atom(self):
+        response = self.client.get(reverse("blog-atom-feed"))
+
+        entries = ElementTree.fromstring(response.content).findall("{http://www.w3.org/2005/Atom}entry")
+        self.assertEqual(len(entries), 2)
+        self.assertTrue(response["Content-Type"].startswith("application/atom+xml"))
+
+    def test_unchanged_polls_skip_the_database(self):
+        response = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).content, response.content)
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+            since = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(since.status_code, 304)
+
+    def test_changes_render_the_feed_again(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        self.older.title = "Edited"
+        self.older.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Edited", response.content)
+
+        self.newer.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(len(ElementTree.fromstring(response.content).findall("channel/item")), 1)
+
+
+class RegistrationConcurrencyTests(TransactionTestCase):
+    """
+    Fires registrations for one event from many threads at once, each with
+    its own database connection, the way a burst right after an event opens
+    hits several workers.
+    """
+    THREADS = 20
+    ATTEMPTS = 300
+
+    def burst(self, total_seats, team_size, same_participants=False):
+        event = Event.objects.create(
+            title="Launch", content="...", time_from="09:00", time_to="17:00", total_seats=total_seats,
+        )
+        numbers = itertools.count()
+
+        def data():
+            start = 0 if same_participants else next(numbers) * team_size
+            return {
+                "event": event.pk,
+                "registration_type": "SINGLE" if team_size == 1 else "TEAM",
+                "team_name": "Team",
+                "participants": [
+                    {"name": f"P{n}", "email": f"p{n}@example.com", "reg_no": f"FA22-BCS-{n:04d}",
+                     "current_semester": 5, "department": "CS", "phone_no": "+923000000000"}
+                    for n in range(start, start + team_size)
+                ],
+            }
+
+        barrier = threading.Barrier(self.THREADS)
+        codes = []
+
+        def worker():
+            client = APIClient()
+            barrier.wait()
+            try:
+                for _ in range(self.ATTEMPTS // self.THREADS):
+                    codes.append(client.post(reverse("registration-create"), data(), format="json").status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        event.refresh_from_db()
+        registrations = EventRegistration.objects.filter(event=event)
+        if same_participants:
+            return event, codes
+        self.assertEqual(codes, [201] * self.ATTEMPTS)
+        self.assertEqual(registrations.count(), self.ATTEMPTS)
+        return event, registrations.exclude(status=RegistrationStatus.WAITLISTED).count()
+
+    def test_singles_fill_exact_capacity(self):
+        event, accepted = self.burst(total_seats=100, team_size=1)
+
+        self.assertEqual(accepted, 100)
+        self.assertEqual((event.active_registration_count, event.seats_remaining), (100, 0))
+        self.assertEqual(Event.objects.reconcile_counters(), 0)
+
+    def test_same_participant_registers_once(self):
+        event, codes = self.burst(total_seats=100, team_size=2, same_participants=True)
+
+        self.assertEqual(sorted(codes), [201] + [400] * (self.ATTEMPTS - 1))
+        self.assertEqual(EventParticipant.objects.filter(event=event).count(), 2)
+        self.assertEqual((event.active_registration_count, event.seats_remaining), (1, 98))
+
+    def test_concurrent_scans_check_in_once(self):
+        event = Event.objects.create(
+            title="Launch", content="...", time_from="09:00", time_to="17:00", total_seats=10,
+        )
+        registration = EventRegistration.objects.register(event, [{
+            "name": "P", "email": "p@example.com", "reg_no": "FA22-BCS-001",
+            "current_semester": 5, "department": "CS", "phone_no": "+923000000000",
+        }], registration_type="SINGLE")
+        volunteer = User.objects.create_user(username="volunteer", email="v@example.com", role=UserRole.ADMIN)
+        barrier = threading.Barrier(self.THREADS)
+        codes = []
+
+        def scanner():
+            client = APIClient()
+            client.force_authenticate(user=volunteer)
+            barrier.wait()
+            try:
+                codes.append(client.post(
+                    reverse("event-check-in", args=[event.pk]), {"token": registration.check_in_token}, format="json",
+                ).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=scanner) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        event.refresh_from_db()
+        self.assertEqual(sorted(codes), [200] + [409] * (self.THREADS - 1))
+        self.assertEqual(event.checked_in_count, 1)
+
+    def test_teams_never_oversell(self):
+        event, accepted = self.burst(total_seats=50, team_size=3)
+
+        self.assertEqual(accepted, 16)
+        self.assertEqual(
+            EventParticipant.objects.filter(registration__event=event)
+            .exclude(registration__status=RegistrationStatus.WAITLISTED).count(),
+            48,
+        )
+        self.assertEqual((event.active_registration_count, event.seats_remaining), (16, 2))
+        self.assertEqual(Event.objects.reconcile_counters(), 0)
+
+
+class StorageBackendTests(SimpleTestCase):
+    def make_file(self, name="photo.jpg", content=b"image bytes"):
+        return SimpleUploadedFile(name, content, content_type="image/jpeg")
+
+    def test_memory_backend_round_trip(self):
+        storage = InMemoryStorage()
+        storage.upload("blogs/a.jpg", self.make_file(), "image/jpeg")
+
+        self.assertTrue(storage.exists("blogs/a.jpg"))
+        self.assertEqual(storage.download("blogs/a.jpg"), b"image bytes")
+        self.assertEqual(storage.download_range("blogs/a.jpg", 5), b"image")
+        self.assertEqual((storage.size("blogs/a.jpg"), storage.size("blogs/missing.jpg")), (11, None))
+        with self.assertRaises(StorageError):
+            storage.upload("blogs/a.jpg", self.make_file(), "image/jpeg")
+
+        storage.remove(["blogs/a.jpg", "blogs/missing.jpg"])
+        self.assertFalse(storage.exists("blogs/a.jpg"))
+
+    def test_memory_backend_injects_failures(self):
+        storage = InMemoryStorage(failure_rate=1.0)
+        with self.assertRaises(StorageError):
+            storage.upload("blogs/a.jpg", self.make_file(), "image/jpeg")
+
+    def test_local_backend_writes_under_media_root(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as root:
+            storage = LocalFileSystemStorage(location=root, base_url="/media/media/")
+            storage.upload("events/poster.jpg", self.make_file(), "image/jpeg")
+
+            self.assertEqual(storage.download("events/poster.jpg"), b"image bytes")
+            self.assertEqual(storage.download_range("events/poster.jpg", 5), b"image")
+            self.assertEqual((storage.size("events/poster.jpg"), storage.size("events/missing.jpg")), (11, None))
+            self.assertEqual(storage.public_url("events/poster.jpg"), "/media/media/events/poster.jpg")
+            with self.assertRaises(StorageError):
+                storage.upload("../outside.jpg", self.make_file(), "image/jpeg")
+
+            storage.remove(["events/poster.jpg"])
+            self.assertFalse(storage.exists("events/poster.jpg"))
+
+
+@override_settings(STORAGE_BACKEND={
+    'BACKEND': 'api.storage.InMemoryStorage',
+    'OPTIONS': {'latency': 0.1},
+})
+class UploadConcurrencyBenchmarkTests(TransactionTestCase):
+    """
+    Runs the real upload path against the in-memory backend with injected
+    latency, the way an upload-heavy endpoint would be load-tested offline.
+    """
+
+    def test_latency_overlaps_across_the_upload_pool(self):
+        files = [
+            SimpleUploadedFile(f"img{i}.jpg", bytes([i]) * 10, content_type="image/jpeg")
+            for i in range(4)
+        ]
+
+        started = time.monotonic()
+        paths = utils.upload_files(files, "blogs")
+        elapsed = time.monotonic() - started
+
+        print(f"\n[benchmark] 4 uploads at 100 ms latency took {elapsed * 1000:.0f} ms")
+        self.assertEqual(set(get_storage().objects), set(paths))
+        self.assertLess(elapsed, 0.35)
+
+
+
+class StartupImportTests(SimpleTestCase):
+    """
+    Boots Django in a fresh interpreter and loads the URLconf, which imports
+    every model, serializer and view, the same as a gunicorn worker does.
+    """
+    # Generous, since machines vary: this takes ~1s now, and took ~2.4s while
+    # api.supabase still built its client (and imported supabase) at import
+    IMPORT_BUDGET_MS = 1800
+    HEAVY_MODULES = ("supabase", "storage3", "realtime", "postgrest", "httpx")
+
+    def _run(self, code, *args):
+        return subprocess.run(
+            [sys.executable, *args, "-c", f"import django; django.setup(); import api.urls; {code}"],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "backend.settings")},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+    def test_supabase_stack_not_imported_at_startup(self):
+        result = self._run(f"import sys; print(','.join(m for m in {self.HEAVY_MODULES!r} if m in sys.modules))")
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_startup_import_time(self):
+        result = self._run("", "-X", "importtime")
+        # Lines look like 'import time:  self [us] | cumulative | package', with
+        # package indented by nesting depth; top-level rows add up to the total
+        total_us = 0
+        for line in result.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[1].strip().isdigit() and not parts[2].startswith("  "):
+                total_us += int(parts[1])
+
+        self.assertIn("api.urls", result.stderr)
+        total_ms = total_us / 1000
+        self.assertLess(total_ms, self.IMPORT_BUDGET_MS, f"Startup imports took {total_ms:.0f}ms")
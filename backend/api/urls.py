@@ -2,10 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from api.views import (
     SignupView, OTPView, LoginView, PasswordChangeView, LogoutView,
-    BlogUploadView, BlogListAPIView, BlogDetailView, BlogEditView, BlogDeleteView,
+    BlogUploadView, BlogListAPIView, BlogDetailView, BlogMostReadView, BlogEditView, BlogDeleteView, blog_feed,
     MeetingRUDView, MeetingCreateView, MeetingListView, MeetingAttendanceListView,
     MeetingAttendanceRUDView, StudentsListView, StudentRUView, MeetingPDFView,
-    api_root, AdminRUDView,
+    api_root, AdminRUDView, SignedUploadView,
     PublicStudentsListView, BillListCreateView, BillRUDView, InlineImageUploadView,
 
     # Recruitment Views
@@ -19,6 +19,12 @@ from api.views import (
     # Event Views
     EventDetailView,
     EventTypeListCreateView,
+    EventTagListView,
+    EventCheckInView,
+    CheckInQRCodeView,
+    event_calendar_feed,
+    event_calendar,
+    EventParticipantExportView,
     EventListCreateView,
     EventRegistrationListCreateView,
     RegistrationStatusUpdateView,
@@ -27,6 +33,7 @@ from api.views import (
 
     # Health Check View
     health_check,
+    response_cache_stats,
 )
 
 # NOTE: 'RUD' stands for Read, Update, Delete ops
@@ -45,6 +52,7 @@ urlpatterns = [
     
     # Health Check (For keeping Render awake)
     path('health/', health_check, name='health_check'),
+    path('cache/stats/', response_cache_stats, name='response-cache-stats'),
 
     # Authentication
     path('auth/signup/', SignupView.as_view(), name='signup'),
@@ -64,11 +72,17 @@ urlpatterns = [
     # Blogs
     path('blogs/', BlogListAPIView.as_view(), name='blog-list'),
     path('blogs/<int:pk>/', BlogDetailView.as_view(), name='blog-detail'),
+    path('blogs/most-read/', BlogMostReadView.as_view(), name='blog-most-read'),
+    path('blogs/feed.rss', blog_feed, {'kind': 'rss'}, name='blog-rss-feed'),
+    path('blogs/feed.atom', blog_feed, {'kind': 'atom'}, name='blog-atom-feed'),
     path('blogs/upload/', BlogUploadView.as_view(), name='blog-upload'),
     path('blogs/<int:pk>/edit/', BlogEditView.as_view(), name='blog-edit'),
     path('blogs/<int:pk>/delete/', BlogDeleteView.as_view(), name='blog-delete'),
     path('blogs/upload-inline-image/', InlineImageUploadView.as_view(), name='inline-image-upload'),
 
+    # Direct-to-bucket uploads
+    path('uploads/signed-url/', SignedUploadView.as_view(), name='signed-upload'),
+
     # Meetings
     path('meetings/', MeetingListView.as_view(), name='meeting.py-list'),
     path('meetings/create/', MeetingCreateView.as_view(), name='meeting.py-create'),
@@ -96,7 +110,13 @@ urlpatterns = [
     # Events
     path('events/', EventListCreateView.as_view(), name='events-list-create'),
     path('events/<int:pk>/', EventDetailView.as_view(), name='events-RUD'),
+    path('events/calendar.ics', event_calendar_feed, name='event-calendar-feed'),
+    path('events/<int:pk>/calendar.ics', event_calendar, name='event-calendar'),
+    path('events/<int:pk>/check-in/', EventCheckInView.as_view(), name='event-check-in'),
+    path('events/check-in/<str:token>/qr.png', CheckInQRCodeView.as_view(), name='check-in-qr-code'),
+    path('events/<int:pk>/export/', EventParticipantExportView.as_view(), name='event-participant-export'),
     path('events/types/', EventTypeListCreateView.as_view()),
+    path('events/tags/', EventTagListView.as_view(), name='event-tags'),
     path('events/registrations/', EventRegistrationListCreateView.as_view(), name='registration-create'),
     path('events/registrations/<int:pk>/', EventRegistrationDetailView.as_view(), name='registration-detail'),
     path('events/registrations/<int:pk>/delete/', EventRegistrationDeleteView.as_view(), name='registration-delete'),
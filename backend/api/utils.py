@@ -1,9 +1,26 @@
-from datetime import datetime
-from .supabase import supabase
+import hashlib
+import html
+import logging
+import os
+import re
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from datetime import datetime, timedelta
+from threading import Lock
 from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from urllib.parse import unquote
 from uuid import uuid4
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.core.files.base import ContentFile
+from .storage import get_storage
+from .images import generate_variants, render_qr_code, variant_path, variant_paths, VARIANT_CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
 
 
 def get_tokens_for_user(user, **claims):
@@ -67,25 +84,565 @@ def current_time():
     return datetime.now().time()
 
 
+def queue_emails(emails):
+    """
+    Queues emails to be sent in the background once the current transaction
+    commits, so the request that triggered them never waits on SMTP.
+
+    :param emails: Iterable of (recipient, subject, body) tuples
+    """
+    from api.models import PendingEmail  # api.models imports this module
+
+    PendingEmail.objects.bulk_create([
+        PendingEmail(recipient=recipient, subject=subject, body=body)
+        for recipient, subject, body in emails
+    ])
+    transaction.on_commit(schedule_email_flush)
+
+
+def schedule_email_flush():
+    _get_background_executor().submit(_pooled, _send_emails_in_background)
+
+
+def _send_emails_in_background():
+    try:
+        flush_pending_emails()
+    except Exception as e:
+        logger.error(f"Sending queued emails failed: {str(e)}")
+
+
+def flush_pending_emails(batch_size=None):
+    """
+    Sends queued emails, one SMTP connection per batch. A failed batch is
+    retried later with exponential backoff (messages in it that did go out
+    may then be sent twice). Rows are claimed with SKIP LOCKED, so several
+    senders can run at once.
+
+    :return: Tuple of (sent, failed) email counts
+    """
+    from api.models import PendingEmail
+
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    sent = failed = 0
+
+    while True:
+        with transaction.atomic():
+            batch = list(
+                PendingEmail.objects
+                .select_for_update(skip_locked=True)
+                .filter(next_attempt_at__lte=timezone.now())
+                .order_by("id")[:batch_size]
+            )
+            if not batch:
+                break
+
+            messages = [
+                EmailMessage(email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.recipient])
+                for email in batch
+            ]
+            try:
+                with get_connection() as mail_connection:
+                    mail_connection.send_messages(messages)
+            except Exception as e:
+                logger.warning(f"Sending {len(batch)} email(s) failed, will retry: {str(e)}")
+                now = timezone.now()
+                for email in batch:
+                    email.attempts += 1
+                    delay = min(settings.EMAIL_RETRY_BASE * 2 ** (email.attempts - 1), settings.EMAIL_RETRY_MAX)
+                    email.next_attempt_at = now + timedelta(seconds=delay)
+                    email.last_error = str(e)
+                PendingEmail.objects.bulk_update(batch, ["attempts", "next_attempt_at", "last_error"])
+                failed += len(batch)
+            else:
+                PendingEmail.objects.filter(id__in=[email.id for email in batch]).delete()
+                sent += len(batch)
+
+    return sent, failed
+
+
 def upload_file(file, folder):
     """
-    Upload a file to the public bucket.
+    Upload a file to the public bucket through the configured storage
+    backend (see api.storage).
     Returns the path that can be used to construct the URL.
+
+    Uploads are deduplicated by content: if the same bytes are already in
+    the bucket, the existing path is returned and nothing is sent.
+    """
+    path, _ = _store_file(file, folder)
+    return path
+
+
+def upload_image(file, folder):
+    """
+    Upload an image along with its resized WebP variants (see IMAGE_VARIANTS).
+    Returns the path of the original; variant paths are derived from it.
+
+    A variant that can't be generated or uploaded is logged and skipped,
+    since the original is still usable on its own. Reusing an identical object that
+    was stored without variants (through upload_file) creates them then.
+    """
+    from api.models import StoredObject
+
+    path, has_variants = _store_file(file, folder)
+    if not has_variants and _upload_variants(path, file, upsert=True):
+        StoredObject.objects.filter(path=path).update(has_variants=True)
+    return path
+
+
+def file_digest(file) -> str:
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks(settings.UPLOAD_CHUNK_SIZE):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _store_file(file, folder):
     """
+    Stores the file under a new path, or takes another reference on an
+    identical object that is already stored.
+
+    :return: Tuple of (path, has_variants)
+    """
+    from api.models import StoredObject  # api.models imports this module
+
+    digest = file_digest(file)
+    stored = _reuse_stored_object(digest)
+    if stored:
+        return stored
 
     path = f"{folder}/{uuid4()}_{file.name}"
+    content_type = getattr(file, "content_type", None) or "application/octet-stream"
+    _upload_to_path(path, file, content_type)
+
+    try:
+        with transaction.atomic():
+            StoredObject.objects.create(digest=digest, path=path, size=file.size)
+    except IntegrityError:
+        # The same bytes were stored concurrently; keep theirs and drop ours
+        existing = _reuse_stored_object(digest)
+        if existing:
+            _remove_objects(settings.SUPABASE_BUCKET, [path])
+            return existing
+        raise
+
+    return path, False
+
 
-    supabase.storage.from_(settings.SUPABASE_BUCKET).upload(
-        path,
-        file.read(),
-        file_options={"content-type": file.content_type}
+def _reuse_stored_object(digest):
+    from api.models import StoredObject
+
+    with transaction.atomic():
+        updated = StoredObject.objects.filter(digest=digest).update(ref_count=F("ref_count") + 1)
+        if not updated:
+            return None
+        return StoredObject.objects.values_list("path", "has_variants").get(digest=digest)
+
+
+def _upload_variants(path, file, upsert=False) -> bool:
+    """
+    Returns whether the variants were generated and uploaded. Failures are
+    logged, not raised: by now the original is stored and referenced.
+    """
+    try:
+        variants = generate_variants(file)
+    except Exception as e:
+        logger.error(f"Failed to generate image variants for {path}: {str(e)}")
+        return False
+    try:
+        for name, content in variants.items():
+            _upload_to_path(variant_path(path, name), content, VARIANT_CONTENT_TYPE, upsert=upsert)
+    except Exception as e:
+        logger.error(f"Failed to upload image variants for {path}: {str(e)}")
+        return False
+    return True
+
+
+def _upload_to_path(path, file, content_type, upsert=False):
+    get_storage().upload(path, file, content_type, upsert=upsert)
+
+
+_upload_executor = None
+_upload_executor_lock = Lock()
+
+
+def _get_upload_executor():
+    """
+    Returns the process-wide thread pool used for concurrent uploads.
+    The pool is shared so the number of in-flight Supabase requests per
+    worker stays bounded by UPLOAD_MAX_WORKERS regardless of request load.
+    """
+    global _upload_executor
+    if _upload_executor is None:
+        with _upload_executor_lock:
+            if _upload_executor is None:
+                _upload_executor = ThreadPoolExecutor(
+                    max_workers=settings.UPLOAD_MAX_WORKERS,
+                    thread_name_prefix="upload",
+                )
+    return _upload_executor
+
+
+_background_executor = None
+
+
+def _get_background_executor():
+    """
+    Returns the process-wide single thread that drains the deletion and
+    email queues and generates the variants of direct uploads. It's kept
+    apart from the upload pool, so this work can never hold up a request's
+    uploads and run down their UPLOAD_TIMEOUT.
+    """
+    global _background_executor
+    if _background_executor is None:
+        with _upload_executor_lock:
+            if _background_executor is None:
+                _background_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="background")
+    return _background_executor
+
+
+def upload_files(files, folder, images=False):
+    """
+    Upload several files to the public bucket concurrently.
+    Returns the paths in the same order as `files`. With `images=True` each
+    file is uploaded through upload_image so its variants are created too.
+
+    The whole batch gets UPLOAD_TIMEOUT seconds. If any upload fails or the
+    batch times out, the objects that were already uploaded are removed again
+    and the error is re-raised, so callers never end up with half of a post
+    in the bucket.
+    """
+    files = list(files)
+    upload = upload_image if images else upload_file
+    if not files:
+        return []
+    if len(files) == 1:
+        return [upload(files[0], folder)]
+
+    executor = _get_upload_executor()
+    futures = [executor.submit(_pooled, upload, file, folder) for file in files]
+
+    try:
+        # One deadline for the batch, however many files are in it
+        done, pending = wait(futures, timeout=settings.UPLOAD_TIMEOUT, return_when=FIRST_EXCEPTION)
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+        if pending:
+            raise FutureTimeoutError()
+        paths = [future.result() for future in futures]
+    except Exception as e:
+        if isinstance(e, FutureTimeoutError):
+            logger.error("Upload to '%s' timed out after %ss", folder, settings.UPLOAD_TIMEOUT)
+        for future in futures:
+            # Running uploads can't be interrupted; remove them once they land.
+            if not future.cancel():
+                future.add_done_callback(_discard_upload)
+        raise
+
+    return paths
+
+
+def _pooled(func, *args):
+    """
+    Runs a task on the upload pool or the background thread. Those threads
+    live for the whole process, so their database connection is closed
+    after every task.
+    """
+    try:
+        return func(*args)
+    finally:
+        connection.close()
+
+
+def discard_uploads(paths):
+    """
+    Releases objects that were uploaded but won't be referenced after all.
+    Runs on the upload pool so the release commits on its own connection,
+    independent of the caller's (usually failing) transaction.
+    """
+    executor = _get_upload_executor()
+    for path in paths:
+        executor.submit(_pooled, _release_upload, path)
+
+
+def _release_upload(path):
+    try:
+        delete_from_bucket(settings.SUPABASE_BUCKET, path)
+    except Exception as e:
+        logger.error(f"Failed to clean up orphaned upload {path}: {str(e)}")
+
+
+def _discard_upload(future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    discard_uploads([future.result()])
+
+
+def create_signed_upload(folder, filename, user, content_type=""):
+    """
+    Reserves a new path in `folder` and returns a signed URL the client can
+    upload the file to directly, so its bytes never pass through Django.
+    The client then submits the path in place of the file (see claim_upload);
+    the object must be of `content_type` and at most SIGNED_UPLOAD_MAX_SIZE
+    bytes by then.
+
+    :return: Dict with path, upload_url, token, expires_at and max_size
+    """
+    from api.models import PendingUpload
+
+    path = f"{folder}/{uuid4()}_{get_valid_filename(os.path.basename(filename))}"
+    signed = get_storage().create_signed_upload_url(path)
+    pending = PendingUpload.objects.create(
+        path=path,
+        folder=folder,
+        content_type=content_type,
+        uploaded_by=user,
+        expires_at=timezone.now() + timedelta(seconds=settings.SIGNED_UPLOAD_EXPIRY),
     )
-    return path
+    return {
+        "path": path,
+        "upload_url": signed["url"],
+        "token": signed["token"],
+        "expires_at": pending.expires_at,
+        "max_size": settings.SIGNED_UPLOAD_MAX_SIZE,
+    }
+
+
+def claim_upload(path, image=False):
+    """
+    Takes ownership of a directly uploaded object, so it's no longer expired.
+    Returns False if the path was already claimed (or has expired) meanwhile.
+
+    Directly uploaded objects have no StoredObject record until their
+    variants are made, in the background once the caller's transaction
+    commits; the record then counts this one reference.
+    """
+    from api.models import PendingUpload
+
+    deleted, _ = PendingUpload.objects.filter(path=path, expires_at__gt=timezone.now()).delete()
+    if not deleted:
+        return False
+    if image:
+        transaction.on_commit(lambda: _get_background_executor().submit(_pooled, _generate_variants_in_background, path))
+    return True
+
+
+def _generate_variants_in_background(path):
+    try:
+        regenerate_image_variants(path)
+    except Exception as e:
+        logger.error(f"Failed to generate image variants for {path}: {str(e)}")
+
+
+def expire_pending_uploads():
+    """
+    Drops reservations that were never claimed and queues whatever the
+    client may have uploaded to them for removal.
+
+    :return: Number of expired reservations
+    """
+    from api.models import PendingUpload
+
+    with transaction.atomic():
+        expired = list(
+            PendingUpload.objects
+            .select_for_update(skip_locked=True)
+            .filter(expires_at__lte=timezone.now())
+            .values_list("id", "path")
+        )
+        if expired:
+            PendingUpload.objects.filter(id__in=[pk for pk, _ in expired]).delete()
+            _remove_objects(settings.SUPABASE_BUCKET, [path for _, path in expired])
+    return len(expired)
+
+
+# Uploaded objects are stored as <folder>/<uuid4>_<name>, see _store_file
+_UPLOAD_ID_RE = re.compile(r"[a-z_]+/([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})_")
+
+
+def get_upload_id(path):
+    """ Returns the UUID that makes an uploaded object's path unique, or None. """
+    match = _UPLOAD_ID_RE.match(path or "")
+    return match.group(1) if match else None
+
+
+def find_upload_ids(text):
+    """
+    Returns the upload IDs of every bucket object referenced in text, e.g.
+    through the public URLs of inline images in a blog's content. Matching
+    on the ID keeps this independent of the storage host and of however the
+    editor escaped the file name.
+    """
+    return set(_UPLOAD_ID_RE.findall(unquote(html.unescape(text or ""))))
+
 
 def get_bucket_public_url(path):
-    return f"{settings.SUPABASE_URL}/storage/v1/object/public/{settings.SUPABASE_BUCKET}/{path}"
+    return get_storage().public_url(path)
+
+def get_image_variant_urls(path, has_variants=None):
+    """
+    Returns a srcset-style map of public URLs for an uploaded image:
+    the original plus one entry per IMAGE_VARIANTS size. None unless its
+    StoredObject records that the variants were made.
+
+    :param has_variants: The recorded flag, if the caller annotated it
+        (see with_variant_flag); looked up otherwise
+    """
+    from api.models import StoredObject
 
-def delete_from_bucket(bucket: str, path: str):
     if not path:
+        return None
+    if has_variants is None:
+        has_variants = StoredObject.objects.filter(path=path, has_variants=True).exists()
+    if not has_variants:
+        return None
+    urls = {"original": get_bucket_public_url(path)}
+    for name, variant in variant_paths(path).items():
+        urls[name] = get_bucket_public_url(variant)
+    return urls
+
+def get_check_in_qr_code(token: str) -> bytes:
+    """
+    Returns the QR code PNG of a check-in token. It's rendered when the
+    registration is made and served from the cache after that.
+    """
+    cache = caches[settings.RESPONSE_CACHE_ALIAS]
+    key = f"check-in-qr:{token}"
+    png = cache.get(key)
+    if png is None:
+        png = render_qr_code(token)
+        cache.set(key, png, settings.CHECK_IN_QR_CACHE_TIMEOUT)
+    return png
+
+def download_from_bucket(path: str) -> bytes:
+    return get_storage().download(path)
+
+def regenerate_image_variants(path: str):
+    """
+    Downloads an existing original and (re)uploads its variants.
+    Used to backfill objects uploaded before variants existed, and for
+    direct uploads. Objects without a StoredObject get one then, so the
+    variants are recorded.
+    """
+    from api.models import StoredObject
+
+    original = ContentFile(download_from_bucket(path), name=os.path.basename(path))
+    if not _upload_variants(path, original, upsert=True):
+        return
+    if StoredObject.objects.filter(path=path).update(has_variants=True):
         return
-    supabase.storage.from_(bucket).remove([path])
\ No newline at end of file
+    try:
+        with transaction.atomic():
+            StoredObject.objects.create(digest=file_digest(original), path=path, size=original.size, has_variants=True)
+    except IntegrityError:
+        # The same bytes are stored under another path; this copy goes unrecorded
+        logger.warning(f"Not recording variants of {path}: its content is stored elsewhere")
+
+def delete_from_bucket(bucket: str, path: str):
+    """
+    Drops one reference to an object. Once no references are left, the
+    object and, for images, its generated variants are queued for removal.
+    Objects uploaded before deduplication existed have no record and are
+    queued straight away.
+
+    The queue entry is written in the caller's transaction and the bucket is
+    only touched after it commits (see flush_pending_deletions), so a
+    rolled-back delete never removes a live file.
+
+    :return: True if the object was queued for removal
+    """
+    from api.models import StoredObject
+
+    if not path:
+        return False
+    with transaction.atomic():
+        stored = StoredObject.objects.select_for_update().filter(path=path).first()
+        if stored is not None:
+            if stored.ref_count > 1:
+                stored.ref_count = F("ref_count") - 1
+                stored.save(update_fields=["ref_count"])
+                return False
+            stored.delete()
+        _remove_objects(bucket, [path])
+    return True
+
+
+def _remove_objects(bucket, paths):
+    from api.models import PendingDeletion
+
+    removals = []
+    for path in paths:
+        removals.extend([path, *variant_paths(path).values()])
+    PendingDeletion.objects.bulk_create([
+        PendingDeletion(bucket=bucket, path=path) for path in removals
+    ])
+    transaction.on_commit(schedule_deletion_flush)
+
+
+def schedule_deletion_flush():
+    """
+    Drains the deletion queue in the background so user-facing deletes
+    never wait on the bucket.
+    """
+    _get_background_executor().submit(_pooled, _flush_in_background)
+
+
+def _flush_in_background():
+    try:
+        flush_pending_deletions()
+    except Exception as e:
+        logger.error(f"Flushing pending bucket deletions failed: {str(e)}")
+
+
+def flush_pending_deletions(batch_size=None):
+    """
+    Removes queued objects with one remove([...]) call per batch and bucket.
+    A failed batch is retried later with exponential backoff. Rows are
+    claimed with SKIP LOCKED, so several flushers can run at once.
+
+    :return: Tuple of (removed, failed) object counts
+    """
+    from api.models import PendingDeletion
+
+    batch_size = batch_size or settings.BUCKET_DELETE_BATCH_SIZE
+    removed = failed = 0
+
+    while True:
+        with transaction.atomic():
+            batch = list(
+                PendingDeletion.objects
+                .select_for_update(skip_locked=True)
+                .filter(next_attempt_at__lte=timezone.now())
+                .order_by("id")[:batch_size]
+            )
+            if not batch:
+                break
+
+            by_bucket = {}
+            for entry in batch:
+                by_bucket.setdefault(entry.bucket, []).append(entry)
+
+            for bucket, entries in by_bucket.items():
+                try:
+                    get_storage().remove([entry.path for entry in entries], bucket=bucket)
+                except Exception as e:
+                    logger.warning(f"Removing {len(entries)} object(s) from '{bucket}' failed, will retry: {str(e)}")
+                    now = timezone.now()
+                    for entry in entries:
+                        entry.attempts += 1
+                        delay = min(
+                            settings.BUCKET_DELETE_RETRY_BASE * 2 ** (entry.attempts - 1),
+                            settings.BUCKET_DELETE_RETRY_MAX,
+                        )
+                        entry.next_attempt_at = now + timedelta(seconds=delay)
+                        entry.last_error = str(e)
+                    PendingDeletion.objects.bulk_update(entries, ["attempts", "next_attempt_at", "last_error"])
+                    failed += len(entries)
+                else:
+                    PendingDeletion.objects.filter(id__in=[entry.id for entry in entries]).delete()
+                    removed += len(entries)
+
+    return removed, failed
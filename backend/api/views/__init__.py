@@ -1,11 +1,13 @@
 from .admin import AdminRUDView
 from .auth import SignupView, OTPView, LoginView, LogoutView, PasswordChangeView
 from .bill import BillRUDView, BillListCreateView
-from .blog import BlogEditView, BlogDeleteView, BlogUploadView, InlineImageUploadView, BlogListAPIView, BlogDetailView
-from .event import EventDetailView, EventTypeListCreateView, EventListCreateView, EventRegistrationListCreateView, RegistrationStatusUpdateView, EventRegistrationDeleteView, EventRegistrationDetailView
+from .blog import BlogEditView, BlogDeleteView, BlogUploadView, InlineImageUploadView, BlogListAPIView, BlogDetailView, BlogMostReadView, \
+    blog_feed
+from .event import event_calendar_feed, event_calendar, EventCheckInView, CheckInQRCodeView, EventDetailView, EventParticipantExportView, EventTagListView, EventTypeListCreateView, EventListCreateView, EventRegistrationListCreateView, RegistrationStatusUpdateView, EventRegistrationDeleteView, EventRegistrationDetailView
 from .meeting import MeetingPDFView, MeetingListView, MeetingRUDView, MeetingCreateView, MeetingAttendanceRUDView, \
     MeetingAttendanceListView
-from .root import api_root, health_check
+from .root import api_root, health_check, response_cache_stats
+from .upload import SignedUploadView
 from .user import StudentRUView, StudentsListView, PublicStudentsListView
 from .recruitment import RecruitmentSessionViewSet, ApplicationReviewViewSet, ApplicationStatusUpdateViewSet, \
     ApplicationSubmitView, ActiveRecruitmentSessionView, RecruitmentApplicationsExcelView
@@ -1,12 +1,13 @@
+from django.db import transaction
 from rest_framework import generics
-from api.models import Bill
+from api.models import Bill, with_variant_flag
 from api.serializers import BillSerializer, BillWriteSerializer
 from api.permissions import IsTreasurer
 from api.utils import delete_from_bucket
 
 
 class BillListCreateView(generics.ListCreateAPIView):
-    queryset = Bill.objects.all()
+    queryset = with_variant_flag(Bill.objects.all())
     permission_classes = [IsTreasurer]
 
     def get_serializer_class(self):
@@ -16,7 +17,7 @@ class BillListCreateView(generics.ListCreateAPIView):
 
 
 class BillRUDView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Bill.objects.all()
+    queryset = with_variant_flag(Bill.objects.all())
     permission_classes = [IsTreasurer]
 
     def get_serializer_class(self):
@@ -24,6 +25,7 @@ class BillRUDView(generics.RetrieveUpdateDestroyAPIView):
             return BillWriteSerializer
         return BillSerializer
 
+    @transaction.atomic
     def perform_destroy(self, instance):
         delete_from_bucket("media", instance.image)
         instance.delete()
\ No newline at end of file
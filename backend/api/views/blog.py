@@ -1,4 +1,11 @@
+import hashlib
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Count, Max, Prefetch
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import condition, require_GET
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiResponse, extend_schema, OpenApiParameter, OpenApiExample
 from rest_framework import generics, status
@@ -6,9 +13,14 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from api.models import Blog
+from api.cache import cache_response, conditional_response
+from api.counters import get_most_read, record_blog_view
+from api.feeds import get_cached_feed, get_feed, get_feed_etag
+from api.models import Blog, BlogImage, User, with_variant_flag
+from api.pagination import BlogKeysetPagination
 from api.permissions import IsAdmin
-from api.serializers import BlogSerializer, BlogUploadSerializer, BlogUpdateSerializer, InlineImageSerializer
+from api.search import SearchMixin
+from api.serializers import BlogSerializer, BlogSummarySerializer, MostReadBlogSerializer, BlogUploadSerializer, BlogUpdateSerializer, InlineImageSerializer
 from api.permissions import IsAdminOrAuthor
 
 
@@ -17,11 +29,10 @@ class InlineImageUploadView(APIView):
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request, *args, **kwargs):
-        serializer = InlineImageSerializer(data=request.data)
+        serializer = InlineImageSerializer(data=request.data, context={"request": request})
         if serializer.is_valid():
-            image = serializer.save()
-            image_url = request.build_absolute_uri(image.image.url)
-            return Response({"url": image_url}, status=status.HTTP_201_CREATED)
+            serializer.save()
+            return Response({"url": serializer.data["url"]}, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -152,15 +163,24 @@ class BlogUploadView(APIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _images():
+    """ Prefetches a post's images along with whether their variants exist. """
+    return Prefetch('images', queryset=with_variant_flag(BlogImage.objects.all()))
+
+
 @extend_schema(
     summary="List blog posts",
     description=(
             "Retrieve a list of blog posts.\n\n"
             "- **limit** (optional, int): Restrict the number of blog posts returned.\n"
             "- **student_id** (optional, int): Filter blog posts by the ID of the student who created them.\n\n"
+            "- **summary** (optional, bool): Serve a plain-text `excerpt` instead of the full `content`.\n"
+            "- **q** (optional, string): Full-text search of the title and content, best match first.\n\n"
             "Returns all blog posts by default, ordered by creation date (newest first). "
             "If `student_id` is provided, only posts from that student are included. "
-            "If `limit` is provided, restricts the number of results."
+            "If `limit` is provided, restricts the number of results.\n\n"
+            "Passing `page_size` or `cursor` returns `{next, results}` pages instead; "
+            "`limit` is ignored then."
     ),
     parameters=[
         OpenApiParameter(
@@ -177,6 +197,20 @@ class BlogUploadView(APIView):
             required=False,
             description="Filter blog posts by the ID of the student who created them."
         ),
+        OpenApiParameter(
+            name="q",
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description="Search the title and content; results come best match first."
+        ),
+        OpenApiParameter(
+            name="summary",
+            type=OpenApiTypes.BOOL,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description="Serve a plain-text excerpt instead of the full content."
+        ),
     ],
     responses={
         200: OpenApiResponse(
@@ -187,23 +221,65 @@ class BlogUploadView(APIView):
         403: OpenApiResponse(description="Permission denied."),
     }
 )
-class BlogListAPIView(generics.ListAPIView):
-    serializer_class = BlogSerializer
+class BlogListAPIView(SearchMixin, generics.ListAPIView):
+    pagination_class = BlogKeysetPagination
+    search_fallback_fields = ('title', 'content')
+
+    @cache_response(Blog, BlogImage, User)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    @property
+    def summary(self):
+        return self.request.query_params.get('summary', '').lower() in ('1', 'true')
+
+    def get_serializer_class(self):
+        return BlogSummarySerializer if self.summary else BlogSerializer
 
     def get_queryset(self):
-        queryset = Blog.objects.all().order_by('-createdAt')
+        # The author and the images are fetched up front, not once per post
+        queryset = (
+            Blog.objects
+            .select_related('createdBy')
+            .prefetch_related(_images())
+            .order_by('-createdAt', 'id')
+            .defer('search_vector')
+        )
+        if self.summary:
+            queryset = queryset.defer('content')
 
         student_id = self.request.query_params.get('student_id')
         if student_id:
             queryset = queryset.filter(createdBy__id=student_id)
+        queryset = self.search(queryset)
 
         limit = self.request.query_params.get('limit')
-        if limit and limit.isdigit():
+        if limit and limit.isdigit() and not self.paginator.is_requested(self.request):
             queryset = queryset[:int(limit)]
 
         return queryset
 
 
+def _blog_state(pk):
+    """
+    Validators of a post: its updatedAt, and in the ETag its image set and
+    its author's username as well, which can change without the post being
+    saved.
+    """
+    row = (
+        Blog.objects
+        .filter(pk=pk)
+        .annotate(image_count=Count('images'), last_image=Max('images__id'))
+        .values_list('updatedAt', 'image_count', 'last_image', 'createdBy__username')
+        .first()
+    )
+    if row is None:
+        return None
+    updated_at, image_count, last_image, author = row
+    author = hashlib.md5(repr(author).encode()).hexdigest()
+    return f"{pk}-{updated_at.timestamp()}-{image_count}-{last_image or 0}-{author}", updated_at
+
+
 @extend_schema(
     summary="Get a single blog post",
     description="Retrieve a single blog post by its ID.",
@@ -229,11 +305,20 @@ class BlogListAPIView(generics.ListAPIView):
 )
 class BlogDetailView(APIView):
     """
-    API endpoint to retrieve a single blog post by ID.
+    API endpoint to retrieve a single blog post by ID. Unchanged posts get
+    a 304 (see _blog_state). Each read counts as a view (see api.counters).
     """
     def get(self, request, pk, *args, **kwargs):
+        response = self.get_post(request, *args, pk=pk, **kwargs)
+        if response.status_code in (200, 304):
+            record_blog_view(pk)
+        return response
+
+    @conditional_response(_blog_state)
+    @cache_response(Blog, BlogImage, User)
+    def get_post(self, request, pk, *args, **kwargs):
         try:
-            blog = Blog.objects.get(pk=pk)
+            blog = Blog.objects.select_related('createdBy').prefetch_related(_images()).defer('search_vector').get(pk=pk)
             serializer = BlogSerializer(blog, context={"request": request})
             return Response({
                 "status": "success",
@@ -248,6 +333,37 @@ class BlogDetailView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
 
+@extend_schema(
+    summary="Most read blog posts",
+    description=(
+            "The ten most viewed posts of the last seven days, most viewed first, "
+            "as summaries with their `views`. Views are counted in batches, so the "
+            "ranking trails the reads by up to a minute."
+    ),
+    responses={200: MostReadBlogSerializer(many=True)},
+)
+class BlogMostReadView(APIView):
+    # The ranking is stored with every batch of views (see api.counters), the response kept as long
+    @cache_response(Blog, BlogImage, User, timeout=settings.BLOG_VIEW_FLUSH_INTERVAL)
+    def get(self, request, *args, **kwargs):
+        ranking = get_most_read()
+        blogs = (
+            Blog.objects
+            .select_related('createdBy')
+            .prefetch_related(_images())
+            .defer('content', 'search_vector')
+            .in_bulk([blog_id for blog_id, views in ranking])
+        )
+        posts = []
+        for blog_id, views in ranking:
+            blog = blogs.get(blog_id)
+            if blog is None:  # Deleted since it was ranked
+                continue
+            blog.views = views
+            posts.append(blog)
+        return Response(MostReadBlogSerializer(posts, many=True, context={"request": request}).data)
+
+
 @extend_schema(
     summary="Edit a blog post",
     description=(
@@ -322,20 +438,6 @@ class BlogDetailView(APIView):
         )
     ],
 )
-class InlineImageUploadView(APIView):
-    permission_classes = [IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
-
-    def post(self, request, *args, **kwargs):
-        serializer = InlineImageSerializer(data=request.data)
-        if serializer.is_valid():
-            image = serializer.save()
-            image_url = request.build_absolute_uri(image.image.url)
-            return Response({"url": image_url}, status=status.HTTP_201_CREATED)
-
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-
 class BlogEditView(APIView):
     permission_classes = [IsAdminOrAuthor]
     parser_classes = [MultiPartParser, FormParser]
@@ -429,3 +531,28 @@ class BlogDeleteView(APIView):
             "message": "Blog post deleted successfully",
             "data": None
         }, status=status.HTTP_200_OK)
+
+
+def _blog_feed_etag(request, kind):
+    return get_feed_etag(kind)
+
+
+def _blog_feed_last_modified(request, kind):
+    feed = get_cached_feed(request, kind)
+    return feed['last_modified'] if feed else None
+
+
+@require_GET
+@condition(etag_func=_blog_feed_etag, last_modified_func=_blog_feed_last_modified)
+def blog_feed(request, kind):
+    """
+    The blog as an RSS (kind='rss') or Atom (kind='atom') feed. It's rendered
+    once per change to the posts; unchanged polls get a 304 straight from
+    the cache, without a database query.
+    """
+    feed = get_feed(request, kind)
+    response = HttpResponse(feed['content'], content_type=feed['content_type'])
+    # condition() can only set it from a feed that was already cached
+    response['Last-Modified'] = http_date(feed['last_modified'].timestamp())
+    patch_cache_control(response, public=True, max_age=settings.BLOG_FEED_MAX_AGE)
+    return response
@@ -1,7 +1,27 @@
-from rest_framework import generics
-from api.models import Event, EventType, EventRegistration, EventParticipant, RegistrationType, RegistrationStatus
+import csv
+import hashlib
+import tempfile
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.text import slugify
+from django.views.decorators.http import condition, require_GET
+from django_filters.rest_framework import DjangoFilterBackend
+from openpyxl import Workbook
+from rest_framework import generics, status
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from api.cache import cache_response, conditional_response
+from api.filters import EventFilter
+from api.ical import EVENT_FIELDS, get_vevents, render_calendar
+from api.models import Event, EventType, EventRegistration, EventParticipant, RegistrationType, RegistrationStatus, \
+    CheckInRejected, with_variant_flag
 from api.serializers import (
     EventSerializer,
+    EventListSerializer,
     EventWriteSerializer,
     EventTypeSerializer,
     EventRegistrationCreateSerializer,
@@ -10,35 +30,110 @@ from api.serializers import (
     EventParticipantReadSerializer,
     EventRegistrationReadSerializer,
 )
-from api.utils import delete_from_bucket
+from api.pagination import KeysetPagination
+from api.permissions import IsAdmin, IsLeadOrAdmin
+from api.search import SearchMixin
+from api.utils import delete_from_bucket, get_check_in_qr_code
 
 
-class EventListCreateView(generics.ListCreateAPIView):
-    queryset = Event.objects.select_related('event_type')
+class EventListCreateView(SearchMixin, generics.ListCreateAPIView):
+    """
+    Lists events newest first. ?summary=true serves them as cards (see
+    EventListSerializer), without the content the dashboard edits. Pass
+    ?page_size and then the returned `next` link to page through them.
+    ?q= searches the title, description, tags and content, best match first.
+    """
+    queryset = with_variant_flag(Event.objects.select_related('event_type').defer('search_vector'))
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = EventFilter
+    search_fallback_fields = ('title', 'description', 'content')
+
+    # Columns behind EventListSerializer's fields
+    list_columns = (
+        'id', 'event_type__id', 'event_type__type', 'title', 'description', 'date', 'time_from', 'time_to',
+        'location', 'image', 'total_seats', 'seats_remaining', 'active_registration_count', 'tags', 'hosts',
+    )
+
+    @cache_response(Event, EventType, EventRegistration)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    @property
+    def summary(self):
+        return self.request.query_params.get('summary', '').lower() in ('1', 'true')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            if self.summary:
+                queryset = queryset.only(*self.list_columns)
+            queryset = self.search(queryset)
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return EventWriteSerializer
-        return EventSerializer
+        return EventListSerializer if self.summary else EventSerializer
+
+
+def _event_state(pk):
+    """
+    ETag of an event's detail. The seat counters go into it too; they move
+    with every registration without touching updated_at, which is why no
+    Last-Modified is given.
+    """
+    row = (
+        Event.objects
+        .filter(pk=pk)
+        .values_list('updated_at', 'total_seats', *Event.COUNTER_FIELDS, 'event_type__type')
+        .first()
+    )
+    if row is None:
+        return None
+    updated_at, *state = row
+    return f"{pk}-{updated_at.timestamp()}-{hashlib.md5(repr(state).encode()).hexdigest()}", None
 
 
 class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Event.objects.select_related('event_type')
+    """
+    GET answers with a 304 while the event is unchanged (see _event_state).
+    """
+    queryset = with_variant_flag(Event.objects.select_related('event_type').defer('search_vector'))
+
+    @conditional_response(_event_state)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
             return EventWriteSerializer
         return EventSerializer
 
+    @transaction.atomic
     def perform_destroy(self, instance):
         delete_from_bucket("media", instance.image)
         instance.delete()
 
 
+class EventTagListView(APIView):
+    """
+    Every tag in use with the number of events carrying it, most used first.
+    """
+
+    @cache_response(Event)
+    def get(self, request, *args, **kwargs):
+        return Response(list(Event.objects.tag_counts()))
+
+
 class EventTypeListCreateView(generics.ListCreateAPIView):
     queryset = EventType.objects.all()
     serializer_class = EventTypeSerializer
 
+    @cache_response(EventType)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 class RegistrationStatusUpdateView(generics.UpdateAPIView):
     queryset = EventRegistration.objects.all()
@@ -60,4 +155,217 @@ class EventRegistrationDetailView(generics.RetrieveAPIView):
 
 
 class EventRegistrationDeleteView(generics.DestroyAPIView):
-    queryset = EventRegistration.objects.all()
\ No newline at end of file
+    queryset = EventRegistration.objects.all()
+
+
+class _Echo:
+    """ A file-like object whose write() just returns the line, for csv.writer. """
+
+    def write(self, value):
+        return value
+
+
+class EventParticipantExportView(APIView):
+    """
+    Exports an event's participants, one row each with their registration,
+    as CSV (?type=csv, the default) or XLSX (?type=xlsx). ?status= limits it
+    to registrations in that status.
+
+    Rows are read in EXPORT_CHUNK_SIZE chunks through a server-side cursor,
+    and the CSV is streamed as it's written, so memory use doesn't grow with
+    the number of participants. XLSX has to be zipped as a whole, so it's
+    written to a temporary file with openpyxl's write-only mode and streamed
+    from there.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    columns = [
+        "Registration ID", "Registration Type", "Team Name", "Status",
+        "Name", "Email", "Registration No", "Semester", "Department", "Phone",
+    ]
+
+    def get(self, request, pk):
+        event = get_object_or_404(Event, pk=pk)
+        export_type = request.query_params.get("type", "csv")
+        if export_type not in ("csv", "xlsx"):
+            return HttpResponse("Invalid export type", status=400)
+
+        participants = (
+            EventParticipant.objects
+            .filter(registration__event=event)
+            .select_related("registration")
+            .order_by("registration_id", "id")
+        )
+        status_param = request.query_params.get("status")
+        if status_param:
+            if status_param not in RegistrationStatus.values:
+                return HttpResponse("Invalid status value", status=400)
+            participants = participants.filter(registration__status=status_param)
+
+        rows = self.rows(participants)
+        filename = f"{slugify(event.title) or 'event'}-participants.{export_type}"
+        if export_type == "xlsx":
+            return self.xlsx_response(rows, filename)
+
+        writer = csv.writer(_Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in rows),
+            content_type="text/csv",
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def rows(self, participants):
+        yield self.columns
+        for participant in participants.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+            registration = participant.registration
+            yield [
+                registration.id,
+                registration.registration_type,
+                registration.team_name or "",
+                registration.status,
+                participant.name,
+                participant.email,
+                participant.reg_no,
+                participant.current_semester,
+                participant.department,
+                participant.phone_no,
+            ]
+
+    def xlsx_response(self, rows, filename):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Participants")
+        for row in rows:
+            ws.append(row)
+
+        # Closed by FileResponse once it's been sent
+        file = tempfile.TemporaryFile()
+        wb.save(file)
+        file.seek(0)
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=filename,
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+
+
+CALENDAR_CONTENT_TYPE = "text/calendar; charset=utf-8"
+
+
+def _feed_state(request):
+    """ Latest change and number of events, looked up once per request. """
+    if not hasattr(request, "_calendar_feed_state"):
+        request._calendar_feed_state = Event.objects.aggregate(last_modified=Max("updated_at"), count=Count("pk"))
+    return request._calendar_feed_state
+
+
+def _feed_etag(request):
+    # The count changes when an event is deleted, which updated_at can't show
+    state = _feed_state(request)
+    last_modified = state["last_modified"].timestamp() if state["last_modified"] else 0
+    return f'{state["count"]}-{last_modified}'
+
+
+def _feed_last_modified(request):
+    return _feed_state(request)["last_modified"]
+
+
+@require_GET
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
+def event_calendar_feed(request):
+    """
+    All events as an iCalendar feed to subscribe to. Unchanged polls get a
+    304 from one aggregate query.
+    """
+    events = Event.objects.order_by("date", "time_from", "pk").values_list("pk", "updated_at")
+    return HttpResponse(render_calendar(get_vevents(events)), content_type=CALENDAR_CONTENT_TYPE)
+
+
+def _event_updated_at(request, pk):
+    if not hasattr(request, "_calendar_event_updated_at"):
+        request._calendar_event_updated_at = Event.objects.filter(pk=pk).values_list("updated_at", flat=True).first()
+    return request._calendar_event_updated_at
+
+
+def _event_etag(request, pk):
+    updated_at = _event_updated_at(request, pk)
+    return f"{pk}-{updated_at.timestamp()}" if updated_at else None
+
+
+@require_GET
+@condition(etag_func=_event_etag, last_modified_func=_event_updated_at)
+def event_calendar(request, pk):
+    """ One event as an .ics file to download. """
+    event = get_object_or_404(Event.objects.only(*EVENT_FIELDS), pk=pk)
+    response = HttpResponse(
+        render_calendar(get_vevents([(event.pk, event.updated_at)])),
+        content_type=CALENDAR_CONTENT_TYPE,
+    )
+    response["Content-Disposition"] = f'attachment; filename="{slugify(event.title) or "event"}.ics"'
+    return response
+
+
+class CheckInQRCodeView(APIView):
+    """
+    The QR code of a check-in token as a PNG. The token never changes, so
+    clients may keep the image for good.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, token):
+        if not EventRegistration.objects.filter(check_in_token=token).exists():
+            return HttpResponse("Unknown check-in token", status=404)
+        response = HttpResponse(get_check_in_qr_code(token), content_type="image/png")
+        response["Cache-Control"] = "private, max-age=31536000, immutable"
+        return response
+
+
+class EventCheckInView(APIView):
+    """
+    GET: checked in / registered counts for the event, read from its
+    counters (no COUNT).
+    POST {"token": ...}: checks in the registration with that token.
+    Answers 404 for an unknown token, 409 if it was already used and 400 if
+    the registration is cancelled or waitlisted.
+    """
+    permission_classes = [IsLeadOrAdmin]
+
+    def counts(self, pk):
+        event = get_object_or_404(Event.objects.only("checked_in_count", "active_registration_count"), pk=pk)
+        return {"checked_in": event.checked_in_count, "registered": event.active_registration_count}
+
+    def get(self, request, pk):
+        return Response(self.counts(pk))
+
+    def post(self, request, pk):
+        token = request.data.get("token")
+        if not token:
+            return Response({"error": "token is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            checked_in_at = EventRegistration.objects.check_in(pk, token)
+        except CheckInRejected as e:
+            registration = e.registration
+            if registration is None:
+                return Response({"error": "Unknown check-in token."}, status=status.HTTP_404_NOT_FOUND)
+            if registration.checked_in_at:
+                return Response(
+                    {"error": "Already checked in.", "checked_in_at": registration.checked_in_at},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return Response(
+                {"error": f"Registration is {registration.status.lower()}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        registration = (
+            EventRegistration.objects
+            .prefetch_related("participants")
+            .get(check_in_token=token)
+        )
+        return Response({
+            "registration": EventRegistrationReadSerializer(registration).data,
+            "checked_in_at": checked_in_at,
+            **self.counts(pk),
+        })
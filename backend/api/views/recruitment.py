@@ -12,6 +12,7 @@ from rest_framework.filters import SearchFilter
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet, ModelViewSet
+from api.cache import cache_response
 from api.permissions import IsAdmin
 from openpyxl import Workbook
 from django.http import HttpResponse
@@ -100,6 +101,14 @@ class ActiveRecruitmentSessionView(ReadOnlyModelViewSet):
     serializer_class = RecruitmentSessionSerializer
     permission_classes = [AllowAny]
 
+    @cache_response(RecruitmentSession)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(RecruitmentSession)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def get_queryset(self):
         today = now().date()
         return RecruitmentSession.objects.filter(
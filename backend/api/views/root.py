@@ -1,6 +1,8 @@
-from rest_framework.decorators import api_view, schema
+from rest_framework.decorators import api_view, permission_classes, schema
 from rest_framework.response import Response
 from django.http import JsonResponse
+from api.cache import cached_views, get_stats
+from api.permissions import IsAdmin
 
 def health_check(request):
     return JsonResponse({"status": "ok", "message": "Render instance is awake"})
@@ -14,3 +16,19 @@ def api_root(request):
             'data': request.data
         })
     return Response({"message": "Server is online. API functional."})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+@schema(None)
+def response_cache_stats(request):
+    """ Hits and misses of each cached endpoint, see api.cache. """
+    stats = get_stats(sorted(cached_views))
+    return Response({
+        name: {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+        for name, (hits, misses) in stats.items()
+    })
@@ -0,0 +1,47 @@
+from drf_spectacular.utils import OpenApiResponse, extend_schema
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from api.serializers import SignedUploadSerializer
+from api.utils import create_signed_upload
+
+
+@extend_schema(
+    summary="Request a signed upload URL",
+    description=(
+            "Reserves a path in the media bucket and returns a short-lived signed URL to upload the file to "
+            "directly (`PUT` the file to `upload_url`). Then submit `path` to the create/update endpoint in place "
+            "of the file: `image_paths` for blogs, `image_path` for events, bills and inline images, and "
+            "`profile_pic_path` for profiles. The uploaded object must be an image of `content_type`, within "
+            "the size limits of a posted image and at most `max_size` bytes. Unclaimed paths expire after "
+            "`SIGNED_UPLOAD_EXPIRY` seconds."
+    ),
+    request=SignedUploadSerializer,
+    responses={
+        201: SignedUploadSerializer,
+        400: OpenApiResponse(description="Validation error - invalid input"),
+        501: OpenApiResponse(description="The configured storage backend doesn't support direct uploads"),
+    }
+)
+class SignedUploadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = SignedUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            signed = create_signed_upload(
+                serializer.validated_data["folder"],
+                serializer.validated_data["filename"],
+                request.user,
+                serializer.validated_data["content_type"],
+            )
+        except NotImplementedError:
+            return Response(
+                {"detail": "Direct uploads are not supported by the configured storage backend."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+
+        return Response(SignedUploadSerializer({**serializer.validated_data, **signed}).data, status=status.HTTP_201_CREATED)
@@ -1,10 +1,12 @@
 import json
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import generics, status
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from api.models import Student
+from api.cache import cache_response
+from api.models import Student, with_variant_flag
 from api.permissions import IsLeadOrAdmin
 from api.serializers import StudentSerializer, StudentListSerializer, PublicStudentSerializer, \
     ProfileUpdateSerializer
@@ -29,8 +31,12 @@ class PublicStudentsListView(generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = PublicStudentSerializer
 
+    @cache_response(Student, User)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
-        return Student.objects.all()
+        return with_variant_flag(Student.objects.all(), 'profile_pic')
 
 
 class StudentRUView(generics.RetrieveUpdateDestroyAPIView):
@@ -93,10 +99,12 @@ class StudentRUView(generics.RetrieveUpdateDestroyAPIView):
         """Delete student and their associated user account"""
         student = self.get_object()
         user = student.user  
-        student.delete()  
-        user.delete()  
+        with transaction.atomic():
+            self.perform_destroy(student)
+            user.delete()  
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @transaction.atomic
     def perform_destroy(self, instance):
         delete_from_bucket("media", instance.profile_pic)
         instance.delete()
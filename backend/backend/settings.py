@@ -126,6 +126,119 @@ SUPABASE_BUCKET = "media"
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
+# Where uploaded media is stored. Alternatives for offline work and load tests:
+#   api.storage.LocalFileSystemStorage - files under MEDIA_ROOT/<bucket>/
+#   api.storage.InMemoryStorage - OPTIONS: latency (seconds or [min, max]), failure_rate (0-1)
+STORAGE_BACKEND = {
+    'BACKEND': os.environ.get('STORAGE_BACKEND', 'api.storage.SupabaseStorage'),
+    'OPTIONS': {},
+}
+
+# Concurrent uploads: size of the per-process upload pool and the time (in seconds) a batch of files may take
+UPLOAD_MAX_WORKERS = int(os.environ.get('UPLOAD_MAX_WORKERS', '4'))
+UPLOAD_TIMEOUT = float(os.environ.get('UPLOAD_TIMEOUT', '30'))
+
+# Uploads are streamed to the bucket in chunks of this size (bytes)
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# Files at least this large use Supabase's resumable (TUS) upload endpoint.
+# Supabase requires every TUS chunk except the last to be exactly 6 MB.
+RESUMABLE_UPLOAD_THRESHOLD = int(os.environ.get('RESUMABLE_UPLOAD_THRESHOLD', 6 * 1024 * 1024))
+RESUMABLE_UPLOAD_CHUNK_SIZE = 6 * 1024 * 1024
+RESUMABLE_UPLOAD_RETRIES = 3
+
+# Resized WebP copies generated for every uploaded image: name -> longest side in pixels
+IMAGE_VARIANTS = {
+    'thumb': 320,
+    'medium': 960,
+}
+IMAGE_VARIANT_QUALITY = 80
+
+# Uploaded images larger than this are rejected from their header, before
+# anything decodes them (50 MP still fits photos from 48 MP phone cameras).
+MAX_IMAGE_DIMENSION = 10000
+MAX_IMAGE_PIXELS = 50_000_000
+
+# Deleted objects are queued and removed from the bucket in batches.
+# A failed batch is retried after BASE * 2^(attempts - 1) seconds, capped at MAX.
+BUCKET_DELETE_BATCH_SIZE = 100
+BUCKET_DELETE_RETRY_BASE = 30
+BUCKET_DELETE_RETRY_MAX = 60 * 60
+
+# Clients can upload straight to the bucket through a signed URL and then
+# submit the object path instead of a file. A reserved path that isn't
+# claimed within this many seconds is dropped (Supabase's own signed upload
+# URLs stay valid for 2 hours, so this is the effective limit).
+SIGNED_UPLOAD_EXPIRY = int(os.environ.get('SIGNED_UPLOAD_EXPIRY', 15 * 60))
+# Supabase can't bind a size or type to the signed URL, so a submitted path
+# is checked before it's claimed: the object may be at most
+# SIGNED_UPLOAD_MAX_SIZE bytes, and its image header is read from the first
+# SIGNED_UPLOAD_HEADER_BYTES (a ranged download) and validated like a file
+# posted to the API.
+SIGNED_UPLOAD_MAX_SIZE = int(os.environ.get('SIGNED_UPLOAD_MAX_SIZE', 20 * 1024 * 1024))
+SIGNED_UPLOAD_HEADER_BYTES = 256 * 1024
+
+# Queued emails (e.g. waitlist promotions) are sent in batches over one SMTP
+# connection. A failed batch is retried after BASE * 2^(attempts - 1) seconds.
+EMAIL_BATCH_SIZE = 50
+EMAIL_RETRY_BASE = 60
+EMAIL_RETRY_MAX = 60 * 60
+
+# Responses of the public read endpoints are cached (see api.cache). The
+# default local-memory cache is per process, so with several workers a
+# write only invalidates the worker that made it until entries time out;
+# set CACHE_BACKEND/CACHE_LOCATION to a shared cache (e.g.
+# django.core.cache.backends.redis.RedisCache, redis://...) to share them.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+}
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 10 * 60))
+
+# The events calendar feed. Event dates and times are entered in
+# EVENT_TIME_ZONE; rendered VEVENT blocks are cached for CALENDAR_CACHE_TIMEOUT.
+EVENT_TIME_ZONE = os.environ.get('EVENT_TIME_ZONE', 'Asia/Karachi')
+CALENDAR_NAME = 'ACM CUI Wah Events'
+CALENDAR_UID_DOMAIN = 'acmcuiwah.com'
+CALENDAR_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# The blog's RSS and Atom feeds. Items link to SITE_URL/blog/<id>. Rendered
+# feeds are cached until a post changes (entries of old versions expire
+# after BLOG_FEED_CACHE_TIMEOUT); clients may reuse one for BLOG_FEED_MAX_AGE.
+SITE_URL = os.environ.get('SITE_URL', 'https://acmcuiwah.com')
+BLOG_FEED_TITLE = 'ACM CUI Wah Blog'
+BLOG_FEED_SIZE = 20
+BLOG_FEED_CACHE_TIMEOUT = 24 * 60 * 60
+BLOG_FEED_MAX_AGE = 5 * 60
+
+# QR codes of check-in tokens are kept in the cache this long
+CHECK_IN_QR_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+
+# Rows read per database round trip when exporting event participants
+EXPORT_CHUNK_SIZE = 2000
+
+# Cache-Control of the blog and event detail responses. They carry validators
+# (ETag, Last-Modified), so shared caches revalidate with a cheap 304 once
+# s-maxage runs out; browsers always revalidate.
+DETAIL_CACHE_CONTROL = {
+    'public': True,
+    'max_age': 0,
+    's_maxage': int(os.environ.get('DETAIL_CDN_MAX_AGE', 60)),
+}
+
+# Blog views are counted in memory by each worker and written to BlogStats
+# this often (seconds); a restarted worker loses at most this much.
+BLOG_VIEW_FLUSH_INTERVAL = int(os.environ.get('BLOG_VIEW_FLUSH_INTERVAL', 60))
+
+# Length, in characters, of the plain-text excerpt the blog list serves instead of the content
+BLOG_EXCERPT_LENGTH = 200
+
+# Inline images no blog references are removed by collect_inline_images once
+# they are this old, which leaves authors time to save the post they're writing.
+INLINE_IMAGE_GRACE_PERIOD = 24 * 60 * 60
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 